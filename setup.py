@@ -20,8 +20,8 @@ setup(
     license="BSD",
     zip_safe=False,
     entry_points={
-        'gui_scripts': ['runsnake=snakerunner.snakerunner:main',
-                        'snakerunner=snakerunner.snakerunner:main'],
+        'console_scripts': ['snakerunner=snakerunner.cli:main'],
+        'gui_scripts': ['runsnake=snakerunner.cli:gui_main'],
     },
     classifiers=[
         "License :: OSI Approved :: BSD License",
@@ -31,8 +31,9 @@ setup(
     ],
     include_package_data=True,
     package_data={
-        'runsnakerun': [
+        'snakerunner': [
             'resources/*.png',
+            'resources/web/*',
         ],
     },
 )
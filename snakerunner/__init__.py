@@ -0,0 +1,10 @@
+__all__ = ['Profile']
+
+
+def __getattr__(name):
+    # imported on first use, so that importing the package (e.g. to start
+    # the viewer or the cli) does not load the profile API
+    if name == 'Profile':
+        from snakerunner.profile import Profile
+        return Profile
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
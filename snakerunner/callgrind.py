@@ -0,0 +1,275 @@
+"""Read and write profiles in the callgrind (KCachegrind) format
+
+read() parses a callgrind file line by line into raw pstats-format stats,
+holding only the per-function totals and call edges (never the file), so
+even very large files convert in memory proportional to the call graph.
+write() streams raw stats (e.g. PStatsLoader.raw_stats()) out again.
+
+Callgrind records inclusive cost per call edge and self cost per function,
+so on import a function's cumulative time is its self time plus that of
+the calls it makes, per-edge local times and primitive (non-recursive)
+call counts are not available, and functions nothing calls count 1 call.
+"""
+import re
+import sys
+import logging
+from collections import defaultdict
+
+log = logging.getLogger(__name__)
+
+# seconds per unit of the first event, by event name, others are used as-is
+SCALES = {
+    'ns': 1e-9,
+    'us': 1e-6,
+    'ms': 1e-3,
+    's': 1.0,
+}
+EXPORT_EVENT = 'ns'
+# disambiguates functions of the same name within a file: name'line
+LINE_SUFFIX = re.compile(r"^(?P<name>.*)'(?P<line>\d+)$")
+
+FILE_SPECS = ('fl', 'fi', 'fe', 'cfl', 'cfi')
+FUNCTION_SPECS = ('fn', 'cfn')
+OBJECT_SPECS = ('ob', 'cob')
+
+
+def is_callgrind(filename):
+    """Does filename look like a callgrind profile?"""
+    try:
+        with open(filename, 'rb') as handle:
+            head = handle.read(4096)
+    except (IOError, OSError):
+        return False
+    if head.startswith(b'# callgrind format'):
+        return True
+    for line in head.splitlines()[:20]:
+        if line.startswith((
+            b'events:', b'version:', b'creator:', b'positions:', b'cmd:',
+        )):
+            continue
+        if line.startswith(b'fl=') or line.startswith(b'ob='):
+            return True
+        if line and not line.startswith(b'#'):
+            return False
+    return False
+
+
+class CallgrindParser(object):
+    """Accumulate the functions and call edges of callgrind lines
+
+    scale -- seconds per unit of the (first) event, default from its name
+    """
+
+    def __init__(self, scale=None):
+        self.scale = scale
+        self.line_index = 0
+        self.names = {'file': {}, 'function': {}, 'object': {}}
+        # (file, name) -> [self cost, first line]
+        self.functions = {}
+        # (caller, callee) -> [calls, inclusive cost]
+        self.edges = defaultdict(lambda: [0, 0])
+        self.positions = ['line']
+        self.last_position = None
+        self.file = self.function_file = self.callee_file = ''
+        self.function = None
+        self.call = None
+
+    def feed(self, line):
+        """Parse a single line of a callgrind file"""
+        line = line.strip()
+        if not line or line.startswith('#'):
+            return
+        first = line[0]
+        if first.isdigit() or first in '+-*':
+            self.cost(line)
+            return
+        spec, equals, value = line.partition('=')
+        if equals and spec in FILE_SPECS:
+            name = self.compressed('file', value)
+            if spec == 'fl':
+                self.file = self.function_file = name
+            elif spec in ('fi', 'fe'):
+                self.file = name
+            else:
+                self.callee_file = name
+        elif equals and spec == 'fn':
+            self.function = self.define(
+                self.function_file, self.compressed('function', value))
+            self.file = self.function_file
+        elif equals and spec == 'cfn':
+            callee = self.compressed('function', value)
+            self.call = [
+                (self.callee_file or self.function_file, callee), None,
+            ]
+        elif equals and spec == 'calls':
+            if self.call is None:
+                raise ValueError(
+                    'calls= without cfn= at line %s' % (self.line_index,))
+            self.call[1] = int(value.split()[0])
+        elif equals and spec in OBJECT_SPECS:
+            self.compressed('object', value)
+        elif line.startswith('positions:'):
+            self.positions = line.split(':', 1)[1].split()
+        elif line.startswith('events:'):
+            events = line.split(':', 1)[1].split()
+            if self.scale is None:
+                self.scale = SCALES.get(events[0], 1.0) if events else 1.0
+        # other headers (version, creator, cmd, summary, totals, ...) are
+        # ignored
+
+    def compressed(self, kind, value):
+        """Resolve (id) name compression, defining the id if a name follows"""
+        value = value.strip()
+        if not value.startswith('('):
+            return sys.intern(value)
+        end = value.index(')')
+        key, name = value[1:end], value[end+1:].strip()
+        table = self.names[kind]
+        if name:
+            table[key] = name = sys.intern(name)
+            return name
+        try:
+            return table[key]
+        except KeyError:
+            raise ValueError('Undefined %s id (%s) at line %s' % (
+                kind, key, self.line_index))
+
+    def define(self, file, name):
+        key = (file, name)
+        if key not in self.functions:
+            self.functions[key] = [0, None]
+        return key
+
+    def cost(self, line):
+        parts = line.split()
+        positions = parts[:len(self.positions)]
+        lineno = self.position(positions)
+        value = 0
+        if len(parts) > len(self.positions):
+            value = int(parts[len(self.positions)])
+        if self.function is None:
+            raise ValueError(
+                'Cost line before fn= at line %s' % (self.line_index,))
+        record = self.functions[self.function]
+        if record[1] is None:
+            record[1] = lineno
+        if self.call is not None and self.call[1] is not None:
+            callee, calls = self.call
+            self.define(*callee)
+            edge = self.edges[(self.function, callee)]
+            edge[0] += calls
+            edge[1] += value
+            self.call = None
+            self.callee_file = ''
+        else:
+            record[0] += value
+
+    def position(self, positions):
+        """Decode (relative) positions, returning the line number"""
+        last = self.last_position or [0] * len(self.positions)
+        current = []
+        for value, previous in zip(positions, last):
+            if value == '*':
+                number = previous
+            elif value[0] in '+-':
+                number = previous + int(value, 0)
+            else:
+                number = int(value, 0)
+            current.append(number)
+        self.last_position = current
+        if 'line' in self.positions:
+            return current[self.positions.index('line')]
+        return 0
+
+    def stats(self):
+        """Build raw pstats-format stats from everything parsed so far"""
+        scale = self.scale or 1.0
+        keys = {}
+        for function, (cost, line) in self.functions.items():
+            file, name = function
+            match = LINE_SUFFIX.match(name)
+            if match:
+                name, line = match.group('name'), int(match.group('line'))
+            keys[function] = (file, line or 0, name)
+        callers = defaultdict(dict)
+        outgoing = defaultdict(float)
+        incoming = defaultdict(int)
+        for (caller, callee), (calls, cost) in self.edges.items():
+            callers[callee][keys[caller]] = (calls, calls, 0.0, cost * scale)
+            incoming[callee] += calls
+            if caller != callee:
+                outgoing[caller] += cost * scale
+        stats = {}
+        for function, (cost, line) in self.functions.items():
+            local = cost * scale
+            calls = incoming.get(function) or 1
+            stats[keys[function]] = (
+                calls, calls, local, local + outgoing.get(function, 0.0),
+                callers.get(function, {}),
+            )
+        return stats
+
+
+def read(filename, scale=None):
+    """Read a callgrind file as raw pstats-format stats"""
+    parser = CallgrindParser(scale=scale)
+    with open(filename, encoding='utf-8', errors='surrogateescape') as handle:
+        for parser.line_index, line in enumerate(handle, 1):
+            parser.feed(line)
+    return parser.stats()
+
+
+def write(stats, filename):
+    """Write raw pstats-format stats as a callgrind file"""
+    ids = {'file': {}, 'function': {}}
+
+    def compressed(kind, name):
+        table = ids[kind]
+        if name in table:
+            return '(%d)' % (table[name],)
+        table[name] = len(table) + 1
+        return '(%d) %s' % (table[name], name)
+
+    # functions sharing a name within a file are told apart by their line
+    names = defaultdict(set)
+    for file, line, name in stats:
+        names[(file, name)].add(line)
+
+    def label(func):
+        file, line, name = func
+        if len(names[(file, name)]) > 1:
+            return "%s'%d" % (name, line)
+        return name
+
+    callees = defaultdict(list)
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, data in callers.items():
+            if not isinstance(data, tuple):
+                data = (data, data, 0.0, data)
+            callees[caller].append((func, data))
+    units = 1.0 / SCALES[EXPORT_EVENT]
+    total = sum([tt for (cc, nc, tt, ct, callers) in stats.values()])
+    with open(filename, 'w', encoding='utf-8',
+              errors='surrogateescape') as handle:
+        handle.write('# callgrind format\n')
+        handle.write('version: 1\n')
+        handle.write('creator: snakerunner\n')
+        handle.write('positions: line\n')
+        handle.write('event: %s : Time (nanoseconds)\n' % (EXPORT_EVENT,))
+        handle.write('events: %s\n' % (EXPORT_EVENT,))
+        handle.write('summary: %d\n\n' % (int(total * units),))
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            file, line = func[0], func[1]
+            handle.write('fl=%s\n' % (compressed('file', file),))
+            handle.write('fn=%s\n' % (compressed('function', label(func)),))
+            handle.write('%d %d\n' % (line, int(tt * units)))
+            for callee, data in callees.get(func, ()):
+                calls, primitive, local, cumulative = data
+                if callee[0] != file:
+                    handle.write('cfl=%s\n' % (compressed('file', callee[0]),))
+                handle.write(
+                    'cfn=%s\n' % (compressed('function', label(callee)),))
+                handle.write('calls=%d %d\n' % (calls, callee[1]))
+                handle.write('%d %d\n' % (line, int(cumulative * units)))
+            handle.write('\n')
+    return filename
@@ -0,0 +1,496 @@
+"""Performance regression checks of candidate profiles against baselines (CI)
+
+    snakerunner check --rules perf.ini [--junit FILE] [--json FILE] \
+        baseline candidate
+    snakerunner check --rules perf.ini baselines/ candidates/
+
+Directories are compared file by file (profiles with the same relative
+name). Functions are matched by their normalised name, module:function
+(e.g. json.decoder:raw_decode, see profile.module_name), so profiles taken
+on different machines, virtualenvs or checkouts compare equal and line
+numbers may move.
+
+The rules file is an INI file:
+
+    [check]
+    # ignore functions below this cumulative time (seconds) in both profiles
+    min_time = 0.01
+    # allowed relative growth of cumulative time and call counts (0.25 = 25%)
+    max_growth = 0.25
+    max_calls_growth = 0.5
+    # new functions taking more than this fraction of the run fail
+    new_hot = 0.05
+    # compare times as fractions of the run's total instead of seconds,
+    # for runners of differing speed
+    relative = false
+
+    [function json.decoder:*]
+    # budget (cumulative seconds), maximum calls, and min_time, max_growth,
+    # max_calls_growth or new_hot to override those of [check]
+    budget = 0.2
+    calls = 10000
+    max_growth = 0.1
+
+    [package myapp.db]
+    # local time of the package's functions (the package and submodules)
+    budget = 0.5
+    max_growth = 0.1
+
+Function patterns are shell-style (fnmatch), matched against the
+normalised name, or against the bare function name if they have no ':'.
+
+Exit codes: 0 if every check passed, 1 if any failed, 2 for usage errors
+(unreadable rules or profiles, unpaired files).
+"""
+import os
+import sys
+import json
+import time
+import logging
+import configparser
+from fnmatch import fnmatchcase
+from xml.etree import ElementTree
+
+from snakerunner import profile as profiling
+
+log = logging.getLogger(__name__)
+
+CHECK_SECTION = 'check'
+DEFAULTS = {
+    'min_time': 0.01,
+    'max_growth': None,
+    'max_calls_growth': None,
+    'new_hot': None,
+    'relative': False,
+}
+OPTIONS = (
+    'budget', 'calls', 'min_time', 'max_growth', 'max_calls_growth', 'new_hot',
+)
+PACKAGE_OPTIONS = ('budget', 'max_growth')
+
+
+class RulesError(ValueError):
+    """Raised for a malformed rules file"""
+
+
+class Rules(object):
+    """The checks to run, read from an INI rules file (see the module docs)"""
+
+    def __init__(self, defaults=None, functions=(), packages=()):
+        self.defaults = dict(DEFAULTS)
+        self.defaults.update(defaults or {})
+        self.functions = list(functions)
+        self.packages = list(packages)
+
+    @classmethod
+    def read(cls, filename):
+        config = configparser.ConfigParser(interpolation=None)
+        config.optionxform = str
+        try:
+            with open(filename) as fh:
+                config.read_file(fh)
+        except (OSError, configparser.Error) as err:
+            raise RulesError('Unable to read rules %s: %s' % (filename, err))
+        defaults = {}
+        functions = []
+        packages = []
+        for section in config.sections():
+            kind, _, pattern = section.partition(' ')
+            pattern = pattern.strip()
+            if kind == CHECK_SECTION and not pattern:
+                defaults = cls.options(config, section, DEFAULTS)
+            elif kind == 'function' and pattern:
+                functions.append(
+                    (pattern, cls.options(config, section, OPTIONS)))
+            elif kind == 'package' and pattern:
+                packages.append(
+                    (pattern, cls.options(config, section, PACKAGE_OPTIONS)))
+            else:
+                raise RulesError(
+                    '%s: unknown section [%s]' % (filename, section))
+        return cls(defaults, functions, packages)
+
+    @staticmethod
+    def options(config, section, known):
+        options = {}
+        for option in config.options(section):
+            if option not in known:
+                raise RulesError(
+                    '[%s]: unknown option %r' % (section, option))
+            try:
+                if option == 'relative':
+                    options[option] = config.getboolean(section, option)
+                elif option == 'calls':
+                    options[option] = config.getint(section, option)
+                else:
+                    options[option] = config.getfloat(section, option)
+            except ValueError as err:
+                raise RulesError('[%s] %s: %s' % (section, option, err))
+        return options
+
+    def function_rules(self, function):
+        """The (pattern, options) of the [function] sections matching function
+
+        function -- a normalised name, module:function
+        """
+        name = function.partition(':')[2]
+        return [
+            (pattern, options) for pattern, options in self.functions
+            if fnmatchcase(function, pattern)
+            or (':' not in pattern and fnmatchcase(name, pattern))
+        ]
+
+
+class Result(object):
+    """Outcome of a single check
+
+    check -- the kind of check, e.g. max_growth or budget
+    subject -- the normalised function or package name checked
+    """
+
+    def __init__(
+        self, check, subject, passed, value=None, reference=None, limit=None,
+        message='',
+    ):
+        self.check = check
+        self.subject = subject
+        self.passed = passed
+        self.value = value
+        self.reference = reference
+        self.limit = limit
+        self.message = message
+
+    def __repr__(self):
+        return 'Result( %s %s %s )' % (
+            self.check, self.subject, 'passed' if self.passed else 'FAILED',
+        )
+
+    @property
+    def name(self):
+        if self.subject:
+            return '%s %s' % (self.check, self.subject)
+        return self.check
+
+    def record(self):
+        return {
+            'check': self.check,
+            'subject': self.subject,
+            'passed': self.passed,
+            'value': self.value,
+            'baseline': self.reference,
+            'limit': self.limit,
+            'message': self.message,
+        }
+
+
+class Comparison(object):
+    """Results of checking one candidate profile against its baseline"""
+
+    def __init__(self, name, baseline, candidate):
+        self.name = name
+        self.baseline = baseline
+        self.candidate = candidate
+        self.results = []
+        self.time = 0.0
+
+    @property
+    def passed(self):
+        return all(result.passed for result in self.results)
+
+    @property
+    def failures(self):
+        return [result for result in self.results if not result.passed]
+
+    def record(self):
+        return {
+            'name': self.name,
+            'baseline': self.baseline,
+            'candidate': self.candidate,
+            'passed': self.passed,
+            'time': self.time,
+            'results': [result.record() for result in self.results],
+        }
+
+
+def normalised(loaded):
+    """Totals per normalised function name of a profiling.Profile
+
+    Returns ({name: [calls, cumulative, local, module]}, total); functions
+    sharing a name (e.g. lambdas in a file) are summed.
+    """
+    paths = loaded.loader.paths
+    functions = {}
+    for row in loaded:
+        module = profiling.module_name(
+            paths.location(row.directory) or '<built-in>', row.filename,
+        )
+        name = '%s:%s' % (module, row.name)
+        totals = functions.get(name)
+        if totals is None:
+            functions[name] = [row.calls, row.cumulative, row.local, module]
+        else:
+            totals[0] += row.calls
+            totals[1] += row.cumulative
+            totals[2] += row.local
+    return functions, loaded.total
+
+
+def in_package(module, package):
+    return (
+        module == package or module.startswith(package + '.')
+        or fnmatchcase(module, package)
+    )
+
+
+def growth(value, reference):
+    if not reference:
+        return None if not value else float('inf')
+    return (value - reference) / reference
+
+
+def check_growth(results, check, subject, value, reference, limit, unit):
+    change = growth(value, reference)
+    if change is None:
+        return
+    if change <= limit:
+        return
+    results.append(Result(
+        check, subject, False, value, reference, limit,
+        '%s grew %s (%s -> %s, allowed %.0f%%)' % (
+            unit, format_growth(change), format_value(reference),
+            format_value(value), limit * 100,
+        ),
+    ))
+
+
+def format_growth(change):
+    if change == float('inf'):
+        return 'without bound'
+    return 'by %.1f%%' % (change * 100)
+
+
+def format_value(value):
+    return '%d' % value if isinstance(value, int) else '%.4g' % value
+
+
+def compare(baseline, candidate, rules, name=None):
+    """Check profiling.Profile candidate against baseline, as a Comparison"""
+    comparison = Comparison(
+        name or ', '.join(candidate.loader.filename),
+        ', '.join(baseline.loader.filename),
+        ', '.join(candidate.loader.filename),
+    )
+    results = comparison.results
+    base_functions, base_total = normalised(baseline)
+    functions, total = normalised(candidate)
+    defaults = rules.defaults
+    relative = defaults['relative']
+
+    def scaled(value, run_total):
+        if relative:
+            return value / run_total if run_total else 0.0
+        return value
+
+    for function, (calls, cumulative, local, module) in functions.items():
+        matched = rules.function_rules(function)
+        options = dict(defaults)
+        for pattern, specific in matched:
+            options.update(specific)
+        reference = base_functions.get(function)
+        value = scaled(cumulative, total)
+        if 'budget' in options:
+            budget = options['budget']
+            results.append(Result(
+                'budget', function, cumulative <= budget, cumulative, None,
+                budget,
+                'cumulative time %.4gs (budget %.4gs)' % (cumulative, budget),
+            ))
+        if 'calls' in options:
+            limit = options['calls']
+            results.append(Result(
+                'calls', function, calls <= limit, calls, None, limit,
+                '%d calls (at most %d)' % (calls, limit),
+            ))
+        if reference is None:
+            new_hot = options['new_hot']
+            share = cumulative / total if total else 0.0
+            if new_hot is not None and share > new_hot:
+                results.append(Result(
+                    'new_hot', function, False, share, None, new_hot,
+                    'new function takes %.1f%% of the run (allowed %.1f%%)' % (
+                        share * 100, new_hot * 100),
+                ))
+            continue
+        base_calls, base_cumulative = reference[0], reference[1]
+        if max(cumulative, base_cumulative) < options['min_time']:
+            continue
+        if options['max_growth'] is not None:
+            check_growth(
+                results, 'max_growth', function, value,
+                scaled(base_cumulative, base_total), options['max_growth'],
+                'cumulative time' + (' (share of run)' if relative else ''),
+            )
+        if options['max_calls_growth'] is not None:
+            check_growth(
+                results, 'max_calls_growth', function, calls, base_calls,
+                options['max_calls_growth'], 'calls',
+            )
+    for pattern, options in rules.packages:
+        local = sum(
+            totals[2] for totals in functions.values()
+            if in_package(totals[3], pattern)
+        )
+        if 'budget' in options:
+            budget = options['budget']
+            results.append(Result(
+                'package_budget', pattern, local <= budget, local, None,
+                budget, 'local time %.4gs (budget %.4gs)' % (local, budget),
+            ))
+        if 'max_growth' in options:
+            limit = options['max_growth']
+            base_local = sum(
+                totals[2] for totals in base_functions.values()
+                if in_package(totals[3], pattern)
+            )
+            change = growth(
+                scaled(local, total), scaled(base_local, base_total))
+            passed = change is None or change <= limit
+            results.append(Result(
+                'package_growth', pattern, passed, local, base_local, limit,
+                'local time grew %s (allowed %.0f%%)' % (
+                    format_growth(change or 0.0), limit * 100),
+            ))
+    for check in ('max_growth', 'max_calls_growth', 'new_hot'):
+        checked = any(result.check == check for result in results)
+        if defaults[check] is not None and not checked:
+            results.append(Result(check, '', True, limit=defaults[check]))
+    return comparison
+
+
+def pairs(baseline, candidate):
+    """Pair up baseline and candidate profiles (files, or directories of them)
+
+    Returns [(name, baseline, candidate)], raises ValueError for unpaired
+    profiles.
+    """
+    if not os.path.isdir(baseline) and not os.path.isdir(candidate):
+        return [(os.path.basename(candidate), baseline, candidate)]
+    if not (os.path.isdir(baseline) and os.path.isdir(candidate)):
+        raise ValueError(
+            'Compare two files or two directories, not %s and %s' % (
+                baseline, candidate))
+    found = []
+    missing = []
+    for directory, subdirectories, filenames in os.walk(candidate):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, candidate)
+            reference = os.path.join(baseline, name)
+            if os.path.isfile(reference):
+                found.append((name, reference, path))
+            else:
+                missing.append(name)
+    if missing:
+        raise ValueError('No baseline for %s' % (', '.join(missing),))
+    if not found:
+        raise ValueError('No profiles in %s' % (candidate,))
+    return found
+
+
+def write_json(comparisons, filename):
+    with open(filename, 'w') as fh:
+        json.dump({
+            'passed': all(comparison.passed for comparison in comparisons),
+            'profiles': [comparison.record() for comparison in comparisons],
+        }, fh, indent=1)
+
+
+def write_junit(comparisons, filename):
+    """Write JUnit XML, a testsuite per profile and a testcase per result"""
+    suites = ElementTree.Element('testsuites', {
+        'name': 'snakerunner check',
+        'tests': str(sum(
+            len(comparison.results) for comparison in comparisons)),
+        'failures': str(sum(
+            len(comparison.failures) for comparison in comparisons)),
+    })
+    for comparison in comparisons:
+        suite = ElementTree.SubElement(suites, 'testsuite', {
+            'name': comparison.name,
+            'tests': str(len(comparison.results)),
+            'failures': str(len(comparison.failures)),
+            'errors': '0',
+            'time': '%.3f' % comparison.time,
+        })
+        for result in comparison.results:
+            case = ElementTree.SubElement(suite, 'testcase', {
+                'classname': comparison.name,
+                'name': result.name,
+            })
+            if not result.passed:
+                failure = ElementTree.SubElement(case, 'failure', {
+                    'type': result.check, 'message': result.message,
+                })
+                failure.text = '%s: %s' % (result.subject, result.message)
+    ElementTree.ElementTree(suites).write(
+        filename, encoding='utf-8', xml_declaration=True)
+
+
+def run(rules, paired, junit=None, json_file=None, transforms=()):
+    """Run the checks for [(name, baseline, candidate)], returns Comparisons"""
+    comparisons = []
+    for name, baseline, candidate in paired:
+        start = time.perf_counter()
+        comparison = compare(
+            profiling.Profile.open(baseline, transforms=transforms),
+            profiling.Profile.open(candidate, transforms=transforms),
+            rules, name,
+        )
+        comparison.time = time.perf_counter() - start
+        comparisons.append(comparison)
+        for failure in comparison.failures:
+            log.error('%s: %s %s: %s', name, failure.check, failure.subject,
+                      failure.message)
+        log.info('%s: %s (%d checks, %.2fs)', name,
+                 'passed' if comparison.passed else 'FAILED',
+                 len(comparison.results), comparison.time)
+    if junit:
+        write_junit(comparisons, junit)
+    if json_file:
+        write_json(comparisons, json_file)
+    return comparisons
+
+
+def main(args):
+    """Entry point of snakerunner check, returns the exit code"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='snakerunner check',
+        description='Fail when candidate profiles regress against baselines',
+    )
+    parser.add_argument('--rules', required=True, help='INI rules file')
+    parser.add_argument('--junit', help='write JUnit XML results to this file')
+    parser.add_argument('--json', help='write JSON results to this file')
+    parser.add_argument('--transform', action='append', default=[],
+                        help='transform both profiles first, e.g. '
+                        'ignore=logging (repeatable)')
+    parser.add_argument('baseline',
+                        help='baseline profile, or directory of profiles')
+    parser.add_argument('candidate',
+                        help='candidate profile, or directory of profiles')
+    options = parser.parse_args(args)
+    try:
+        rules = Rules.read(options.rules)
+        paired = pairs(options.baseline, options.candidate)
+        comparisons = run(
+            rules, paired, options.junit, options.json, options.transform)
+    except (ValueError, OSError, TypeError, EOFError) as err:
+        log.error('%s', err)
+        return 2
+    return 0 if all(comparison.passed for comparison in comparisons) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
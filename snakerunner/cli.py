@@ -0,0 +1,191 @@
+"""Command line entry point for snakerunner
+
+Only the modules a command needs are imported, so wxPython (and the GUI
+modules) are not loaded until the viewer is actually started.
+
+    snakerunner [--startup-timing] [--sources[=PATTERN]] [profile ...]
+    snakerunner convert input [input ...] output
+    snakerunner serve [--host HOST] [--port PORT] profile [profile ...]
+    snakerunner check --rules RULES [--junit FILE] [--json FILE] \
+        baseline candidate
+
+--startup-timing (or SNAKERUNNER_STARTUP_TIMING=1) logs the time taken by
+each import (like python -X importtime) and the time until the main
+window is shown. --sources keeps a per-source (worker) breakdown of
+several profiles, PATTERN is a regular expression naming the source of
+each file (see sources).
+
+convert merges the input profiles (cProfile dumps, columnar archives or
+callgrind files) into output, written as callgrind if it is named
+callgrind.out* or *.callgrind, as a columnar archive if *.npz, and as a
+cProfile (marshal) dump otherwise. It needs neither wxPython nor a display.
+
+serve makes the profiles viewable in a web browser (see server), for hosts
+without a display.
+
+check fails (exits 1) when candidate profiles regress against baseline
+profiles according to a rules file, for CI (see check).
+
+snakerunner is installed as a console script, so the commands' output and
+exit status reach the shell (or CI) on Windows too; runsnake only starts
+the viewer and is installed as a GUI script, without a console window.
+"""
+import os
+import sys
+import time
+import builtins
+import logging
+
+START = time.perf_counter()
+
+log = logging.getLogger(__name__)
+
+TIMING_FLAG = '--startup-timing'
+TIMING_VARIABLE = 'SNAKERUNNER_STARTUP_TIMING'
+# imports faster than this are left out of the report
+REPORT_THRESHOLD = 0.001
+
+
+class StartupTiming(object):
+    """Record the imports and milestones of starting up"""
+
+    def __init__(self, start=START):
+        self.start = start
+        self.marks = []
+        self.imports = []
+        self.depth = 0
+        self.original_import = None
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.start))
+
+    def __enter__(self):
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.timed_import
+        return self
+
+    def __exit__(self, *args):
+        builtins.__import__ = self.original_import
+
+    def timed_import(
+        self, name, globals=None, locals=None, fromlist=(), level=0,
+    ):
+        if level or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.depth -= 1
+            self.imports.append(
+                (self.depth, name, time.perf_counter() - start))
+
+    def window_shown(self):
+        self.mark('window shown')
+        self.report()
+
+    def report(self):
+        """Log the imports (children before parents) and milestones"""
+        log.info('Startup imports (cumulative ms | module):')
+        for depth, name, duration in self.imports:
+            if duration >= REPORT_THRESHOLD:
+                log.info('%10.1f | %s%s', duration * 1000, '  ' * depth, name)
+        for label, elapsed in self.marks:
+            log.info('%s after %.1fms', label, elapsed * 1000)
+
+
+def gui(args, timing=None):
+    """Start the viewer for the profiles in args"""
+    sys.argv[1:] = args
+    if timing is None:
+        from snakerunner import snakerunner
+    else:
+        with timing:
+            from snakerunner import snakerunner
+        timing.mark('modules imported')
+    return snakerunner.main(startup=timing)
+
+
+def output_format(filename):
+    """Format to write filename in: 'callgrind', 'columnar' or 'pstats'"""
+    basename = os.path.basename(filename)
+    if basename.startswith('callgrind.out') or basename.endswith('.callgrind'):
+        return 'callgrind'
+    if basename.endswith('.npz'):
+        return 'columnar'
+    return 'pstats'
+
+
+def convert(args):
+    """Convert (and merge) profiles between the supported formats"""
+    if len(args) < 2:
+        sys.stderr.write(
+            'Usage: snakerunner convert input [input ...] output\n')
+        return 2
+    from snakerunner import pstatsloader
+    inputs, output = args[:-1], args[-1]
+    stats = pstatsloader.load_stats(inputs)
+    kind = output_format(output)
+    if kind == 'callgrind':
+        from snakerunner import callgrind
+        callgrind.write(stats.stats, output)
+    elif kind == 'columnar':
+        from snakerunner import columnar
+        columnar.write(stats.stats, output)
+    else:
+        stats.dump_stats(output)
+    log.info('Converted %s to %s (%s)', ', '.join(inputs), output, kind)
+    return 0
+
+
+def serve(args):
+    """Serve profiles to web browsers"""
+    import argparse
+    from snakerunner import server
+    parser = argparse.ArgumentParser(prog='snakerunner serve')
+    parser.add_argument('--host', default=server.DEFAULT_HOST,
+                        help='address to listen on (default %(default)s)')
+    parser.add_argument('--port', type=int, default=server.DEFAULT_PORT,
+                        help='port to listen on (default %(default)s)')
+    parser.add_argument('profiles', nargs='+', help='profile files to serve')
+    options = parser.parse_args(args)
+    return server.serve(options.profiles, host=options.host, port=options.port)
+
+
+def check(args):
+    """Check profiles for performance regressions"""
+    from snakerunner import check
+    return check.main(args)
+
+
+COMMANDS = {
+    'convert': convert,
+    'serve': serve,
+    'check': check,
+}
+
+
+def main(argv=None):
+    """Run the snakerunner command line"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        logging.basicConfig(level=logging.INFO)
+        return COMMANDS[argv[0]](argv[1:])
+    return gui_main(argv)
+
+
+def gui_main(argv=None):
+    """Start the viewer (the runsnake entry point, which has no console)"""
+    if argv is None:
+        argv = sys.argv[1:]
+    timing = None
+    if TIMING_FLAG in argv or os.environ.get(TIMING_VARIABLE):
+        argv = [arg for arg in argv if arg != TIMING_FLAG]
+        timing = StartupTiming()
+    return gui(argv, timing)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
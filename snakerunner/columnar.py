@@ -0,0 +1,221 @@
+"""Export/import a loaded profile as columns in a NumPy (.npz) archive
+
+The archive holds one uncompressed .npy member per column, so it can be
+read with numpy.load() (or pandas) for analysis, while reading it back
+here maps the file and views the columns in place (no copying, no
+unmarshalling), without needing NumPy installed:
+
+    strings_data, strings_offsets   -- utf-8 string table (Arrow style)
+    file, line, name                -- function key (file, name index strings)
+    cc, nc, tt, ct                  -- primitive/total calls, local, cumulative
+    edge_caller, edge_callee        -- edge end-points (indices of functions)
+    edge_nc, edge_cc, edge_tt, edge_ct  -- per-edge pstats caller values
+"""
+import os
+import ast
+import mmap
+import sys
+import struct
+import logging
+import zipfile
+from array import array
+
+log = logging.getLogger(__name__)
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# array typecode -> npy descr (little-endian)
+DESCR = {
+    'B': '|u1',
+    'i': '<i4',
+    'q': '<i8',
+    'd': '<f8',
+}
+TYPECODE = dict([(descr, typecode) for typecode, descr in DESCR.items()])
+ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+FUNCTION_COLUMNS = (('file', 'i'), ('line', 'i'), ('name', 'i'),
+                    ('cc', 'q'), ('nc', 'q'), ('tt', 'd'), ('ct', 'd'))
+EDGE_COLUMNS = (('edge_caller', 'i'), ('edge_callee', 'i'),
+                ('edge_nc', 'q'), ('edge_cc', 'q'),
+                ('edge_tt', 'd'), ('edge_ct', 'd'))
+
+
+def is_columnar(filename):
+    """Is filename a columnar (zip-based) profile archive?"""
+    return zipfile.is_zipfile(filename)
+
+
+def write(stats, filename):
+    """Write raw pstats-format stats as a columnar archive"""
+    strings = {}
+    columns = dict([
+        (name, array(typecode))
+        for name, typecode in FUNCTION_COLUMNS + EDGE_COLUMNS
+    ])
+
+    def string(value):
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    functions = dict([(func, index) for index, func in enumerate(stats)])
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        file, line, name = func
+        columns['file'].append(string(file))
+        columns['line'].append(line)
+        columns['name'].append(string(name))
+        columns['cc'].append(cc)
+        columns['nc'].append(nc)
+        columns['tt'].append(tt)
+        columns['ct'].append(ct)
+        for caller, data in callers.items():
+            if caller not in functions:
+                continue
+            if not isinstance(data, tuple):
+                data = (data, data, 0.0, 0.0)
+            columns['edge_caller'].append(functions[caller])
+            columns['edge_callee'].append(functions[func])
+            for column, value in zip(
+                ('edge_nc', 'edge_cc', 'edge_tt', 'edge_ct'), data,
+            ):
+                columns[column].append(value)
+    data = array('B')
+    offsets = array('q', [0])
+    for value in sorted(strings, key=strings.get):
+        data.frombytes(value.encode('utf-8', 'surrogateescape'))
+        offsets.append(len(data))
+    columns['strings_data'] = data
+    columns['strings_offsets'] = offsets
+    temp = filename + '~'
+    with zipfile.ZipFile(temp, 'w', zipfile.ZIP_STORED) as archive:
+        for name, column in sorted(columns.items()):
+            archive.writestr(name + '.npy', npy_bytes(column))
+    os.replace(temp, filename)
+    return filename
+
+
+def npy_bytes(column):
+    """Serialise an array as a (version 1.0) .npy file"""
+    if sys.byteorder != 'little' and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (
+        DESCR[column.typecode], len(column))
+    # total header length (magic, length, header, newline) is a multiple of 64
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    return (
+        NPY_MAGIC + struct.pack('<H', len(header)) + header
+        + column.tobytes()
+    )
+
+
+class ColumnarProfile(object):
+    """The columns of a columnar archive, viewed in place in a memory map"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.columns = {}
+        self.views = []
+        with open(filename, 'rb') as handle:
+            self.map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        with zipfile.ZipFile(filename) as archive:
+            for info in archive.infolist():
+                if not info.filename.endswith('.npy'):
+                    continue
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError('Compressed column %s can not be mapped'
+                                     % (info.filename,))
+                self.columns[info.filename[:-4]] = self.view(info)
+        self.strings = self.decode_strings()
+
+    def view(self, info):
+        """Create a (zero-copy) memoryview of the array in a member"""
+        fields = ZIP_LOCAL_HEADER.unpack_from(self.map, info.header_offset)
+        name_length, extra_length = fields[-2], fields[-1]
+        start = (
+            info.header_offset + ZIP_LOCAL_HEADER.size
+            + name_length + extra_length
+        )
+        if self.map[start:start + len(NPY_MAGIC) - 2] != NPY_MAGIC[:-2]:
+            raise ValueError(
+                'Column %s is not a .npy array' % (info.filename,))
+        major = self.map[start + 6]
+        if major == 1:
+            (header_length,) = struct.unpack_from('<H', self.map, start + 8)
+            data = start + 10 + header_length
+        else:
+            (header_length,) = struct.unpack_from('<I', self.map, start + 8)
+            data = start + 12 + header_length
+        header = ast.literal_eval(
+            self.map[data - header_length:data].decode('latin1'))
+        typecode = TYPECODE.get(header['descr'])
+        if (typecode is None or header['fortran_order']
+                or len(header['shape']) != 1):
+            raise ValueError(
+                'Unsupported column %s: %s' % (info.filename, header))
+        (count,) = header['shape']
+        size = count * array(typecode).itemsize
+        view = memoryview(self.map)
+        self.views.append(view)
+        view = view[data:data + size]
+        self.views.append(view)
+        if sys.byteorder != 'little' and typecode != 'B':
+            swapped = array(typecode, view.tobytes())
+            swapped.byteswap()
+            return memoryview(swapped)
+        view = view.cast(typecode)
+        self.views.append(view)
+        return view
+
+    def decode_strings(self):
+        data = self.columns['strings_data']
+        offsets = self.columns['strings_offsets']
+        return [
+            bytes(data[offsets[i]:offsets[i+1]]).decode(
+                'utf-8', 'surrogateescape')
+            for i in range(len(offsets) - 1)
+        ]
+
+    def __len__(self):
+        return len(self.columns['cc'])
+
+    def keys(self):
+        """The (file, line, name) keys of the functions, in column order"""
+        strings = self.strings
+        return [
+            (strings[file], line, strings[name])
+            for file, line, name in zip(
+                self.columns['file'], self.columns['line'],
+                self.columns['name'])
+        ]
+
+    def raw_stats(self):
+        """Build raw pstats-format stats from the columns"""
+        c = self.columns
+        keys = self.keys()
+        stats = {}
+        for key, cc, nc, tt, ct in zip(
+            keys, c['cc'], c['nc'], c['tt'], c['ct'],
+        ):
+            stats[key] = (cc, nc, tt, ct, {})
+        for caller, callee, nc, cc, tt, ct in zip(
+            c['edge_caller'], c['edge_callee'],
+            c['edge_nc'], c['edge_cc'], c['edge_tt'], c['edge_ct'],
+        ):
+            stats[keys[callee]][4][keys[caller]] = (nc, cc, tt, ct)
+        return stats
+
+    def close(self):
+        """Release the columns and the memory map (then unusable)"""
+        for view in self.views[::-1]:
+            view.release()
+        self.views = []
+        self.columns = {}
+        self.map.close()
+
+
+def read(filename):
+    """Open a columnar profile archive"""
+    return ColumnarProfile(filename)
@@ -0,0 +1,56 @@
+"""Graph algorithms over the call graph (independent of the row classes)"""
+import logging
+
+log = logging.getLogger(__name__)
+
+# nodes visited between checks for cancellation
+CHECK_INTERVAL = 1024
+
+
+def strongly_connected(roots, successors, check=None):
+    """Tarjan's strongly connected components of the graph reachable from roots
+
+    Iterative (call graphs can be far deeper than the recursion limit),
+    components are returned in reverse topological order: every component
+    comes after all the components it leads to.
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in roots:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    if check is not None and not len(index) % CHECK_INTERVAL:
+                        check()
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors(child))))
+                    break
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
@@ -0,0 +1,169 @@
+"""Rank the heaviest call paths from the root of a profile
+
+The time of a call path is the own (local) time of the function it ends
+in, scaled at each step by the fraction of the callee's time that arrived
+through that call edge (the edge's cumulative time over all the time
+flowing into the callee), i.e. the estimate of the time spent in the
+function when called along this path.
+
+Recursive cycles are condensed (Tarjan's algorithm) into single nodes, the
+best paths are then found by dynamic programming over the resulting DAG,
+keeping only the top count paths of each node, so the work is linear in
+the edges for a fixed count. Paths share their tails, so memory is too.
+"""
+import heapq
+import logging
+import operator
+from gettext import gettext as _
+
+from snakerunner import instrument
+from snakerunner import graph
+
+log = logging.getLogger(__name__)
+
+DEFAULT_COUNT = 25
+# components processed between checks for cancellation
+CHECK_INTERVAL = 1024
+
+
+class HotPath(object):
+    """A ranked path from the root
+
+    nodes -- the rows from the root to the function the time is spent in
+    time -- the (estimated) local time spent at the end of the path
+    fraction -- time as a fraction of the root's cumulative time
+    recursive -- set of the nodes which stand for a recursive cycle
+    """
+
+    def __init__(self, nodes, time, fraction=0.0, recursive=()):
+        self.nodes = nodes
+        self.time = time
+        self.fraction = fraction
+        self.recursive = recursive
+
+    def __repr__(self):
+        return 'HotPath( %.4f, %s )' % (self.time, self.label())
+
+    @property
+    def node(self):
+        """The function the time of the path is spent in"""
+        return self.nodes[-1]
+
+    def label(self, separator=' > '):
+        return separator.join([
+            node_label(node, node in self.recursive) for node in self.nodes
+        ])
+
+
+def node_label(node, recursive=False):
+    name = getattr(node, 'name', '') or getattr(node, 'filename', '')
+    if recursive:
+        return _('%(name)s (recursive)') % {'name': name}
+    return name
+
+
+def callees(node):
+    """(callee, cumulative time along the edge) pairs for node"""
+    edges = getattr(node, 'callee_edges', None)
+    if edges is None:
+        # synthetic groups (the root of a multi-root run) just hold their
+        # children
+        return [
+            (child, getattr(child, 'cumulative', 0)) for child in node.children
+        ]
+    return [(edge.callee, edge.cumulative) for edge in edges]
+
+
+@instrument.timed
+def hot_paths(root, count=DEFAULT_COUNT, check=None):
+    """Find the count heaviest call paths starting at root
+
+    check -- optional callable invoked periodically, raises to abandon the
+        search
+
+    Returns a list of HotPath, heaviest first.
+    """
+    if root is None or count < 1:
+        return []
+    outgoing = {}
+
+    def successors(node):
+        edges = outgoing.get(node)
+        if edges is None:
+            edges = outgoing[node] = callees(node)
+        return [callee for callee, time in edges]
+
+    components = graph.strongly_connected([root], successors, check=check)
+    component_of = {}
+    for position, component in enumerate(components):
+        for member in component:
+            component_of[member] = position
+
+    # time flowing into each component from outside of it, and the condensed
+    # edges
+    inflow = [0.0] * len(components)
+    condensed = [{} for component in components]
+    for node, edges in outgoing.items():
+        source = component_of[node]
+        targets = condensed[source]
+        for callee, time in edges:
+            target = component_of[callee]
+            if target != source:
+                inflow[target] += time
+                targets[target] = targets.get(target, 0.0) + time
+
+    # best[c] -- the top paths starting at component c as (time, c, rest) where
+    # rest is the (shared) entry of the path's next component, or None
+    best = [None] * len(components)
+    serial = 0
+    for position, component in enumerate(components):
+        if check is not None and not position % CHECK_INTERVAL:
+            check()
+        local = sum([getattr(member, 'local', 0) or 0 for member in component])
+        # bounded min-heap of (time, serial, entry), serial avoids comparing
+        # entries
+        heap = []
+        if local > 0:
+            heap.append((local, serial, (local, position, None)))
+            serial += 1
+        for target, time in condensed[position].items():
+            if not inflow[target]:
+                continue
+            share = min((time / inflow[target], 1.0))
+            for entry in best[target]:
+                value = entry[0] * share
+                if len(heap) < count:
+                    heapq.heappush(
+                        heap, (value, serial, (value, position, entry)))
+                elif value > heap[0][0]:
+                    heapq.heapreplace(
+                        heap, (value, serial, (value, position, entry)))
+                else:
+                    # best[target] is heaviest first, the rest can't make it
+                    # either
+                    break
+                serial += 1
+        heap.sort(reverse=True)
+        best[position] = [item[2] for item in heap]
+
+    total = getattr(root, 'cumulative', 0) or 0
+    paths = []
+    for entry in best[component_of[root]]:
+        time = entry[0]
+        nodes = []
+        recursive = set()
+        while entry is not None:
+            component = components[entry[1]]
+            if len(component) > 1:
+                node = max(component, key=operator.attrgetter('cumulative'))
+                recursive.add(node)
+            else:
+                node = component[0]
+            nodes.append(node)
+            entry = entry[2]
+        paths.append(HotPath(
+            nodes, time,
+            fraction=time / total if total else 0.0,
+            recursive=recursive,
+        ))
+    return paths
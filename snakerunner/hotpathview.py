@@ -0,0 +1,65 @@
+"""Tree view of the ranked hot paths (see hotpaths) of a profile"""
+import logging
+from gettext import gettext as _
+
+import wx
+
+from snakerunner import squaremap
+from snakerunner import hotpaths
+
+log = logging.getLogger(__name__)
+
+
+class HotPathView(wx.TreeCtrl):
+    """Ranked call paths, each expandable into the functions along it
+
+    Clicking a path or one of its functions activates that function (as
+    double-clicking it in the square-map would).
+    """
+
+    def __init__(self, parent, id=-1, **named):
+        wx.TreeCtrl.__init__(
+            self, parent, id,
+            style=(wx.TR_HIDE_ROOT | wx.TR_HAS_BUTTONS | wx.TR_LINES_AT_ROOT
+                   | wx.TR_SINGLE),
+            **named
+        )
+        self.paths = []
+        # DeleteAllItems changes the selection, which is not the user's
+        self.rebuilding = False
+        self.Bind(wx.EVT_TREE_SEL_CHANGED, self.OnSelected)
+
+    def SetPaths(self, paths):
+        """Replace the paths shown with paths (a list of hotpaths.HotPath)"""
+        self.paths = paths
+        self.rebuilding = True
+        self.Freeze()
+        try:
+            self.DeleteAllItems()
+            root = self.AddRoot(_('Hot Paths'))
+            for rank, path in enumerate(paths):
+                item = self.AppendItem(root, '%d. %.4fs (%.1f%%)  %s' % (
+                    rank + 1, path.time, path.fraction * 100,
+                    hotpaths.node_label(path.node),
+                ))
+                self.SetItemData(item, path.node)
+                for node in path.nodes:
+                    child = self.AppendItem(
+                        item,
+                        hotpaths.node_label(node, node in path.recursive))
+                    self.SetItemData(child, node)
+        finally:
+            self.Thaw()
+            self.rebuilding = False
+
+    def OnSelected(self, event):
+        item = event.GetItem()
+        if self.rebuilding or not item.IsOk():
+            return
+        node = self.GetItemData(item)
+        if node is not None:
+            wx.PostEvent(
+                self,
+                squaremap.SquareActivationEvent(
+                    node=node, point=None, map=None)
+            )
@@ -0,0 +1,174 @@
+"""Timing hooks for profiling snakerunner itself
+
+Hot paths of the loader and the views are decorated with @timed. The hooks
+are only installed when SNAKERUNNER_INSTRUMENT is set in the environment
+when the modules are imported, otherwise timed() returns the function
+itself and costs nothing at all.
+
+The collected timings can be viewed with Debug -> Instrumentation, written
+as JSON, or written as a cProfile-format file (of the hooked functions and
+the calls between them) which snakerunner can open itself.
+"""
+import os
+import json
+import time
+import marshal
+import logging
+import threading
+import functools
+
+log = logging.getLogger(__name__)
+
+ENVIRONMENT = 'SNAKERUNNER_INSTRUMENT'
+enabled = bool(os.environ.get(ENVIRONMENT))
+
+timers = {}
+# per thread: stack of [timer, start, nested time] and active calls of
+# each timer (layouts and sorts are timed on the scheduler's thread too)
+local = threading.local()
+lock = threading.Lock()
+
+
+class Timer(object):
+    """Counters and a duration histogram for one hooked function
+
+    Local time excludes the time spent in nested hooked functions,
+    recursive calls only count towards cumulative time once (as cProfile).
+    """
+
+    # histogram bucket n counts calls taking less than 2**n microseconds
+    BUCKETS = 32
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.clear()
+
+    def clear(self):
+        self.calls = 0
+        self.primitive = 0
+        self.local = 0.0
+        self.cumulative = 0.0
+        self.maximum = 0.0
+        self.histogram = [0] * self.BUCKETS
+        # caller key: [calls, primitive calls, local, cumulative]
+        self.callers = {}
+
+    def record(self, elapsed, own, recursive, caller):
+        self.calls += 1
+        self.local += own
+        if not recursive:
+            self.primitive += 1
+            self.cumulative += elapsed
+        self.maximum = max(self.maximum, elapsed)
+        bucket = min(int(elapsed * 1e6).bit_length(), self.BUCKETS - 1)
+        self.histogram[bucket] += 1
+        if caller is not None:
+            edge = self.callers.get(caller.key)
+            if edge is None:
+                edge = self.callers[caller.key] = [0, 0, 0.0, 0.0]
+            edge[0] += 1
+            edge[2] += own
+            if not recursive:
+                edge[1] += 1
+                edge[3] += elapsed
+
+    def summary(self):
+        return {
+            'calls': self.calls,
+            'primitive': self.primitive,
+            'local': self.local,
+            'cumulative': self.cumulative,
+            'max': self.maximum,
+            'histogram': dict([
+                ('<%dus' % (2 ** bucket,), count)
+                for bucket, count in enumerate(self.histogram) if count
+            ]),
+        }
+
+
+def timed(function):
+    """Decorate function to record its timings (if instrumentation is on)"""
+    if not enabled:
+        return function
+    code = function.__code__
+    name = '%s.%s' % (
+        function.__module__.split('.')[-1], function.__qualname__)
+    timer = timers[name] = Timer(
+        name, (code.co_filename, code.co_firstlineno, function.__qualname__)
+    )
+
+    @functools.wraps(function)
+    def wrapper(*args, **named):
+        stack = getattr(local, 'stack', None)
+        if stack is None:
+            stack = local.stack = []
+            local.active = {}
+        active = local.active
+        caller = stack[-1][0] if stack else None
+        recursive = active.get(name, 0) > 0
+        active[name] = active.get(name, 0) + 1
+        # timer, start, time spent in nested hooks
+        frame = [timer, time.perf_counter(), 0.0]
+        stack.append(frame)
+        try:
+            return function(*args, **named)
+        finally:
+            stack.pop()
+            active[name] -= 1
+            elapsed = time.perf_counter() - frame[1]
+            if stack:
+                stack[-1][2] += elapsed
+            with lock:
+                timer.record(elapsed, elapsed - frame[2], recursive, caller)
+    return wrapper
+
+
+def reset():
+    """Forget all timings recorded so far"""
+    for timer in timers.values():
+        timer.clear()
+
+
+def summary():
+    """Timings of each hooked function as a (JSON-compatible) dictionary"""
+    return dict([(name, timer.summary()) for name, timer in timers.items()])
+
+
+def report():
+    """Format the timings as text, slowest (cumulative) first"""
+    lines = ['%10s %10s %12s %12s %10s  %s' % (
+        'calls', 'primitive', 'cumulative', 'local', 'max', 'function')]
+    for timer in sorted(timers.values(), key=lambda timer: -timer.cumulative):
+        if not timer.calls:
+            continue
+        lines.append('%10d %10d %12.4f %12.4f %10.4f  %s' % (
+            timer.calls, timer.primitive, timer.cumulative, timer.local,
+            timer.maximum, timer.name))
+    return '\n'.join(lines)
+
+
+def raw_stats():
+    """Build raw pstats-format stats of the hooked functions"""
+    stats = {}
+    for timer in timers.values():
+        if not timer.calls:
+            continue
+        stats[timer.key] = (
+            timer.primitive, timer.calls, timer.local, timer.cumulative,
+            dict([(key, tuple(edge)) for key, edge in timer.callers.items()]),
+        )
+    return stats
+
+
+def dump_json(filename):
+    with open(filename, 'w') as handle:
+        json.dump(summary(), handle, indent=2, sort_keys=True)
+    return filename
+
+
+def dump_stats(filename):
+    """Write the timings as a cProfile-format (marshalled) file"""
+    with open(filename, 'wb') as handle:
+        marshal.dump(raw_stats(), handle)
+    return filename
@@ -0,0 +1,284 @@
+"""Square-map layout, separate from (and not needing) wxPython
+
+A Layout computes the boxes of a square-map for a model at a given size,
+the SquareMap then only has to draw them. Layouts can therefore be
+computed on a worker thread (see scheduler) or without a GUI at all.
+"""
+import operator
+import logging
+
+from snakerunner import instrument
+
+log = logging.getLogger(__name__)
+
+# number of boxes laid out between checks for cancellation
+CHECK_INTERVAL = 256
+
+
+class Layout(object):
+    """The boxes of a square-map of model laid out in width x height
+
+    boxes -- (node, depth, (x, y, w, h), label) in drawing order, label is
+        the (x, y, w, h) area for the node's icon and label, or None
+    ends -- for each box, the index in boxes just past its descendants
+    hot_map -- nested [((x, y, w, h), node, children_hot_map)] for hit-testing
+    check -- optional callable invoked periodically, raises to abandon the
+        layout
+    """
+
+    def __init__(
+        self, model, adapter, width, height,
+        padding=2, margin=0, square_style=False, max_depth=None, check=None,
+    ):
+        self.model = model
+        self.adapter = adapter
+        self.size = (width, height)
+        self.padding = padding
+        self.margin = margin
+        self.square_style = square_style
+        self.max_depth = max_depth
+        self.check = check
+        self.boxes = []
+        self.ends = []
+        self.index = None
+        self.hot_map = []
+        self.max_depth_seen = 0
+        if model:
+            self.box(model, 0, 0, width, height, self.hot_map)
+
+    def box(self, node, x, y, w, h, hot_map, depth=0):
+        """Lay out a model-node's box and all children nodes"""
+        if self.max_depth and depth > self.max_depth:
+            return
+        if self.check is not None and not len(self.boxes) % CHECK_INTERVAL:
+            self.check()
+        self.max_depth_seen = max((self.max_depth_seen, depth))
+        # drawing offset by margin within the square...
+        rect = (
+            x+self.margin, y+self.margin,
+            w-(self.margin*2), h-(self.margin*2),
+        )
+        entry = [node, depth, rect, None]
+        position = len(self.boxes)
+        self.boxes.append(entry)
+        self.ends.append(None)
+        children_hot_map = []
+        hot_map.append(
+            ((int(x), int(y), int(w), int(h)), node, children_hot_map))
+        x += self.padding
+        y += self.padding
+        w -= self.padding*2
+        h -= self.padding*2
+
+        empty = self.adapter.empty(node)
+        icon_drawn = False
+        if self.max_depth and depth == self.max_depth:
+            entry[3] = (x, y, w, h)
+            icon_drawn = True
+        elif empty:
+            # is a fraction of the space which is empty...
+            new_h = h * (1.0-empty)
+            entry[3] = (x, y, w, h-new_h)
+            icon_drawn = True
+            y += (h-new_h)
+            h = new_h
+
+        if w > self.padding*2 and h > self.padding*2:
+            children = self.adapter.children(node)
+            if children:
+                self.children(
+                    children, node, x, y, w, h, children_hot_map, depth+1)
+            elif not icon_drawn:
+                entry[3] = (x, y, w, h)
+        self.ends[position] = len(self.boxes)
+
+    def visible(self, area, min_size=0):
+        """Yield the boxes intersecting area (x, y, w, h), in drawing order
+
+        Boxes narrower or lower than min_size are left out, boxes outside
+        area or too small are skipped together with their descendants, so
+        drawing a small area of a large layout only visits what is visible.
+        """
+        boxes, ends = self.boxes, self.ends
+        index, count = 0, len(boxes)
+        while index < count:
+            entry = boxes[index]
+            rect = entry[2]
+            if (rect[2] < min_size or rect[3] < min_size or
+                    not rect_intersects(rect, area)):
+                index = ends[index]
+            else:
+                yield entry
+                index += 1
+
+    def node_boxes(self, node):
+        """The boxes (entries of boxes) showing node (built on first use)"""
+        if self.index is None:
+            index = {}
+            for entry in self.boxes:
+                index.setdefault(entry[0], []).append(entry)
+            self.index = index
+        return self.index.get(node, ())
+
+    @instrument.timed
+    def children(
+        self, children, parent, x, y, w, h, hot_map, depth=0, node_sum=None,
+    ):
+        """Lay out the set of children in the given rectangle
+
+        node_sum -- if provided, we are a recursive call that already has
+            sizes and sorting, so skip those operations
+        """
+        if node_sum is None:
+            nodes = [(self.adapter.value(node, parent), node)
+                     for node in children]
+            nodes.sort(key=operator.itemgetter(0))
+            total = self.adapter.children_sum(children, parent)
+        else:
+            nodes = children
+            total = node_sum
+        if total:
+            if self.square_style and len(nodes) > 5:
+                # new handling to make parents with large numbers of parents
+                # a little less "sliced" looking (i.e. more square)
+                (head_sum, head), (tail_sum, tail) = split_by_value(
+                    total, nodes)
+                if head and tail:
+                    # split into two sub-boxes and lay out each...
+                    head_coord, tail_coord = split_box(
+                        head_sum/float(total), x, y, w, h)
+                    if head_coord:
+                        self.children(
+                            head, parent, head_coord[0], head_coord[1],
+                            head_coord[2], head_coord[3],
+                            hot_map, depth,
+                            node_sum=head_sum,
+                        )
+                    if tail_coord and coord_bigger_than_padding(
+                            tail_coord, self.padding+self.margin):
+                        self.children(
+                            tail, parent, tail_coord[0], tail_coord[1],
+                            tail_coord[2], tail_coord[3],
+                            hot_map, depth,
+                            node_sum=tail_sum,
+                        )
+                    return
+
+            (firstSize, firstNode) = nodes[-1]
+            head_coord, tail_coord = split_box(
+                firstSize/float(total), x, y, w, h)
+            if head_coord:
+                self.box(
+                    firstNode, head_coord[0], head_coord[1],
+                    head_coord[2], head_coord[3],
+                    hot_map, depth
+                )
+            else:
+                return  # no other node will show up as non-0 either
+
+            if (len(nodes) > 1 and tail_coord and
+                    coord_bigger_than_padding(
+                        tail_coord, self.padding+self.margin)):
+                self.children(
+                    nodes[:-1], parent,
+                    tail_coord[0], tail_coord[1], tail_coord[2], tail_coord[3],
+                    hot_map, depth,
+                    node_sum=total - firstSize,
+                )
+
+
+def rect_contains(rect, position):
+    x, y, w, h = rect
+    return x <= position[0] < x + w and y <= position[1] < y + h
+
+
+def rect_intersects(rect, other):
+    x, y, w, h = rect
+    ox, oy, ow, oh = other
+    return x < ox + ow and ox < x + w and y < oy + oh and oy < y + h
+
+
+def coord_bigger_than_padding(tail_coord, padding):
+    return (
+        tail_coord and
+        tail_coord[2] > padding * 2 and
+        tail_coord[3] > padding * 2
+    )
+
+
+def split_box(fraction, x, y, w, h):
+    """Return set of two boxes where first is the fraction given"""
+    if w >= h:
+        new_w = int(w*fraction)
+        if new_w:
+            return (x, y, new_w, h), (x+new_w, y, w-new_w, h)
+        else:
+            return None, None
+    else:
+        new_h = int(h*fraction)
+        if new_h:
+            return (x, y, w, new_h), (x, y+new_h, w, h-new_h)
+        else:
+            return None, None
+
+
+def split_by_value(total, nodes, headdivisor=2.0):
+    """Produce, (sum,head),(sum,tail) for nodes to attempt binary partition"""
+    head_sum = 0
+    divider = 0
+    for node in nodes[::-1]:
+        if head_sum < total/headdivisor:
+            head_sum += node[0]
+            divider -= 1
+        else:
+            break
+    return (head_sum, nodes[divider:]), (total-head_sum, nodes[:divider])
+
+
+class DefaultAdapter(object):
+    """Default adapter class for adapting node-trees to SquareMap API"""
+
+    def children(self, node):
+        """Retrieve the set of nodes which are children of this node"""
+        return node.children
+
+    def value(self, node, parent=None):
+        """Return value used to compare size of this node"""
+        return node.size
+
+    def label(self, node):
+        """Return textual description of this node"""
+        return node.path
+
+    def overall(self, node):
+        """Calculate overall size of the node including children and empty
+        space"""
+        return sum([self.value(value, node) for value in self.children(node)])
+
+    def children_sum(self, children, node):
+        """Calculate children's total sum"""
+        return sum([self.value(value, node) for value in children])
+
+    def empty(self, node):
+        """Calculate empty space as a fraction of total space"""
+        overall = self.overall(node)
+        if overall:
+            children_sum = self.children_sum(self.children(node), node)
+            return (overall - children_sum)/float(overall)
+        return 0
+
+    def background_color(self, node, depth):
+        ''' The color to use as background color of the node. '''
+        return None
+
+    def foreground_color(self, node, depth):
+        ''' The color to use for the label. '''
+        return None
+
+    def icon(self, node, isSelected):
+        ''' The icon to display in the node. '''
+        return None
+
+    def parents(self, node):
+        """Retrieve/calculate the set of parents for the given node"""
+        return []
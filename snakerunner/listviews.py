@@ -5,6 +5,7 @@ from gettext import gettext as _
 import wx
 
 from snakerunner import squaremap
+from snakerunner import instrument
 
 if sys.platform == 'win32':
     windows = True
@@ -56,6 +57,18 @@ class DictColumn(ColumnDefinition):
             self.get = self.getter = getter
 
 
+def sort_records(records, columns, check=None):
+    """Sort records in place by (ascending, column) pairs, most significant
+    first"""
+    for ascending, column in columns[::-1]:
+        # Python 2.2+ guarantees stable sort, so sort by each column in reverse
+        # order will order by the assigned columns
+        if check is not None:
+            check()
+        records.sort(key=column.get, reverse=(not ascending))
+    return records
+
+
 class DataView(wx.ListCtrl):
     """A sortable profile list control"""
 
@@ -87,12 +100,15 @@ class DataView(wx.ListCtrl):
                          for x in self.columns if x.sortDefault]
         self.sortOrder = sortOrder or []
         self.sorted = []
+        self.indices = None
+        self.formatted = {}
         self.CreateControls()
 
     def SetPercentage(self, percent, total):
         """Set whether to display percentage values (and total for doing so)"""
         self.percentageView = percent
         self.total = total
+        self.formatted = {}
         self.Refresh()
 
     def CreateControls(self):
@@ -108,6 +124,7 @@ class DataView(wx.ListCtrl):
     def CreateColumns(self):
         """Create/recreate our column definitions from current self.columns"""
         self.SetItemCount(0)
+        self.formatted = {}
         # clear any current columns...
         for i in range(self.GetColumnCount())[::-1]:
             self.DeleteColumn(i)
@@ -130,7 +147,7 @@ class DataView(wx.ListCtrl):
     def OnNodeActivated(self, event):
         """We have double-clicked for hit enter on a node refocus squaremap to this node"""
         try:
-            node = self.sorted[event.GetIndex()]
+            node = self.RecordNode(self.sorted[event.GetIndex()])
         except AttributeError:
             pass
         except IndexError as err:
@@ -146,7 +163,7 @@ class DataView(wx.ListCtrl):
     def OnNodeSelected(self, event):
         """We have selected a node with the list control, tell the world"""
         try:
-            node = self.sorted[event.GetIndex()]
+            node = self.RecordNode(self.sorted[event.GetIndex()])
         except AttributeError:
             pass
         except IndexError as err:
@@ -165,7 +182,7 @@ class DataView(wx.ListCtrl):
         item, where = self.HitTest(point)
         if item > -1:
             try:
-                node = self.sorted[item]
+                node = self.RecordNode(self.sorted[item])
             except IndexError as err:
                 log.warning(_('Invalid index in mouse move.'))
             else:
@@ -177,14 +194,26 @@ class DataView(wx.ListCtrl):
 
     def SetIndicated(self, node):
         """Set this node to indicated status"""
+        previous = self.indicated
         self.indicated_node = node
         self.indicated = self.NodeToIndex(node)
-        self.Refresh(False)
+        if previous != self.indicated:
+            # only the rows which changed need repainting
+            count = self.GetItemCount()
+            for index in (previous, self.indicated):
+                if -1 < index < count:
+                    self.RefreshItem(index)
         return self.indicated
 
     def SetSelected(self, node):
-        """Set our selected node"""
+        """Set our selected node
+
+        While a sort is pending the node is selected once the sorted
+        records are displayed (returns -1 until then).
+        """
         self.selected_node = node
+        if self.sortPending:
+            return -1
         index = self.NodeToIndex(node)
         if index != -1:
             self.Focus(index)
@@ -192,10 +221,18 @@ class DataView(wx.ListCtrl):
         return index
 
     def NodeToIndex(self, node):
-        for i, n in enumerate(self.sorted):
-            if n is node:
-                return i
-        return -1
+        if self.indices is None:
+            indices = {}
+            for i, record in enumerate(self.sorted):
+                indices.setdefault(record, i)
+                indices.setdefault(self.RecordNode(record), i)
+            self.indices = indices
+        return self.indices.get(node, -1)
+
+    def RecordNode(self, record):
+        """Retrieve the node a displayed record refers to (edge records refer
+        to a node)"""
+        return getattr(record, 'node', record)
 
     def columnByAttribute(self, name):
         for column in self.columns:
@@ -212,8 +249,7 @@ class DataView(wx.ListCtrl):
         """Reorder the set of records by column"""
         # TODO: store current selection and re-select after sorting...
         single_column = self.SetNewOrder(column)
-        self.reorder(single_column=True)
-        self.Refresh()
+        self.SortRecords(self.sorted, single_column=True)
 
     def SetNewOrder(self, column):
         """Set new sorting order based on column, return whether a simple single-column (True) or multiple (False)"""
@@ -240,23 +276,68 @@ class DataView(wx.ListCtrl):
                 ]
             return True
 
+    @instrument.timed
     def reorder(self, single_column=False):
         """Force a reorder of the displayed items"""
         if single_column:
             columns = self.sortOrder[:1]
         else:
             columns = self.sortOrder
-        for ascending, column in columns[::-1]:
-            # Python 2.2+ guarantees stable sort, so sort by each column in reverse
-            # order will order by the assigned columns
-            self.sorted.sort(key=column.get, reverse=(not ascending))
+        sort_records(self.sorted, columns)
+        self.SortChanged()
+
+    def SortChanged(self):
+        """Forget everything depending on the order of the records"""
+        self.formatted = {}
+        self.indices = None
+        if self.indicated_node is not None:
+            self.indicated = self.NodeToIndex(self.indicated_node)
 
+    @instrument.timed
     def integrateRecords(self, functions):
         """Integrate records from the loader"""
-        self.SetItemCount(len(functions))
-        self.sorted = functions[:]
-        self.reorder()
+        self.SortRecords(functions)
+
+    scheduler = None
+    # more records than this are sorted by the scheduler (if we have one)
+    ASYNC_SORT_THRESHOLD = 5000
+    # records are being sorted by the scheduler, self.sorted is outdated
+    sortPending = False
+
+    def SortRecords(self, records, single_column=False):
+        """Display (a sorted copy of) records, sorting off the UI thread if
+        there are many"""
+        if single_column:
+            columns = self.sortOrder[:1]
+        else:
+            columns = list(self.sortOrder)
+        channel = ('sort', id(self))
+        if (self.scheduler is not None and
+                len(records) > self.ASYNC_SORT_THRESHOLD):
+            records = list(records)
+            self.sortPending = True
+            self.scheduler.submit(
+                channel,
+                lambda token: sort_records(
+                    records, columns, check=token.check),
+                self.SetRecords,
+            )
+            return
+        if self.scheduler is not None:
+            # supersedes any sort still running for earlier records
+            self.scheduler.cancel(channel)
+        self.SetRecords(sort_records(list(records), columns))
+
+    def SetRecords(self, records):
+        """Display records (already sorted)"""
+        pending, self.sortPending = self.sortPending, False
+        self.SetItemCount(len(records))
+        self.sorted = records
+        self.SortChanged()
         self.Refresh()
+        if pending and self.selected_node is not None:
+            # selected while the records were being sorted
+            self.SetSelected(self.selected_node)
 
     indicated_attribute = wx.ItemAttr()
     indicated_attribute.SetBackgroundColour('#00ff00')
@@ -267,33 +348,56 @@ class DataView(wx.ListCtrl):
             return self.indicated_attribute
         return None
 
+    # maximum number of formatted cells to keep before starting over
+    FORMAT_CACHE_LIMIT = 20000
+
     def OnGetItemText(self, item, col):
         """Retrieve text for the item and column respectively"""
+        text = self.formatted.get((item, col))
+        if text is None:
+            self.FormatPage(item)
+            text = self.formatted.get((item, col), '')
+        return text
+
+    @instrument.timed
+    def FormatPage(self, item):
+        """Format every cell of the visible page of rows (which includes
+        item)"""
+        if len(self.formatted) > self.FORMAT_CACHE_LIMIT:
+            self.formatted = {}
+        first = self.GetTopItem()
+        last = first + self.GetCountPerPage() + 1
+        if not first <= item < last:
+            first, last = item, item + 1
+        formatted = self.formatted
+        columns = list(enumerate(self.columns))
+        for index in range(first, min(last, len(self.sorted))):
+            node = self.sorted[index]
+            for col, column in columns:
+                formatted[(index, col)] = self.FormatValue(column, node)
+
+    def FormatValue(self, column, node):
+        """Format the value of column for display"""
         # TODO: need to format for rjust and the like...
-        try:
-            column = self.columns[col]
-            value = column.get(self.sorted[item])
-        except IndexError as err:
+        value = column.get(node)
+        if value is None:
             return ''
-        else:
-            if value is None:
-                return ''
-            if column.percentPossible and self.percentageView and self.total:
-                value = value / float(self.total) * 100.00
-            if column.format:
-                try:
-                    return column.format % (value,)
-                except Exception as err:
-                    log.warning('Column %s could not format %r value: %r',
-                                column.name, type(value), value)
-                    value = column.get(self.sorted[item])
-                    if isinstance(value, str):
-                        return value
-                    return str(value)
-            else:
+        if column.percentPossible and self.percentageView and self.total:
+            value = value / float(self.total) * 100.00
+        if column.format:
+            try:
+                return column.format % (value,)
+            except Exception as err:
+                log.warning('Column %s could not format %r value: %r',
+                            column.name, type(value), value)
+                value = column.get(node)
                 if isinstance(value, str):
                     return value
                 return str(value)
+        else:
+            if isinstance(value, str):
+                return value
+            return str(value)
 
     def OnGetItemToolTip(self, item, col):
         return self.OnGetItemText(item, col)  # XXX: do something nicer
@@ -0,0 +1,265 @@
+"""Stream cProfile statistics from a running process to the viewer
+
+In the process to be watched:
+
+    from snakerunner import liveprofile
+    agent = liveprofile.start()   # profiles the calling thread
+
+or run a script under the agent:
+
+    python -m snakerunner.liveprofile [-p port] script.py [args]
+
+then use File -> Attach to Live Process in the viewer. The agent sends the
+difference between successive snapshots of the profiler's stats, each as
+a marshalled (pstats-format) dictionary in a length-prefixed frame.
+
+Frames are unmarshalled by the viewer, so only ever attach to a trusted
+process; the agent listens on the loopback interface by default.
+"""
+import os
+import sys
+import time
+import zlib
+import socket
+import struct
+import marshal
+import logging
+import cProfile
+import threading
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_INTERVAL = 1.0
+
+MAGIC = b'SRL1'
+FRAME = struct.Struct('!4sI')
+
+
+class ProfileAgent(threading.Thread):
+    """Periodically send the stats of a profiler to a connected viewer"""
+
+    daemon = True
+
+    def __init__(
+        self, profiler, address=('127.0.0.1', DEFAULT_PORT),
+        interval=DEFAULT_INTERVAL,
+    ):
+        super(ProfileAgent, self).__init__(name='snakerunner-agent')
+        self.profiler = profiler
+        self.address = address
+        self.interval = interval
+        self.running = True
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(address)
+        self.server.listen(1)
+
+    def run(self):
+        while self.running:
+            try:
+                connection, peer = self.server.accept()
+            except OSError as err:
+                if self.running:
+                    log.warning('Profile agent stopped accepting: %s', err)
+                return
+            log.info('Viewer attached from %s', peer)
+            try:
+                self.serve(connection)
+            except OSError as err:
+                log.info('Viewer detached: %s', err)
+            finally:
+                connection.close()
+
+    def serve(self, connection):
+        """Send snapshot deltas to a connected viewer until it detaches"""
+        previous = {}
+        while self.running:
+            current = self.snapshot()
+            delta = stats_delta(current, previous)
+            previous = current
+            if delta:
+                connection.sendall(encode(delta))
+            time.sleep(self.interval)
+
+    def snapshot(self):
+        """Take a (pstats-format) snapshot without stopping the profiler"""
+        self.profiler.snapshot_stats()
+        return self.profiler.stats
+
+    def stop(self):
+        self.running = False
+        self.server.close()
+
+
+class SnapshotReceiver(threading.Thread):
+    """Connect to a ProfileAgent and accumulate the stats it sends
+
+    Deltas which arrive faster than the viewer consumes them are summed,
+    so memory stays bounded however far behind the viewer falls.
+    """
+
+    daemon = True
+    error = None
+
+    def __init__(self, address):
+        super(SnapshotReceiver, self).__init__(name='snakerunner-receiver')
+        self.address = address
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.connection = None
+
+    def run(self):
+        try:
+            self.connection = socket.create_connection(self.address)
+            while True:
+                delta = read_frame(self.connection)
+                if delta is None:
+                    break
+                with self.lock:
+                    add_stats(self.pending, delta)
+        except (OSError, ValueError, EOFError, zlib.error) as err:
+            self.error = err
+            log.warning(
+                'Live profile connection to %s failed: %s', self.address, err)
+
+    def drain(self):
+        """Retrieve (and forget) the stats accumulated since the last call"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return pending
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.connection.close()
+
+
+def encode(stats):
+    """Frame a raw stats dictionary for sending"""
+    payload = zlib.compress(marshal.dumps(stats), 1)
+    return FRAME.pack(MAGIC, len(payload)) + payload
+
+
+def read_exactly(connection, size):
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(connection):
+    """Read a single raw stats dictionary, None at end-of-stream"""
+    header = read_exactly(connection, FRAME.size)
+    if header is None:
+        return None
+    magic, size = FRAME.unpack(header)
+    if magic != MAGIC:
+        raise ValueError('Not a snakerunner live profile stream')
+    payload = read_exactly(connection, size)
+    if payload is None:
+        raise EOFError('Truncated live profile frame')
+    return marshal.loads(zlib.decompress(payload))
+
+
+def subtract(data, previous):
+    """Subtract caller data (tuple or plain count) previous from data"""
+    if previous is None:
+        return data
+    if isinstance(data, tuple):
+        return tuple([a - b for a, b in zip(data, previous)])
+    return data - previous
+
+
+def stats_delta(current, previous):
+    """Calculate the raw stats accumulated between two snapshots"""
+    delta = {}
+    for func, (cc, nc, tt, ct, callers) in current.items():
+        old = previous.get(func)
+        if old is None:
+            delta[func] = (cc, nc, tt, ct, dict(callers))
+            continue
+        if old[:4] == (cc, nc, tt, ct) and old[4] == callers:
+            continue
+        old_callers = old[4]
+        delta[func] = (
+            cc - old[0], nc - old[1], tt - old[2], ct - old[3],
+            dict([
+                (caller, subtract(data, old_callers.get(caller)))
+                for caller, data in callers.items()
+                if old_callers.get(caller) != data
+            ]),
+        )
+    return delta
+
+
+def add_caller(data, other):
+    if other is None:
+        return data
+    if isinstance(data, tuple):
+        return tuple([a + b for a, b in zip(data, other)])
+    return data + other
+
+
+def add_stats(target, stats):
+    """Add the raw stats to the raw stats dictionary target (in place)"""
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        old = target.get(func)
+        if old is None:
+            target[func] = (cc, nc, tt, ct, dict(callers))
+            continue
+        old_callers = old[4]
+        for caller, data in callers.items():
+            old_callers[caller] = add_caller(data, old_callers.get(caller))
+        target[func] = (
+            old[0] + cc, old[1] + nc, old[2] + tt, old[3] + ct, old_callers)
+    return target
+
+
+def start(
+    port=DEFAULT_PORT, interval=DEFAULT_INTERVAL, host='127.0.0.1',
+    profiler=None,
+):
+    """Start profiling the calling thread and serving the stats to viewers"""
+    if profiler is None:
+        profiler = cProfile.Profile()
+    agent = ProfileAgent(profiler, address=(host, port), interval=interval)
+    agent.start()
+    profiler.enable()
+    return agent
+
+
+usage = 'python -m snakerunner.liveprofile [-p port] script.py [args]'
+
+
+def main():
+    """Run a script under the profile agent"""
+    import runpy
+    args = sys.argv[1:]
+    port = DEFAULT_PORT
+    if args[:1] == ['-p'] and len(args) > 1:
+        port = int(args[1])
+        args = args[2:]
+    if not args:
+        print(usage)
+        return 1
+    sys.argv = args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args[0])))
+    agent = start(port=port)
+    try:
+        runpy.run_path(args[0], run_name='__main__')
+    finally:
+        agent.profiler.disable()
+        agent.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Interning and normalisation of the file paths recorded in profiles
+
+Profiles record absolute paths of the machine they were taken on, the
+location view instead groups directories under logical roots:
+
+    <stdlib>/json                   -- the standard library
+    <site-packages>/requests        -- installed packages (in any venv)
+    <project>/app/views             -- the common prefix of all other code
+"""
+import os
+import re
+import sys
+import logging
+
+log = logging.getLogger(__name__)
+
+STDLIB = '<stdlib>'
+SITE_PACKAGES = '<site-packages>'
+PROJECT = '<project>'
+
+SITE_DIRECTORIES = ('site-packages', 'dist-packages')
+STDLIB_DIRECTORY = re.compile(r'^python\d+(\.\d+)?t?$', re.I)
+
+
+class PathTable(object):
+    """Split, intern and normalise the file paths of a profile
+
+    Every distinct file is split only once, directory and file names are
+    interned so that all rows share the same string objects.
+
+    workspace -- if provided, a workspace.Workspace sharing the split paths
+        with the tables of other profiles
+    """
+
+    def __init__(self, workspace=None):
+        self.files = {}
+        self.locations = None
+        self.workspace = workspace
+
+    def split(self, path):
+        """Return interned (directory, filename) for path"""
+        result = self.files.get(path)
+        if result is None:
+            if self.workspace is not None:
+                result = self.files[path] = self.workspace.split(path)
+                dirname = result[0]
+            else:
+                try:
+                    dirname = os.path.dirname(path)
+                    basename = os.path.basename(path)
+                except ValueError:
+                    dirname = ''
+                    basename = path
+                result = self.files[path] = (
+                    sys.intern(dirname), sys.intern(basename))
+            if self.locations is not None and dirname not in self.locations:
+                self.locations = None
+        return result
+
+    def location(self, directory):
+        """Return the logical location for a directory (as split by us)"""
+        if self.locations is None:
+            self.normalise()
+        location = self.locations.get(directory)
+        if location is None:
+            location = logical(directory)
+            if location is None:
+                location = directory
+            self.locations[directory] = location
+        return location
+
+    def normalise(self):
+        """Map each known directory onto its logical location"""
+        locations = {}
+        project = []
+        for directory, filename in self.files.values():
+            if directory in locations:
+                continue
+            location = logical(directory)
+            if location is None:
+                project.append(directory)
+            locations[directory] = location
+        prefix = project_prefix(project)
+        for directory in project:
+            if prefix is None:
+                location = directory
+            else:
+                location = join(PROJECT, components(directory)[len(prefix):])
+            locations[directory] = sys.intern(location)
+        self.locations = locations
+        return locations
+
+
+def components(directory):
+    """Split a directory into its (non-empty) components"""
+    return [part for part in re.split(r'[\\/]', directory) if part]
+
+
+def join(root, parts):
+    return '/'.join([root] + list(parts))
+
+
+def logical(directory):
+    """Map a standard-library or installed-package directory to a logical root
+
+    Returns '' for built-ins and None for anything else (project code).
+    """
+    if not directory:
+        return ''
+    parts = components(directory)
+    for index in range(len(parts) - 1, -1, -1):
+        if parts[index] in SITE_DIRECTORIES:
+            return sys.intern(join(SITE_PACKAGES, parts[index+1:]))
+    for index in range(len(parts) - 1, 0, -1):
+        if (STDLIB_DIRECTORY.match(parts[index]) and
+                parts[index-1].lower() == 'lib'):
+            return sys.intern(join(STDLIB, parts[index+1:]))
+    if (len(parts) > 1 and parts[-1].lower() == 'lib' and
+            parts[-2].lower().startswith('python')):
+        # Windows installation layout, e.g. C:\Python311\Lib
+        return STDLIB
+    return None
+
+
+def project_prefix(directories):
+    """Find the common leading components of the project directories"""
+    absolute = [
+        directory for directory in directories if os.path.isabs(directory)
+    ]
+    if not absolute or len(absolute) != len(directories):
+        return None
+    prefix = components(absolute[0])
+    for directory in absolute[1:]:
+        parts = components(directory)
+        length = 0
+        for a, b in zip(prefix, parts):
+            if a != b:
+                break
+            length += 1
+        prefix = prefix[:length]
+        if not prefix:
+            return None
+    return prefix
@@ -0,0 +1,368 @@
+"""Python API for querying profiles from scripts and notebooks (no wxPython)
+
+    >>> from snakerunner import Profile
+    >>> profile = Profile.open('run.prof')
+    >>> for row in profile.top('local', 5):
+    ...     print(row.name, row.local)
+    >>> profile.callers('handle_request')
+    >>> profile.path_to_root('json.loads')
+    >>> profile.group_by('module')
+    >>> profile.to_dataframe()     # needs pandas
+
+Functions are the loader's rows (see pstatsloader.PStatRow), with the
+attributes key, name, directory, filename, lineno, calls (primitive
+calls), recursive (all calls), local, localPer, cumulative and
+cumulativePer. Wherever a function is expected, pass a row, a (file, line,
+name) key, a name ('loads') or a qualified name ('decoder.py:loads' or
+'json/decoder.py:332(loads)'), see Profile.function.
+
+Lookups are indexed and the sorted orders used by top() are cached, so
+repeated queries against a loaded profile are cheap.
+"""
+import os
+import re
+import heapq
+import logging
+from array import array
+from collections import namedtuple
+
+from snakerunner import pstatsloader
+from snakerunner import transforms as transforming
+
+log = logging.getLogger(__name__)
+
+METRICS = (
+    'calls', 'recursive', 'local', 'localPer', 'cumulative', 'cumulativePer',
+)
+GROUPINGS = ('directory', 'location', 'file', 'module')
+QUALIFIED = re.compile(
+    r'^(?P<file>.*?)(?::(?P<line>\d+))?'
+    r'(?:\((?P<name>.*)\)|:(?P<bare>[^:]*))$'
+)
+
+Group = namedtuple('Group', ('name', 'functions', 'calls', 'local'))
+
+
+class Profile(object):
+    """A loaded profile (see the module documentation)
+
+    loader -- the pstatsloader.PStatsLoader holding the profile
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.names = None
+        self.orders = {}
+        self.columns = None
+
+    @classmethod
+    def open(cls, *paths, transforms=None):
+        """Load profile files (cProfile, callgrind or columnar) merged into one
+
+        paths -- filenames, or a single list of filenames
+        transforms -- optional transforms (see snakerunner.transforms), as
+            Transform instances or 'kind=pattern' strings, e.g.
+            'ignore=logging'
+        """
+        if len(paths) == 1 and isinstance(paths[0], (list, tuple)):
+            paths = paths[0]
+        profile = cls(pstatsloader.PStatsLoader(*paths))
+        if transforms:
+            profile = profile.transform(*transforms)
+        return profile
+
+    def transform(self, *transforms):
+        """A new Profile of ours with transforms applied (see open)"""
+        transforms = [
+            transforming.parse(transform)
+            if isinstance(transform, str) else transform
+            for transform in transforms
+        ]
+        return Profile(self.loader.transformed(transforms))
+
+    def __repr__(self):
+        filenames = [str(filename) for filename in self.loader.filename]
+        return 'Profile( %s, %s functions )' % (
+            ', '.join(filenames) or '-', len(self),
+        )
+
+    def __len__(self):
+        return len(self.functions())
+
+    def __iter__(self):
+        return iter(self.functions())
+
+    def __contains__(self, function):
+        try:
+            self.function(function)
+        except KeyError:
+            return False
+        return True
+
+    @property
+    def root(self):
+        """The root of the call tree (a group if the run has several roots)"""
+        return self.loader.get_root('functions')
+
+    @property
+    def total(self):
+        """Total (cumulative) time of the run"""
+        return self.root.cumulative
+
+    def functions(self):
+        """All the functions of the profile"""
+        rows = self.orders.get(None)
+        if rows is None:
+            rows = self.orders[None] = [
+                row for row in self.loader.rows.values()
+                if isinstance(row, pstatsloader.PStatRow)
+            ]
+        return rows
+
+    def function(self, function):
+        """Find a function by row, key, name or qualified name
+
+        Raises KeyError if there is no such function, ValueError if a name
+        is ambiguous (the message lists the candidates).
+        """
+        if isinstance(function, pstatsloader.PStatRow):
+            return function
+        if isinstance(function, tuple):
+            row = self.loader.rows.get(function)
+            if not isinstance(row, pstatsloader.PStatRow):
+                raise KeyError(function)
+            return row
+        if self.names is None:
+            names = {}
+            for row in self.functions():
+                names.setdefault(row.name, []).append(row)
+            self.names = names
+        candidates = self.names.get(function)
+        if candidates is None:
+            candidates = self.qualified(function)
+        if not candidates:
+            raise KeyError(function)
+        if len(candidates) > 1:
+            raise ValueError('%r is ambiguous: %s' % (
+                function,
+                ', '.join([qualified_name(row) for row in candidates]),
+            ))
+        return candidates[0]
+
+    def qualified(self, text):
+        """Functions matching 'path:name', 'path:line(name)' or 'path(name)'"""
+        match = QUALIFIED.match(text)
+        if match is None:
+            return []
+        path = match.group('file')
+        name = match.group('name')
+        if name is None:
+            name = match.group('bare')
+        line = match.group('line')
+        return [
+            row for row in self.names.get(name, ())
+            if (line is None or row.lineno == int(line))
+            and os.path.join(row.directory, row.filename).endswith(path)
+        ]
+
+    def top(self, metric='cumulative', n=10):
+        """The n functions with the largest metric (one of METRICS)"""
+        if metric not in METRICS:
+            raise ValueError('Unknown metric %r, expected one of %s' % (
+                metric, ', '.join(METRICS),
+            ))
+        rows = self.orders.get(metric)
+        if rows is None:
+            if n * 8 < len(self.functions()):
+                # cheaper than sorting everything, and not worth caching
+                return heapq.nlargest(
+                    n, self.functions(), key=lambda row: getattr(row, metric),
+                )
+            rows = self.orders[metric] = sorted(
+                self.functions(), key=lambda row: getattr(row, metric),
+                reverse=True,
+            )
+        return rows[:n]
+
+    def callers(self, function):
+        """The calls made to function, as edges (see pstatsloader.PStatEdge)
+
+        Each edge has caller, callee, calls, recursive, local and
+        cumulative (the time spent in function when called from caller),
+        heaviest first.
+        """
+        edges = self.function(function).caller_edges
+        return sorted(edges, key=lambda edge: edge.cumulative, reverse=True)
+
+    def callees(self, function):
+        """The calls function makes, as edges (see callers)"""
+        edges = self.function(function).callee_edges
+        return sorted(edges, key=lambda edge: edge.cumulative, reverse=True)
+
+    def path_to_root(self, function):
+        """The heaviest call path from a root to function, root first
+
+        Follows the caller edge with the largest cumulative time at each
+        step (skipping callers already on the path), as the viewer's Up
+        button does, up to one of the profile's roots (the root of the
+        function view or its children) or a function without callers.
+        """
+        tree = self.loader.tree
+        if isinstance(tree, pstatsloader.PStatGroup):
+            roots = set([child.key for child in tree.children])
+        else:
+            roots = set([tree.key])
+        row = self.function(function)
+        path = [row]
+        seen = set([row.key])
+        while row.key not in roots:
+            edges = [
+                edge for edge in row.caller_edges
+                if edge.caller.key not in seen
+            ]
+            if not edges:
+                break
+            row = max(edges, key=lambda edge: edge.cumulative).caller
+            seen.add(row.key)
+            path.append(row)
+        return path[::-1]
+
+    def group_by(self, level='module'):
+        """Total the functions' calls and local time per level of grouping
+
+        level -- 'directory', 'location', 'file' or 'module' (see GROUPINGS)
+
+
+        Returns Groups (name, functions, calls, local), heaviest first. The
+        location and module levels use the logical directories of the
+        location view, e.g. <stdlib>/json and json.decoder.
+        """
+        if level not in GROUPINGS:
+            raise ValueError('Unknown level %r, expected one of %s' % (
+                level, ', '.join(GROUPINGS),
+            ))
+        paths = self.loader.paths
+        totals = {}
+        for row in self.functions():
+            if level == 'directory':
+                name = row.directory
+            elif level == 'file':
+                name = os.path.join(row.directory, row.filename)
+            else:
+                location = paths.location(row.directory) or '<built-in>'
+                if level == 'location':
+                    name = location
+                else:
+                    name = module_name(location, row.filename)
+            total = totals.get(name)
+            if total is None:
+                total = totals[name] = [0, 0, 0.0]
+            total[0] += 1
+            total[1] += row.calls
+            total[2] += row.local
+        groups = [Group(name, *total) for name, total in totals.items()]
+        groups.sort(key=lambda group: group.local, reverse=True)
+        return groups
+
+    def get_columns(self):
+        """The functions and edges as columns of flat arrays (built once)
+
+        Function columns: file, name (str lists), line, calls, recursive,
+        local, cumulative; edge columns: caller, callee (indices into the
+        function columns), edge_calls, edge_recursive, edge_local and
+        edge_cumulative.
+        """
+        if self.columns is None:
+            rows = self.functions()
+            index = dict([
+                (id(row), position) for position, row in enumerate(rows)
+            ])
+            columns = {
+                'file': [
+                    os.path.join(row.directory, row.filename) for row in rows
+                ],
+                'name': [row.name for row in rows],
+                'line': array('q', [row.lineno for row in rows]),
+                'calls': array('q', [row.calls for row in rows]),
+                'recursive': array('q', [row.recursive for row in rows]),
+                'local': array('d', [row.local for row in rows]),
+                'cumulative': array('d', [row.cumulative for row in rows]),
+            }
+            edges = [
+                edge for row in rows for edge in row.caller_edges
+                if id(edge.caller) in index
+            ]
+            for end in ('caller', 'callee'):
+                columns[end] = array('q', [
+                    index[id(getattr(edge, end))] for edge in edges
+                ])
+            for attribute, typecode in (
+                ('calls', 'q'), ('recursive', 'q'),
+                ('local', 'd'), ('cumulative', 'd'),
+            ):
+                columns['edge_' + attribute] = array(typecode, [
+                    getattr(edge, attribute) for edge in edges
+                ])
+            self.columns = columns
+        return self.columns
+
+    def to_dataframe(self):
+        """The functions as a pandas DataFrame (needs pandas)
+
+        The numeric columns are views of our column arrays (not copies).
+        """
+        numpy, pandas = dataframe_modules()
+        columns = self.get_columns()
+        data = {'file': columns['file'], 'name': columns['name']}
+        for name in ('line', 'calls', 'recursive', 'local', 'cumulative'):
+            data[name] = numpy.frombuffer(
+                columns[name], dtype=columns[name].typecode)
+        return pandas.DataFrame(data, copy=False)
+
+    def edges_dataframe(self):
+        """The call edges as a pandas DataFrame (see to_dataframe)
+
+        caller and callee are the (row) positions of the functions in
+        to_dataframe().
+        """
+        numpy, pandas = dataframe_modules()
+        columns = self.get_columns()
+        data = {}
+        for name in (
+            'caller', 'callee', 'edge_calls', 'edge_recursive', 'edge_local',
+            'edge_cumulative',
+        ):
+            data[name[5:] if name.startswith('edge_') else name] = (
+                numpy.frombuffer(columns[name], dtype=columns[name].typecode))
+        return pandas.DataFrame(data, copy=False)
+
+
+def dataframe_modules():
+    try:
+        import numpy
+        import pandas
+    except ImportError as err:
+        raise ImportError(
+            'DataFrame export needs pandas (pip install pandas): %s' % (err,))
+    return numpy, pandas
+
+
+def qualified_name(row):
+    return '%s:%s(%s)' % (
+        os.path.join(row.directory, row.filename), row.lineno, row.name,
+    )
+
+
+def module_name(location, filename):
+    """Dotted module name for a file in a (logical) location"""
+    if location == '<built-in>':
+        # built-ins (~), frozen modules and exec'd code have no directory
+        return location if filename in ('', '~') else filename
+    parts = [
+        part for part in re.split(r'[\\/]', location)
+        if part and not (part.startswith('<') and part.endswith('>'))
+    ]
+    stem = os.path.splitext(filename)[0]
+    if stem != '__init__':
+        parts.append(stem)
+    return '.'.join(parts) or stem
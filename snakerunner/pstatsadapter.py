@@ -13,6 +13,10 @@ class PStatsAdapter(squaremap.DefaultAdapter):
 
     percentageView = False
     total = 0
+    pruning = None
+    sources = None
+    # skew (max/mean time across sources) at which a node is coloured fully red
+    SKEW_SCALE = 3.0
 
     TREE = pstatsloader.TREE_CALLS
 
@@ -33,18 +37,55 @@ class PStatsAdapter(squaremap.DefaultAdapter):
             time = '%0.2f%%' % round(node.cumulative * 100.0 / self.total, 2)
         else:
             time = '%0.3fs' % round(node.cumulative, 3)
-        return '%s@%s:%s [%s]' % (node.name, node.filename, node.lineno, time)
+        label = '%s@%s:%s [%s]' % (node.name, node.filename, node.lineno, time)
+        summary = None
+        if self.sources is not None:
+            summary = self.sources.summary(node.key)
+        if summary is not None:
+            label += ' skew %0.2f, slowest %s' % (
+                summary[4], self.sources.slowest(node.key))
+        return label
 
     def empty(self, node):
         if node.cumulative:
             return node.local / float(node.cumulative)
         return 0.0
 
+    def children(self, node):
+        """Retrieve the children of node, less any pruned rows"""
+        if self.pruning is not None:
+            return self.pruning.children(node)
+        return node.children
+
+    def callee_edges(self, node):
+        """Retrieve the edge records of the calls node makes to children"""
+        if self.pruning is not None:
+            return self.pruning.callee_edges(node)
+        edges = getattr(node, 'callee_edges', None)
+        if edges is None:
+            return self.children(node)
+        return edges
+
+    def caller_edges(self, node):
+        """Retrieve the edge records of the calls parents make to node"""
+        if self.pruning is not None:
+            edges = self.pruning.caller_edges(node)
+        else:
+            edges = getattr(node, 'caller_edges', [])
+        groups = [
+            parent for parent in self.parents(node)
+            if isinstance(parent, pstatsloader.PStatGroup)
+        ]
+        return edges + groups
+
     def parents(self, node):
         """Determine all parents of node in our tree"""
+        if self.pruning is not None:
+            parents = self.pruning.parents(node)
+        else:
+            parents = getattr(node, 'parents', [])
         return [
-            parent for parent in
-            getattr(node, 'parents', [])
+            parent for parent in parents
             if getattr(parent, 'tree', self.TREE) == self.TREE
         ]
 
@@ -52,6 +93,10 @@ class PStatsAdapter(squaremap.DefaultAdapter):
 
     def background_color(self, node, depth):
         """Create a (unique-ish) background color for each node"""
+        if self.sources is not None:
+            summary = self.sources.summary(node.key)
+            if summary is not None:
+                return self.skew_color(summary[4])
         if self.color_mapping is None:
             self.color_mapping = {}
         color = self.color_mapping.get(node.key)
@@ -63,6 +108,15 @@ class PStatsAdapter(squaremap.DefaultAdapter):
             self.color_mapping[node.key] = color = wx.Colour(red, green, blue)
         return color
 
+    def skew_color(self, skew):
+        """Colour from grey (spread evenly over the sources) to red (one)"""
+        fraction = min(max((skew - 1.0) / (self.SKEW_SCALE - 1.0), 0.0), 1.0)
+        return wx.Colour(
+            int(160 + 95 * fraction),
+            int(160 - 120 * fraction),
+            int(160 - 120 * fraction),
+        )
+
     def SetPercentage(self, percent, total):
         """Set whether to display percentage values (and total for doing so)"""
         self.percentageView = percent
@@ -87,3 +141,9 @@ class DirectoryViewAdapter(PStatsAdapter):
         if isinstance(node, pstatsloader.PStatGroup):
             return node.children
         return []
+
+    def callee_edges(self, node):
+        return self.children(node)
+
+    def caller_edges(self, node):
+        return self.parents(node)
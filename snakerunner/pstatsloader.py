@@ -1,33 +1,80 @@
 """Module to load cProfile/profile records as a tree of records"""
 import pstats
 import os
+import sys
+import heapq
 import logging
+import threading
 from gettext import gettext as _
 
+from snakerunner import pathnames
+from snakerunner import workspace as workspaces
+from snakerunner import instrument
+
 log = logging.getLogger(__name__)
 
 TREE_CALLS, TREE_FILES = 0, 1
 
 
 class PStatsLoader(object):
-    """Load profiler statistics from PStats (cProfile) files"""
+    """Load profiler statistics from PStats (cProfile) files
+
+    stats -- if provided, a pstats.Stats instance to load instead of filenames
+    workspace -- the workspace.Workspace interning keys and paths (default
+        shared)
+    sources -- keep a per-source breakdown (sources.SourceMatrix) of multiple
+        files, True to name the sources after the files or a regular
+        expression extracting the name from each filename (see sources)
+
+    The raw stats are not retained, once loaded the call graph is only held
+    by the rows and their edges (see raw_stats to reconstruct them). A row's
+    edges, children and parents are only created when first used (see
+    EdgeIndex), and the location tree when the location view is first shown.
+
+    lock is held while roots are built and while stats are merged, so the
+    roots can be built (and the rows read) off the UI thread, generation
+    counts the merges (see refresh) so stale results can be recognised.
+    """
+
+    sources = None
+    # set on loaders derived by transforms (see transformed)
+    base = None
+    transforms = ()
+    derived = None
 
-    def __init__(self, *filenames):
+    def __init__(self, *filenames, stats=None, workspace=None, sources=None):
         self.filename = filenames
         self.rows = {}
+        self.edge_index = EdgeIndex(self.rows)
         self.roots = {}
         self.location_rows = {}
-        self.stats = pstats.Stats(*filenames)
-        self.tree = self.load(self.stats.stats)
-        self.location_tree = l = self.load_location()
+        self.lock = threading.RLock()
+        self.generation = 0
+        if workspace is None:
+            workspace = workspaces.default
+        self.workspace = workspace
+        workspace.register(self)
+        self.paths = pathnames.PathTable(workspace)
+        if stats is None:
+            if sources and len(filenames) > 1:
+                stats, self.sources = load_sources(
+                    filenames, pattern=None if sources is True else sources)
+            else:
+                stats = load_stats(filenames)
+        self.tree = self.load(stats.stats)
+
+    @property
+    def location_tree(self):
+        return self.get_root('location')
 
     ROOTS = ['functions', 'location']
 
     def get_root(self, key):
         """Retrieve a given declared root by root-type-key"""
         if key not in self.roots:
-            function = getattr(self, 'load_%s' % (key,))()
-            self.roots[key] = function
+            with self.lock:
+                if key not in self.roots:
+                    self.roots[key] = getattr(self, 'load_%s' % (key,))()
         return self.roots[key]
 
     def get_rows(self, key):
@@ -36,34 +83,227 @@ class PStatsLoader(object):
             self.get_root(key)
         if key == 'location':
             return self.location_rows
+        elif self.pruning is not None:
+            return self.pruning.rows
         else:
             return self.rows
 
+    pruning = None
+
+    def set_pruning(self, fraction=0.0, top=None):
+        """Restrict the function view to the heaviest functions
+
+        fraction -- drop functions below this fraction of the root's
+            cumulative time
+        top -- keep only the top N functions by cumulative time
+
+        The full row set is retained, so the limits can be changed at any time
+        without reloading the profile. Pass no limits to disable pruning.
+        """
+        if not fraction and not top:
+            self.pruning = None
+        else:
+            self.pruning = Pruning(
+                self.rows, self.get_root('functions'),
+                fraction=fraction, top=top,
+            )
+        return self.pruning
+
+    indexes = None
+
+    def get_index(self, key='functions'):
+        """Retrieve the search index of the rows of view key (built on use)
+
+        The index covers all the rows of the view, whether pruned or not.
+        """
+        if self.indexes is None:
+            self.indexes = {}
+        index = self.indexes.get(key)
+        if index is None:
+            from snakerunner import searchindex
+            self.get_root(key)
+            rows = self.location_rows if key == 'location' else self.rows
+            index = self.indexes[key] = searchindex.SearchIndex(rows.values())
+        return index
+
+    def close(self):
+        """Unregister from our workspace, with the loaders derived from us"""
+        for derived in list((self.derived or {}).values()):
+            derived.close()
+        self.derived = None
+        self.workspace.unregister(self)
+
+    def transformed(self, transforms):
+        """A (cached) loader of our profile with transforms applied"""
+        from snakerunner import transforms as transforming
+        return transforming.derive(self, transforms)
+
     def get_adapter(self, key):
         from snakerunner import pstatsadapter
         if key == 'functions':
-            return pstatsadapter.PStatsAdapter()
+            adapter = pstatsadapter.PStatsAdapter()
+            adapter.pruning = self.pruning
+            adapter.sources = self.sources
+            return adapter
         elif key == 'location':
             return pstatsadapter.DirectoryViewAdapter()
         else:
             raise KeyError("""Unknown root type %s""" % (key, ))
 
+    @instrument.timed
     def load(self, stats):
         """Build a squaremap-compatible model from a pstats class"""
         rows = self.rows
+        index = self.edge_index
+        intern_key = self.workspace.intern_key
         for func, raw in stats.items():
+            func = intern_key(func)
             try:
-                rows[func] = row = PStatRow(func, raw)
+                rows[func] = PStatRow(func, raw, self.paths, index)
             except ValueError as err:
                 log.info('Null row: %s', func)
-        for row in rows.values():
-            row.weave(rows)
+            else:
+                index.add(func, raw[4])
         return self.find_root(rows)
 
+    @instrument.timed
+    def merge(self, stats):
+        """Add raw pstats-format stats (e.g. a live snapshot delta) to our rows
+
+        Existing rows are updated in place, so views can keep referring to
+        them, only the synthetic root and location records are rebuilt.
+        """
+        with self.lock:
+            self._merge(stats)
+            self.refresh()
+
+    def _merge(self, stats):
+        rows = self.rows
+        index = self.edge_index
+        updated = []
+        created = []
+        for func, raw in stats.items():
+            row = rows.get(func)
+            if row is not None:
+                updated.append((row, raw))
+                continue
+            func = self.workspace.intern_key(func)
+            try:
+                rows[func] = row = PStatRow(func, raw, self.paths, index)
+            except ValueError:
+                log.info('Null row: %s', func)
+            else:
+                created.append(row)
+        for row in created:
+            # callers which have not created their callee edges yet find us
+            # in the index
+            index.add(row.key, [
+                caller for caller in row.callers
+                if caller not in rows or
+                not rows[caller].materialised('callees')
+            ])
+        for row in created:
+            row.materialise_callers()
+        for row in created:
+            # callees from earlier deltas which were waiting for our row
+            for key, data in index.unresolved.pop(row.key, ()):
+                callee = rows.get(key)
+                if callee is not None:
+                    callee.add_caller(rows, row.key, data)
+        for row, raw in updated:
+            row.add(raw, rows)
+
+    def refresh(self):
+        """Recalculate the derived records after the rows have changed"""
+        with self.lock:
+            self.generation += 1
+            old = self.roots.get('functions')
+            if isinstance(old, PStatGroup):
+                self.rows.pop(old.key, None)
+            for row in self.rows.values():
+                if row.materialised('callers'):
+                    row.parents = [
+                        parent for parent in row.parents
+                        if parent is not old
+                        and not isinstance(parent, PStatLocation)
+                    ]
+            self.roots = {}
+            self.location_rows = {}
+            self.indexes = None
+            for derived in list((self.derived or {}).values()):
+                derived.close()
+            self.derived = None
+            self.tree = self.find_root(self.rows)
+            if self.pruning is not None:
+                self.set_pruning(self.pruning.fraction, self.pruning.top)
+
+    def raw_stats(self):
+        """Reconstruct raw pstats-format stats from our rows and edges"""
+        stats = {}
+        for key, row in self.rows.items():
+            if not isinstance(row, PStatRow):
+                continue
+            if row.materialised('callers'):
+                callers = dict([
+                    (edge.caller.key, (
+                        edge.recursive, edge.calls,
+                        edge.local, edge.cumulative,
+                    ))
+                    for edge in row.caller_edges
+                ])
+            else:
+                callers = row.callers
+            stats[key] = (
+                row.calls, row.recursive, row.local, row.cumulative, callers)
+        return stats
+
+    def memory_usage(self):
+        """Estimate the memory held by our records (rows, edges and groups)
+
+        Returns a dictionary of counts (rows, edges, groups) and the
+        estimated total bytes (strings are shared, so they are not counted).
+        Edges are only counted once created, the raw callers of the rows
+        (and the edge index) are counted until then.
+        """
+        sizeof = sys.getsizeof
+        usage = {
+            'rows': 0, 'edges': 0, 'groups': 0, 'bytes': sizeof(self.rows)}
+        usage['bytes'] += self.edge_index.memory_usage()
+        seen = set()
+        for rows in (self.rows, self.location_rows):
+            for row in rows.values():
+                if id(row) in seen:
+                    continue
+                seen.add(id(row))
+                usage['bytes'] += sizeof(row)
+                if isinstance(row, PStatRow):
+                    usage['rows'] += 1
+                    usage['bytes'] += sizeof(row.key)
+                    if not row.materialised('callers'):
+                        usage['bytes'] += sizeof(row.callers)
+                    for edges in row.materialised_lists():
+                        usage['bytes'] += sizeof(edges)
+                        for edge in edges:
+                            usage['edges'] += 1
+                            usage['bytes'] += sizeof(edge)
+                else:
+                    usage['groups'] += 1
+                    usage['bytes'] += (
+                        sizeof(row.children) + sizeof(row.parents))
+                    if hasattr(row, '__dict__'):
+                        usage['bytes'] += sizeof(row.__dict__)
+        usage['bytes'] += sizeof(self.location_rows) + sizeof(self.paths.files)
+        for index in (self.indexes or {}).values():
+            usage['bytes'] += sum([
+                sizeof(postings) for postings in index.trigrams.values()
+            ])
+        return usage
+
     def load_functions(self):
         """Load function records from the pstats file"""
         return self.load()
 
+    @instrument.timed
     def find_root(self, rows):
         """Attempt to find/create a reasonable root node from list/set of rows
 
@@ -80,7 +320,7 @@ class PStatsLoader(object):
         root = maxes[-1]
         roots = [root]
         for key, value in rows.items():
-            if not value.parents:
+            if not value.has_parents():
                 log.debug('Found node root: %s', value)
                 if value not in roots:
                     roots.append(value)
@@ -102,55 +342,187 @@ class PStatsLoader(object):
             self.load()
         return self._load_location()
 
+    @instrument.timed
     def _load_location(self):
-        """Build a squaremap-compatible model for location-based hierarchy"""
+        """Build a squaremap-compatible model for location-based hierarchy
+
+        Directories are grouped by their logical location (see pathnames),
+        so that e.g. all installed packages share a <site-packages> root.
+        """
         directories = {}
         files = {}
         root = PStatLocation('/', 'PYTHONPATH')
         self.location_rows = self.rows.copy()
         for child in self.rows.values():
-            current = directories.get(child.directory)
             directory, filename = child.directory, child.filename
+            location = self.paths.location(directory)
+            current = directories.get(location)
             if current is None:
-                if directory == '':
+                if location == '':
                     current = root
                 else:
-                    current = PStatLocation(directory, '')
+                    current = PStatLocation(location, '')
                     self.location_rows[current.key] = current
-                directories[directory] = current
+                directories[location] = current
             if filename == '~':
                 filename = '<built-in>'
-            file_current = files.get((directory, filename))
+            file_current = files.get((location, filename))
             if file_current is None:
+                # the real directory is kept so the source can be displayed
                 file_current = PStatLocation(directory, filename)
                 self.location_rows[file_current.key] = file_current
-                files[(directory, filename)] = file_current
+                files[(location, filename)] = file_current
                 current.children.append(file_current)
             file_current.children.append(child)
-        # now link the directories...
+        # now link each directory to its closest ancestor directory...
+        trie = {}
         for key, value in directories.items():
             if value is root:
                 continue
-            found = False
-            while key:
-                new_key, rest = os.path.split(key)
-                if new_key == key:
-                    break
-                key = new_key
-                parent = directories.get(key)
-                if parent:
-                    if value is not parent:
-                        parent.children.append(value)
-                        found = True
-                        break
-            if not found:
-                root.children.append(value)
+            node = trie
+            for component in pathnames.components(key):
+                node = node.setdefault(component, {})
+            node[None] = value
+        stack = [(trie, root)]
+        while stack:
+            node, parent = stack.pop()
+            value = node.get(None)
+            if value is not None:
+                parent.children.append(value)
+                parent = value
+            for component, child in node.items():
+                if component is not None:
+                    stack.append((child, parent))
         # lastly, finalize all of the directory records...
         root.finalize()
         return root
 
 
+class Pruning(object):
+    """A restriction of a set of function rows to the heaviest functions
+
+    Time spent in dropped children of each kept node is collected into a
+    single PStatOther node for that parent, so totals stay correct.
+    """
+
+    def __init__(self, rows, root, fraction=0.0, top=None):
+        self.fraction = fraction
+        self.top = top
+        candidates = rows.values()
+        if fraction:
+            threshold = root.cumulative * fraction
+            candidates = [
+                row for row in candidates if row.cumulative >= threshold]
+        if top:
+            candidates = heapq.nlargest(
+                top, candidates, key=lambda row: row.cumulative)
+        self.kept = set(candidates)
+        self.kept.add(root)
+        self.rows = dict((row.key, row) for row in self.kept)
+        self.children_map = {}
+        self.other_edges = {}
+        for node in list(self.kept):
+            children, other = [], None
+            for child in node.children:
+                if child in self.kept:
+                    children.append(child)
+                    continue
+                if other is None:
+                    other = PStatOther(node)
+                other.absorb(node, child)
+            if other is not None:
+                children.append(other)
+                self.rows[other.key] = other
+                data = (
+                    other.recursive, other.calls,
+                    other.local, other.cumulative,
+                )
+                other.caller_edges = [PStatCallerEdge(node, other, data)]
+                self.other_edges[node] = PStatCalleeEdge(node, other, data)
+            self.children_map[node] = children
+        log.info('Pruned %s rows to %s', len(rows), len(self.kept))
+
+    def children(self, node):
+        """Retrieve the pruned children for node"""
+        return self.children_map.get(node, [])
+
+    def parents(self, node):
+        """Retrieve the parents of node which survived pruning"""
+        return [parent for parent in node.parents if parent in self.kept]
+
+    def callee_edges(self, node):
+        """Retrieve the edges to the pruned children of node"""
+        edges = getattr(node, 'callee_edges', None)
+        if edges is None:
+            return self.children(node)
+        edges = [edge for edge in edges if edge.callee in self.kept]
+        if node in self.other_edges:
+            edges.append(self.other_edges[node])
+        return edges
+
+    def caller_edges(self, node):
+        """Retrieve the edges from the parents of node surviving pruning"""
+        return [
+            edge for edge in getattr(node, 'caller_edges', ())
+            if edge.caller in self.kept
+        ]
+
+
+@instrument.timed
+def load_stats(filenames):
+    """Load profile files (cProfile dumps, columnar exports or callgrind
+    files) into pstats.Stats"""
+    from snakerunner import columnar, callgrind
+    kinds = [
+        'columnar' if columnar.is_columnar(filename) else
+        'callgrind' if callgrind.is_callgrind(filename) else
+        'pstats'
+        for filename in filenames
+    ]
+    if all(kind == 'pstats' for kind in kinds):
+        return pstats.Stats(*filenames)
+    stats = pstats.Stats()
+    for filename, kind in zip(filenames, kinds):
+        if kind == 'columnar':
+            profile = columnar.read(filename)
+            try:
+                stats.add(stats_from_dict(profile.raw_stats()))
+            finally:
+                profile.close()
+        elif kind == 'callgrind':
+            stats.add(stats_from_dict(callgrind.read(filename)))
+        else:
+            stats.add(filename)
+    return stats
+
+
+@instrument.timed
+def load_sources(filenames, pattern=None):
+    """Load profile files into pstats.Stats and a per-source
+    sources.SourceMatrix"""
+    from snakerunner import sources
+    matrix = sources.SourceMatrix()
+    combined = pstats.Stats()
+    names = sources.source_names(filenames, pattern)
+    for filename, name in zip(filenames, names):
+        stats = load_stats([filename])
+        matrix.add(name, stats.stats)
+        combined.add(stats)
+    return combined, matrix.pack()
+
+
+def stats_from_dict(raw):
+    """Wrap a raw {func: (cc, nc, tt, ct, callers)} dictionary as
+    pstats.Stats"""
+    stats = pstats.Stats()
+    stats.stats = raw
+    stats.get_top_level_stats()
+    return stats
+
+
 class BaseStat(object):
+    __slots__ = ()
+
     def recursive_distinct(self, already_done=None, attribute='children'):
         if already_done is None:
             already_done = {}
@@ -167,19 +539,86 @@ class BaseStat(object):
     def ancestors(self):
         return list(self.recursive_distinct(attribute='parents'))
 
+    def has_parents(self):
+        return bool(self.parents)
+
+
+class EdgeIndex(object):
+    """The raw call graph of rows whose edges have not been created yet
+
+    Rows keep their raw pstats callers until their caller edges (and
+    parents) are first used, callees maps each caller key to its callee
+    keys until the caller's callee edges (and children) are first used.
+    Both ends of an edge share the edge records, pending holds the records
+    created by one end until the other end picks them up, so memory grows
+    with the part of the graph actually explored. unresolved holds the raw
+    caller data of created rows whose caller has no row yet (a live delta
+    can bring a callee before its caller), see PStatsLoader.merge.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.callees = {}
+        self.pending = {}
+        self.unresolved = {}
+        self.lock = threading.Lock()
+
+    def add(self, key, callers):
+        """Index the callers (raw caller keys) of the row for key"""
+        callees = self.callees
+        for caller in callers:
+            found = callees.get(caller)
+            if found is None:
+                callees[caller] = [key]
+            else:
+                found.append(key)
+
+    def defer(self, caller, key, data):
+        """Keep caller data for the row for key until caller's row exists"""
+        found = self.unresolved.get(caller)
+        if found is None:
+            self.unresolved[caller] = [(key, data)]
+        else:
+            found.append((key, data))
+
+    def memory_usage(self):
+        sizeof = sys.getsizeof
+        usage = sizeof(self.callees) + sizeof(self.pending)
+        usage += sizeof(self.unresolved)
+        usage += sum([sizeof(callees) for callees in self.unresolved.values()])
+        usage += sum([sizeof(callees) for callees in self.callees.values()])
+        usage += sum([sizeof(pair[0]) * 2 for pair in self.pending.values()])
+        return usage
+
 
 class PStatRow(BaseStat):
-    """Simulates a HotShot profiler record using PStats module"""
+    """Simulates a HotShot profiler record using PStats module
 
-    def __init__(self, key, raw):
-        self.children = []
-        self.parents = []
+    The edges (and so children and parents) are created from the raw
+    callers and the EdgeIndex when first used, see materialise_callers and
+    materialise_callees.
+    """
+    __slots__ = (
+        'key', '_children', '_parents', '_caller_edges', '_callee_edges',
+        'calls', 'recursive', 'local', 'localPer', 'cumulative',
+        'cumulativePer', 'directory', 'filename', 'name', 'lineno', 'callers',
+        'index',
+    )
+
+    def __init__(self, key, raw, paths=None, index=None):
+        self._children = self._parents = None
+        self._caller_edges = self._callee_edges = None
+        self.index = index
         file, line, func = self.key = key
-        try:
-            dirname, basename = os.path.dirname(file), os.path.basename(file)
-        except ValueError as err:
-            dirname = ''
-            basename = file
+        if paths is not None:
+            dirname, basename = paths.split(file)
+        else:
+            try:
+                dirname = os.path.dirname(file)
+                basename = os.path.basename(file)
+            except ValueError as err:
+                dirname = ''
+                basename = file
         nc, cc, tt, ct, callers = raw
         if nc == cc == tt == ct == 0:
             raise ValueError('Null stats row')
@@ -196,7 +635,7 @@ class PStatRow(BaseStat):
             ct/(nc or 0.00000000000001),
             dirname,
             basename,
-            func,
+            sys.intern(func),
             line,
         )
         self.callers = callers
@@ -204,28 +643,322 @@ class PStatRow(BaseStat):
     def __repr__(self):
         return 'PStatRow( %r,%r,%r,%r, %s )' % (self.directory, self.filename, self.lineno, self.name, len(self.children))
 
+    @property
+    def children(self):
+        if self._children is None:
+            self.materialise_callees()
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        if self._children is None:
+            self.materialise_callees()
+        self._children = children
+
+    @property
+    def callee_edges(self):
+        if self._callee_edges is None:
+            self.materialise_callees()
+        return self._callee_edges
+
+    @property
+    def parents(self):
+        if self._parents is None:
+            self.materialise_callers()
+        return self._parents
+
+    @parents.setter
+    def parents(self, parents):
+        if self._parents is None:
+            self.materialise_callers()
+        self._parents = parents
+
+    @property
+    def caller_edges(self):
+        if self._caller_edges is None:
+            self.materialise_callers()
+        return self._caller_edges
+
+    def materialised(self, side):
+        """Whether our 'callers' or 'callees' edges have been created"""
+        if side == 'callers':
+            return self._caller_edges is not None
+        return self._callee_edges is not None
+
+    def materialised_lists(self):
+        """Our edge lists which have been created"""
+        return [
+            edges for edges in (self._caller_edges, self._callee_edges)
+            if edges is not None
+        ]
+
+    def has_parents(self):
+        """Whether any caller of ours is loaded (without creating the edges)"""
+        if self._parents is not None:
+            return bool(self._parents)
+        rows = self.index.rows if self.index is not None else {}
+        return any(caller in rows for caller in self.callers)
+
     def add_child(self, child):
         self.children.append(child)
 
-    def weave(self, rows):
-        for caller, data in self.callers.items():
-            # data is (cc,nc,tt,ct)
-            parent = rows.get(caller)
-            if parent:
-                self.parents.append(parent)
-                parent.children.append(self)
+    @instrument.timed
+    def materialise_callers(self):
+        """Create our caller edges and parents from our raw callers"""
+        index = self.index
+        if index is None:
+            self._parents, self._caller_edges, self.callers = [], [], None
+            return
+        with index.lock:
+            if self._caller_edges is not None:
+                return
+            rows = index.rows
+            parents, edges = [], []
+            for caller, data in self.callers.items():
+                parent = rows.get(caller)
+                if not parent:
+                    index.defer(caller, self.key, data)
+                    continue
+                pair = index.pending.pop((parent.key, self.key), None)
+                if pair is None:
+                    pair = (
+                        PStatCallerEdge(parent, self, data),
+                        PStatCalleeEdge(parent, self, data),
+                    )
+                    if parent._callee_edges is None:
+                        index.pending[(parent.key, self.key)] = pair
+                    else:
+                        # a parent which did not index us (see
+                        # PStatsLoader.merge)
+                        parent._children.append(self)
+                        parent._callee_edges.append(pair[1])
+                parents.append(parent)
+                edges.append(pair[0])
+            self._parents, self._caller_edges = parents, edges
+            self.callers = None
+
+    @instrument.timed
+    def materialise_callees(self):
+        """Create our callee edges and children from the EdgeIndex"""
+        index = self.index
+        if index is None:
+            self._children, self._callee_edges = [], []
+            return
+        with index.lock:
+            if self._callee_edges is not None:
+                return
+            rows = index.rows
+            children, edges = [], []
+            for key in index.callees.pop(self.key, ()):
+                child = rows.get(key)
+                if not child:
+                    continue
+                pair = index.pending.pop((self.key, child.key), None)
+                if pair is None:
+                    if child.callers is None:
+                        continue
+                    data = child.callers.get(self.key)
+                    if data is None:
+                        continue
+                    pair = (
+                        PStatCallerEdge(self, child, data),
+                        PStatCalleeEdge(self, child, data),
+                    )
+                    index.pending[(self.key, child.key)] = pair
+                children.append(child)
+                edges.append(pair[1])
+            self._children, self._callee_edges = children, edges
+
+    def weave_caller(self, rows, caller, data):
+        # data is (cc,nc,tt,ct)
+        parent = rows.get(caller)
+        if parent:
+            self.parents.append(parent)
+            parent.children.append(self)
+            self.caller_edges.append(PStatCallerEdge(parent, self, data))
+            parent.callee_edges.append(PStatCalleeEdge(parent, self, data))
+        elif self.index is not None:
+            self.index.defer(caller, self.key, data)
+
+    def add(self, raw, rows):
+        """Add raw (delta) stats for our function to our values and edges"""
+        nc, cc, tt, ct, callers = raw
+        self.calls += nc
+        self.recursive += cc
+        self.local += tt
+        self.cumulative += ct
+        self.localPer = self.local/(self.recursive or 0.00000000000001)
+        self.cumulativePer = self.cumulative/(self.calls or 0.00000000000001)
+        for caller, data in callers.items():
+            self.add_caller(rows, caller, data)
+
+    def add_caller(self, rows, caller, data):
+        """Add (delta) caller data to our edge from caller"""
+        parent = rows.get(caller)
+        edge = caller_edge(parent, self)
+        if edge is None:
+            self.weave_caller(rows, caller, data)
+            return
+        edge.add(data)
+        for parent_edge in parent.callee_edges:
+            if parent_edge.callee is self:
+                parent_edge.add(data)
 
     def child_cumulative_time(self, child):
         total = self.cumulative
         if total:
-            try:
-                (cc, nc, tt, ct) = child.callers[self.key]
-            except TypeError as err:
-                ct = child.callers[self.key]
-            return float(ct)/total
+            callers = getattr(child, 'callers', None)
+            if callers is not None:
+                # read the raw edge rather than create all of child's caller
+                # edges
+                data = callers.get(self.key)
+                if data is None:
+                    return 0
+                cumulative = data[3] if isinstance(data, tuple) else data
+                return float(cumulative)/total
+            edge = caller_edge(self, child)
+            if edge is not None:
+                return float(edge.cumulative)/total
         return 0
 
 
+def caller_edge(caller, callee):
+    """Find the edge from caller among the caller edges of callee"""
+    if caller is None:
+        return None
+    for edge in callee.caller_edges:
+        if edge.caller is caller:
+            return edge
+    return None
+
+
+class PStatEdge(object):
+    """Time spent by a caller in a callee along a single edge of the call graph
+
+    Edges are displayed in list views, node is the end of the edge being
+    listed, the edge otherwise reads like a row for that node.
+    """
+    __slots__ = (
+        'caller', 'callee', 'calls', 'recursive', 'local', 'cumulative')
+
+    def __init__(self, caller, callee, data):
+        self.caller = caller
+        self.callee = callee
+        self.update(data)
+
+    def update(self, data):
+        """Set our values from pstats caller data"""
+        try:
+            # data is (nc,cc,tt,ct)
+            (nc, cc, tt, ct) = data
+        except TypeError as err:
+            nc = cc = tt = 0
+            ct = data
+        self.calls, self.recursive = cc, nc
+        self.local, self.cumulative = tt, ct
+
+    def add(self, data):
+        """Add (delta) pstats caller data to our values"""
+        calls, recursive = self.calls, self.recursive
+        local, cumulative = self.local, self.cumulative
+        self.update(data)
+        self.calls += calls
+        self.recursive += recursive
+        self.local += local
+        self.cumulative += cumulative
+
+    def __repr__(self):
+        return '%s( %r -> %r )' % (
+            self.__class__.__name__, self.caller, self.callee)
+
+    @property
+    def localPer(self):
+        return self.local/(self.recursive or 0.00000000000001)
+
+    @property
+    def cumulativePer(self):
+        return self.cumulative/(self.calls or 0.00000000000001)
+
+    @property
+    def key(self):
+        return self.node.key
+
+    @property
+    def directory(self):
+        return self.node.directory
+
+    @property
+    def filename(self):
+        return self.node.filename
+
+    @property
+    def name(self):
+        return self.node.name
+
+    @property
+    def lineno(self):
+        return getattr(self.node, 'lineno', 0)
+
+
+class PStatCalleeEdge(PStatEdge):
+    """Edge as listed among the callees of the caller"""
+    __slots__ = ()
+
+    @property
+    def node(self):
+        return self.callee
+
+
+class PStatCallerEdge(PStatEdge):
+    """Edge as listed among the callers of the callee"""
+    __slots__ = ()
+
+    @property
+    def node(self):
+        return self.caller
+
+
+class PStatOther(BaseStat):
+    """Synthetic row collecting the time of pruned children of a parent"""
+
+    def __init__(self, parent):
+        self.key = (parent.key, '<other>')
+        self.directory = parent.directory
+        self.filename = parent.filename
+        self.lineno = getattr(parent, 'lineno', 0)
+        self.name = _('<other>')
+        self.count = 0
+        self.calls = self.recursive = 0
+        self.local = self.cumulative = 0.0
+        self.children = []
+        self.parents = [parent]
+        self.caller_edges = []
+        self.callee_edges = []
+
+    def __repr__(self):
+        return 'PStatOther( %r, %s )' % (self.parents[0], self.count)
+
+    def absorb(self, parent, child):
+        """Account for the time parent spent in the (pruned) child"""
+        if isinstance(parent, PStatGroup):
+            nc, cc = child.recursive, child.calls
+            tt, ct = child.local, child.cumulative
+        else:
+            edge = caller_edge(parent, child)
+            if edge is None:
+                return
+            nc, cc = edge.recursive, edge.calls
+            tt, ct = edge.local, edge.cumulative
+        self.count += 1
+        self.calls += cc
+        self.recursive += nc
+        self.local += tt
+        self.cumulative += ct
+        self.localPer = self.local/(self.recursive or 0.00000000000001)
+        self.cumulativePer = self.cumulative/(self.calls or 0.00000000000001)
+        self.name = _('<%(count)s others>') % {'count': self.count}
+
+
 class PStatGroup(BaseStat):
     """A node/record that holds a group of children but isn't a raw-record based group"""
     # if LOCAL_ONLY then only take the raw-record's local values, not cumulative values
@@ -315,7 +1048,6 @@ class PStatLocation(PStatGroup):
 
 
 if __name__ == "__main__":
-    import sys
     p = PStatsLoader(sys.argv[1])
     assert p.tree
     print(p.tree)
@@ -0,0 +1,235 @@
+// Browser front-end for `snakerunner serve`, all data comes from the JSON API
+(function () {
+  'use strict';
+
+  var PAGE_SIZE = 100;
+  var state = {
+    profile: null,
+    view: 'functions',
+    sort: 'cumulative',
+    order: 'desc',
+    offset: 0,
+    query: '',
+    activated: null,
+    selected: null,
+    history: [],
+    layout: null
+  };
+
+  function $(id) { return document.getElementById(id); }
+
+  function api(path, params) {
+    var url = 'api/' + path;
+    if (params) {
+      url += '?' + Object.keys(params).filter(function (key) {
+        return params[key] !== null && params[key] !== undefined;
+      }).map(function (key) {
+        return encodeURIComponent(key) + '=' + encodeURIComponent(params[key]);
+      }).join('&');
+    }
+    return fetch(url).then(function (response) {
+      return response.json().then(function (data) {
+        if (!response.ok) { throw new Error(data.error || response.statusText); }
+        return data;
+      });
+    });
+  }
+
+  function status(text) { $('status').textContent = text; }
+
+  function seconds(value) { return value === null ? '' : value.toFixed(4); }
+
+  function cell(tr, text, number) {
+    var td = document.createElement('td');
+    td.textContent = text;
+    if (number) { td.className = 'number'; }
+    tr.appendChild(td);
+  }
+
+  function fillTable(tbody, rows) {
+    tbody.innerHTML = '';
+    rows.forEach(function (row) {
+      var tr = document.createElement('tr');
+      if (row.id === state.selected) { tr.className = 'selected'; }
+      cell(tr, row.name || row.filename);
+      cell(tr, row.calls, true);
+      cell(tr, row.recursive, true);
+      cell(tr, seconds(row.local), true);
+      if (tbody.id === 'rows') { cell(tr, seconds(row.localPer), true); }
+      cell(tr, seconds(row.cumulative), true);
+      if (tbody.id === 'rows') { cell(tr, seconds(row.cumulativePer), true); }
+      cell(tr, row.filename + (row.lineno ? ':' + row.lineno : ''));
+      tr.addEventListener('click', function () { select(row.id); });
+      tr.addEventListener('dblclick', function () { activate(row.id); });
+      tbody.appendChild(tr);
+    });
+  }
+
+  function loadRows() {
+    api(state.profile + '/rows', {
+      sort: state.sort, order: state.order, offset: state.offset,
+      limit: PAGE_SIZE, q: state.query
+    }).then(function (page) {
+      fillTable($('rows'), page.rows);
+      var last = Math.min(page.offset + PAGE_SIZE, page.total);
+      $('page').textContent = (page.total ? page.offset + 1 : 0) + '-' + last + ' of ' + page.total;
+      $('previous').disabled = page.offset === 0;
+      $('next').disabled = last >= page.total;
+    }, function (err) { status(err.message); });
+  }
+
+  function loadEdges() {
+    if (state.selected === null) { return; }
+    var node = state.profile + '/node/' + state.selected;
+    api(node + '/children').then(function (data) { fillTable($('callees'), data.rows); });
+    api(node + '/parents').then(function (data) { fillTable($('callers'), data.rows); });
+  }
+
+  function colour(id) {
+    var red = (id * 10) % 255, green = 200 - ((id * 5) % 200), blue = (id * 25) % 200;
+    return 'rgb(' + red + ',' + green + ',' + blue + ')';
+  }
+
+  function loadLayout() {
+    var canvas = $('canvas');
+    var width = canvas.clientWidth, height = canvas.clientHeight;
+    canvas.width = width;
+    canvas.height = height;
+    // the visible tile of the map, which is the whole map until it can be zoomed
+    api(state.profile + '/layout', {
+      node: state.activated, view: state.view, width: width, height: height,
+      tile: [0, 0, width, height].join(',')
+    }).then(function (data) {
+      state.layout = data;
+      draw();
+    }, function (err) { status(err.message); });
+  }
+
+  function draw() {
+    var canvas = $('canvas'), context = canvas.getContext('2d'), data = state.layout;
+    if (!data) { return; }
+    context.clearRect(0, 0, canvas.width, canvas.height);
+    context.font = '11px sans-serif';
+    context.textBaseline = 'top';
+    data.boxes.forEach(function (box) {
+      var id = box[0], x = box[2], y = box[3], w = box[4], h = box[5], label = box[6];
+      context.fillStyle = id === state.selected ? '#ffd040' : colour(id);
+      context.fillRect(x, y, w, h);
+      context.strokeStyle = '#222';
+      context.strokeRect(x + 0.5, y + 0.5, w - 1, h - 1);
+      if (label && label[3] > 11) {
+        context.save();
+        context.beginPath();
+        context.rect(label[0], label[1], label[2], label[3]);
+        context.clip();
+        context.fillStyle = '#000';
+        var node = data.nodes[id];
+        context.fillText(node.name + ' [' + node.cumulative.toFixed(3) + 's]', label[0] + 2, label[1] + 1);
+        context.restore();
+      }
+    });
+  }
+
+  function nodeAt(event) {
+    var data = state.layout, found = null;
+    if (!data) { return null; }
+    var rect = $('canvas').getBoundingClientRect();
+    var px = event.clientX - rect.left, py = event.clientY - rect.top;
+    data.boxes.forEach(function (box) {
+      if (px >= box[2] && px < box[2] + box[4] && py >= box[3] && py < box[3] + box[5]) {
+        if (found === null || box[1] >= found[1]) { found = box; }
+      }
+    });
+    return found && found[0];
+  }
+
+  function select(id) {
+    state.selected = id;
+    loadEdges();
+    draw();
+    Array.prototype.forEach.call(document.querySelectorAll('tr.selected'), function (tr) {
+      tr.className = '';
+    });
+  }
+
+  function activate(id, back) {
+    if (!back) { state.history.push(state.activated); }
+    state.activated = id;
+    select(id);
+    loadLayout();
+  }
+
+  function loadProfile(name) {
+    state.profile = name;
+    state.offset = 0;
+    state.activated = null;
+    state.selected = null;
+    state.history = [];
+    loadRows();
+    loadLayout();
+  }
+
+  function bind() {
+    $('profile').addEventListener('change', function () { loadProfile(this.value); });
+    $('view').addEventListener('change', function () {
+      state.view = this.value;
+      state.activated = null;
+      loadLayout();
+    });
+    $('root').addEventListener('click', function () { activate(null); });
+    $('back').addEventListener('click', function () {
+      if (state.history.length) { activate(state.history.pop(), true); }
+    });
+    var timer = null;
+    $('search').addEventListener('input', function () {
+      var value = this.value;
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        state.query = value;
+        state.offset = 0;
+        loadRows();
+      }, 200);
+    });
+    $('previous').addEventListener('click', function () {
+      state.offset = Math.max(0, state.offset - PAGE_SIZE);
+      loadRows();
+    });
+    $('next').addEventListener('click', function () {
+      state.offset += PAGE_SIZE;
+      loadRows();
+    });
+    Array.prototype.forEach.call(document.querySelectorAll('th[data-sort]'), function (th) {
+      th.addEventListener('click', function () {
+        var sort = th.getAttribute('data-sort');
+        state.order = (state.sort === sort && state.order === 'desc') ? 'asc' : 'desc';
+        state.sort = sort;
+        state.offset = 0;
+        loadRows();
+      });
+    });
+    $('canvas').addEventListener('click', function (event) {
+      var id = nodeAt(event);
+      if (id !== null) { select(id); }
+    });
+    $('canvas').addEventListener('dblclick', function (event) {
+      var id = nodeAt(event);
+      if (id !== null) { activate(id); }
+    });
+    var resizing = null;
+    window.addEventListener('resize', function () {
+      clearTimeout(resizing);
+      resizing = setTimeout(loadLayout, 200);
+    });
+  }
+
+  bind();
+  api('profiles').then(function (data) {
+    data.profiles.forEach(function (profile) {
+      var option = document.createElement('option');
+      option.value = profile.name;
+      option.textContent = profile.name + ' (' + profile.rows + ' functions)';
+      $('profile').appendChild(option);
+    });
+    if (data.profiles.length) { loadProfile(data.profiles[0].name); }
+  }, function (err) { status(err.message); });
+}());
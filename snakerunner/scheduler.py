@@ -0,0 +1,109 @@
+"""Run view computations (layouts, sorts, loading roots) off the UI thread
+
+Each request is made on a channel (e.g. 'layout' or a list's name), a new
+request supersedes any earlier one on the same channel: if that has not
+started it is dropped, if it is running it is cancelled at its next check
+and its result, if any, is never delivered. Results are handed to the
+callback through deliver (wx.CallAfter in the viewer), so they are
+swapped into the views on the UI thread, in one step.
+"""
+import queue
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class Cancelled(Exception):
+    """Raised inside a computation which has been superseded"""
+
+
+class Token(object):
+    """Identifies one request, computations call check() to stop early"""
+
+    def __init__(self, scheduler, channel, generation):
+        self.scheduler = scheduler
+        self.channel = channel
+        self.generation = generation
+
+    @property
+    def current(self):
+        return self.scheduler.generations.get(self.channel) == self.generation
+
+    def check(self):
+        if not self.current:
+            raise Cancelled(self.channel)
+
+
+class Scheduler(object):
+    """A worker thread running the latest request of each channel
+
+    deliver -- deliver(function, *args) calls function on the UI thread
+    """
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.worker = None
+
+    def submit(self, channel, function, callback, errback=None):
+        """Compute function(token) on the worker, then callback(result) on
+        the UI thread
+
+        errback -- if given, errback(error) is called (on the UI thread)
+            instead when function raises
+        Returns the request's Token, superseding the channel's earlier
+        requests.
+        """
+        with self.lock:
+            generation = self.generations.get(channel, 0) + 1
+            self.generations[channel] = generation
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(
+                    target=self.run, name='snakerunner-scheduler')
+                self.worker.daemon = True
+                self.worker.start()
+        token = Token(self, channel, generation)
+        self.requests.put((token, function, callback, errback))
+        return token
+
+    def cancel(self, channel):
+        """Cancel any outstanding request on channel"""
+        with self.lock:
+            self.generations[channel] = self.generations.get(channel, 0) + 1
+
+    def close(self):
+        """Cancel all requests (e.g. as the views are destroyed) and stop the
+        worker"""
+        with self.lock:
+            for channel in self.generations:
+                self.generations[channel] += 1
+        self.requests.put(None)
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            token, function, callback, errback = request
+            if not token.current:
+                continue
+            try:
+                result = function(token)
+            except Cancelled:
+                log.debug('Cancelled superseded %s request', token.channel)
+                continue
+            except Exception as err:
+                log.exception('Failure computing %s', token.channel)
+                if errback is not None:
+                    self.deliver(self.complete, token, errback, err)
+                continue
+            self.deliver(self.complete, token, callback, result)
+
+    def complete(self, token, callback, result):
+        """Hand the result to callback if no later request superseded it (UI
+        thread)"""
+        if token.current:
+            callback(result)
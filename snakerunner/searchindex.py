@@ -0,0 +1,186 @@
+"""Trigram index for searching/filtering profile rows by name and location
+
+Queries are whitespace-separated terms which must all match a row:
+
+    text            -- case-insensitive substring of name, filename or
+                       directory
+    /regex/         -- regular expression searched in name, filename or
+                       directory
+    attribute>value -- numeric predicate, e.g. cumulative>0.1 or calls>=100
+"""
+import re
+import operator
+import logging
+
+log = logging.getLogger(__name__)
+
+FIELDS = ('name', 'filename', 'directory')
+NUMERIC_ATTRIBUTES = (
+    'calls', 'recursive', 'local', 'localPer', 'cumulative', 'cumulativePer',
+    'lineno',
+)
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+PREDICATE = re.compile(
+    r'^(?P<attribute>[A-Za-z]+)(?P<op><=|>=|==|!=|<|>|=)'
+    r'(?P<value>[-+0-9.eE]+)$'
+)
+# separates the fields of a row's search text, never part of a query term
+SEPARATOR = '\0'
+
+
+class QueryError(ValueError):
+    """Raised for a query which cannot be parsed"""
+
+
+class SearchState(object):
+    """The last query (and result) of one caller's successive searches
+
+    Lets a search narrow the previous result as the user types, kept by the
+    caller so that an index can be shared (e.g. between server threads).
+    """
+
+    def __init__(self):
+        self.index = None
+        self.query = None
+        self.result = None
+
+
+class SearchIndex(object):
+    """Trigram index over the textual fields of a set of rows
+
+    The index is built once (per loader), queries then only verify the
+    candidate rows which contain every trigram of a search term. It is not
+    modified by searches, so it may be searched from several threads.
+    """
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.texts = []
+        self.trigrams = {}
+        for index, row in enumerate(self.rows):
+            text = SEPARATOR.join([
+                str(getattr(row, field, '') or '') for field in FIELDS
+            ]).lower()
+            self.texts.append(text)
+            for trigram in set(trigrams(text)):
+                postings = self.trigrams.get(trigram)
+                if postings is None:
+                    self.trigrams[trigram] = postings = []
+                postings.append(index)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search(self, query, state=None):
+        """Return the rows matching query (in index order)
+
+        state -- the caller's SearchState, if given the search narrows the
+            caller's previous result where possible and records this one
+        """
+        query = query.strip()
+        if not query:
+            return self.rows[:]
+        terms = query.split()
+        candidates = None
+        if state is not None and self.narrows(state, query):
+            # typing more characters can only narrow the previous result
+            candidates = state.result
+        matchers = [parse_term(term) for term in terms]
+        if candidates is None:
+            candidates = self.candidates(terms)
+        result = [
+            index for index in candidates
+            if all(
+                matcher(self.rows[index], self.texts[index])
+                for matcher in matchers
+            )
+        ]
+        if state is not None:
+            state.index, state.query, state.result = self, query, result
+        return [self.rows[index] for index in result]
+
+    def narrows(self, state, query):
+        """Is query guaranteed to be a subset of state's last query?"""
+        last = state.query
+        if state.index is not self or last is None:
+            return False
+        if not query.startswith(last):
+            return False
+        if query[len(last):len(last)+1].isspace():
+            # appended a new (and-ed) term
+            return True
+        return (
+            is_substring(last.split()[-1]) and
+            is_substring(query.split()[-1])
+        )
+
+    def candidates(self, terms):
+        """Use the trigram postings to restrict the rows to check"""
+        best = None
+        for term in terms:
+            if not is_substring(term):
+                continue
+            for trigram in set(trigrams(term.lower())):
+                postings = self.trigrams.get(trigram, ())
+                if best is None or len(postings) < len(best):
+                    best = postings
+                if not best:
+                    return []
+        if best is None:
+            return range(len(self.rows))
+        return best
+
+
+def trigrams(text):
+    """Produce all 3-character substrings of text"""
+    return [text[i:i+3] for i in range(len(text) - 2)]
+
+
+def is_substring(term):
+    """Is term a plain substring term (rather than a regex or predicate)?"""
+    return not (term.startswith('/') or PREDICATE.match(term))
+
+
+def parse_term(term):
+    """Convert a query term into a matcher(row, text) function"""
+    if term.startswith('/'):
+        pattern = term[1:]
+        if pattern.endswith('/') and len(pattern) > 1:
+            pattern = pattern[:-1]
+        try:
+            regex = re.compile(pattern, re.I)
+        except re.error as err:
+            raise QueryError(
+                'Invalid regular expression %r: %s' % (pattern, err))
+
+        def matcher(row, text):
+            return any(regex.search(field) for field in text.split(SEPARATOR))
+        return matcher
+    match = PREDICATE.match(term)
+    if match:
+        attribute, op, value = match.group('attribute', 'op', 'value')
+        if attribute not in NUMERIC_ATTRIBUTES:
+            raise QueryError('Unknown attribute %r' % (attribute,))
+        try:
+            value = float(value)
+        except ValueError:
+            raise QueryError('Invalid number %r' % (value,))
+        compare = OPERATORS[op]
+
+        def matcher(row, text):
+            current = getattr(row, attribute, None)
+            return current is not None and compare(current, value)
+        return matcher
+    term = term.lower()
+
+    def matcher(row, text):
+        return term in text
+    return matcher
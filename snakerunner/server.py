@@ -0,0 +1,462 @@
+"""Serve loaded profiles to web browsers, for hosts without a display
+
+    snakerunner serve [--host HOST] [--port PORT] profile [profile ...]
+
+Each profile is loaded once (through PStatsLoader) at startup and shared by
+all viewers. The browser front-end (resources/web) is served at / and
+reads the JSON API:
+
+    /api/profiles                       -- the loaded profiles
+    /api/<profile>/rows                 -- a page of rows, see Profile.rows
+    /api/<profile>/node/<id>            -- a single row
+    /api/<profile>/node/<id>/children   -- the calls the row makes (edges)
+    /api/<profile>/node/<id>/parents    -- the calls made to the row (edges)
+    /api/<profile>/layout               -- square-map boxes, see Profile.layout
+
+Rows are sorted and paged on the server, so a browser only ever receives
+the rows it shows. Requests are handled by an asyncio loop, the sorting
+and layout work runs in a thread pool so one viewer's request does not
+hold up the others; sort orders and layouts are cached between requests.
+"""
+import os
+import json
+import asyncio
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from snakerunner import layout
+from snakerunner import pstatsloader
+from snakerunner import searchindex
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8808
+STATIC_DIRECTORY = os.path.join(os.path.dirname(__file__), 'resources', 'web')
+# most rows returned by one request, and layouts kept per profile
+PAGE_LIMIT = 500
+LAYOUT_CACHE_SIZE = 32
+MAX_MAP_SIZE = 8192
+SORT_COLUMNS = (
+    'name', 'calls', 'recursive', 'local', 'localPer', 'cumulative',
+    'cumulativePer', 'directory', 'filename', 'lineno',
+)
+VIEWS = ('functions', 'location')
+ROW_ATTRIBUTES = (
+    'name', 'directory', 'filename', 'lineno', 'calls', 'recursive',
+    'local', 'localPer', 'cumulative', 'cumulativePer',
+)
+EDGE_ATTRIBUTES = ('calls', 'recursive', 'local', 'cumulative')
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super(HTTPError, self).__init__(message)
+        self.status = status
+
+
+class ServeAdapter(layout.DefaultAdapter):
+    """Square-map adapter for the function view (as pstatsadapter, no wx)"""
+
+    def value(self, node, parent=None):
+        if isinstance(parent, pstatsloader.PStatGroup):
+            if parent.cumulative:
+                return node.cumulative / parent.cumulative
+            return 0
+        elif parent is None:
+            return node.cumulative
+        return parent.child_cumulative_time(node)
+
+    def label(self, node):
+        return node.name
+
+    def empty(self, node):
+        if node.cumulative:
+            return node.local / float(node.cumulative)
+        return 0.0
+
+    def children(self, node):
+        return [
+            child for child in node.children
+            if getattr(child, 'tree', self.TREE) == self.TREE
+        ]
+
+    TREE = pstatsloader.TREE_CALLS
+
+
+class ServeDirectoryAdapter(ServeAdapter):
+    """Square-map adapter for the location view"""
+
+    TREE = pstatsloader.TREE_FILES
+
+    def children(self, node):
+        if isinstance(node, pstatsloader.PStatGroup):
+            return node.children
+        return []
+
+
+ADAPTERS = {
+    'functions': ServeAdapter,
+    'location': ServeDirectoryAdapter,
+}
+
+
+def sort_key(attribute):
+    if attribute in ('name', 'directory', 'filename'):
+        return lambda row: getattr(row, attribute, '') or ''
+    return lambda row: getattr(row, attribute, 0) or 0
+
+
+class Profile(object):
+    """A loaded profile with the node ids, sort orders and layouts served"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.nodes = []
+        self.ids = {}
+        self.orders = {}
+        self.layouts = OrderedDict()
+
+    def node_id(self, node):
+        """Our (stable) integer id for node"""
+        identity = id(node)
+        node_id = self.ids.get(identity)
+        if node_id is None:
+            with self.lock:
+                node_id = self.ids.get(identity)
+                if node_id is None:
+                    node_id = self.ids[identity] = len(self.nodes)
+                    self.nodes.append(node)
+        return node_id
+
+    def node(self, node_id):
+        try:
+            index = int(node_id)
+        except ValueError:
+            index = -1
+        if not 0 <= index < len(self.nodes):
+            raise HTTPError(404, 'No such node %s' % (node_id,))
+        return self.nodes[index]
+
+    def root(self, view='functions'):
+        if view not in VIEWS:
+            raise HTTPError(400, 'Unknown view %s' % (view,))
+        return self.loader.get_root(view)
+
+    def record(self, node):
+        record = dict([
+            (attribute, getattr(node, attribute, None))
+            for attribute in ROW_ATTRIBUTES
+        ])
+        record['id'] = self.node_id(node)
+        record['children'] = len(getattr(node, 'children', ()))
+        return record
+
+    def edge_record(self, edge):
+        if not isinstance(edge, pstatsloader.PStatEdge):
+            # a group (e.g. the root of a multi-root run) has no edge records
+            return self.record(edge)
+        record = self.record(edge.node)
+        for attribute in EDGE_ATTRIBUTES:
+            record[attribute] = getattr(edge, attribute)
+        return record
+
+    def summary(self):
+        root = self.root()
+        return {
+            'name': self.name,
+            'filenames': list(self.loader.filename),
+            'rows': len(self.functions()),
+            'root': self.record(root),
+            'location': self.node_id(self.root('location')),
+            'total': root.cumulative,
+        }
+
+    def functions(self):
+        """The function rows, without the synthetic (group) root"""
+        return [
+            row for row in self.loader.rows.values()
+            if not isinstance(row, pstatsloader.PStatGroup)
+        ]
+
+    def order(self, sort, descending):
+        """All function rows sorted on attribute sort (cached)"""
+        key = (sort, descending)
+        rows = self.orders.get(key)
+        if rows is None:
+            rows = sorted(
+                self.functions(), key=sort_key(sort), reverse=descending,
+            )
+            self.orders[key] = rows
+        return rows
+
+    def rows(
+        self, sort='cumulative', descending=True, offset=0, limit=100,
+        query='',
+    ):
+        """A page of the rows, sorted and optionally matching a search query"""
+        if sort not in SORT_COLUMNS:
+            raise HTTPError(400, 'Cannot sort on %s' % (sort,))
+        limit = max(0, min(limit, PAGE_LIMIT))
+        rows = self.order(sort, descending)
+        if query.strip():
+            try:
+                # no SearchState: requests run on several threads
+                index = self.loader.get_index()
+                matches = set(map(id, index.search(query)))
+            except searchindex.QueryError as err:
+                raise HTTPError(400, str(err))
+            rows = [row for row in rows if id(row) in matches]
+        return {
+            'total': len(rows),
+            'offset': offset,
+            'rows': [self.record(row) for row in rows[offset:offset + limit]],
+        }
+
+    def children(self, node_id):
+        node = self.node(node_id)
+        edges = getattr(node, 'callee_edges', None)
+        if edges is None:
+            edges = node.children
+        return {'rows': [self.edge_record(edge) for edge in edges]}
+
+    def parents(self, node_id):
+        node = self.node(node_id)
+        edges = getattr(node, 'caller_edges', None)
+        if edges is None:
+            edges = []
+        groups = [
+            parent for parent in getattr(node, 'parents', ())
+            if isinstance(parent, pstatsloader.PStatGroup)
+            and parent.tree == pstatsloader.TREE_CALLS
+        ]
+        return {'rows': [
+            self.edge_record(edge) for edge in list(edges) + groups]}
+
+    def layout(
+        self, node_id=None, view='functions', width=800, height=600,
+        tile=None,
+    ):
+        """Square-map boxes of node (default the view's root) at width x height
+
+        tile -- (x, y, w, h), only return the boxes intersecting this area
+            (e.g. the browser's viewport onto a large map)
+
+        The whole layout is computed once per node and size and cached,
+        tiles are cut from it.
+        """
+        width = max(1, min(int(width), MAX_MAP_SIZE))
+        height = max(1, min(int(height), MAX_MAP_SIZE))
+        node = self.root(view) if node_id is None else self.node(node_id)
+        key = (id(node), view, width, height)
+        with self.lock:
+            computed = self.layouts.get(key)
+            if computed is not None:
+                self.layouts.move_to_end(key)
+        if computed is None:
+            computed = layout.Layout(
+                node, ADAPTERS[view](), width, height,
+                padding=6, square_style=True,
+            )
+            with self.lock:
+                self.layouts[key] = computed
+                while len(self.layouts) > LAYOUT_CACHE_SIZE:
+                    self.layouts.popitem(last=False)
+        boxes = []
+        nodes = {}
+        for node, depth, rect, label in computed.boxes:
+            if tile is not None and not intersects(rect, tile):
+                continue
+            node_id = self.node_id(node)
+            boxes.append([node_id, depth] + [int(value) for value in rect] + [
+                [int(value) for value in label] if label else None
+            ])
+            if node_id not in nodes:
+                nodes[node_id] = {
+                    'name': node.name or node.filename,
+                    'filename': node.filename,
+                    'cumulative': node.cumulative,
+                }
+        return {
+            'width': width,
+            'height': height,
+            'depth': computed.max_depth_seen,
+            'boxes': boxes,
+            'nodes': nodes,
+        }
+
+
+def intersects(rect, tile):
+    x, y, w, h = rect
+    tx, ty, tw, th = tile
+    return x < tx + tw and tx < x + w and y < ty + th and ty < y + h
+
+
+def query_value(query, name, default=None, convert=str):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return convert(values[0])
+    except ValueError:
+        raise HTTPError(400, 'Invalid %s: %s' % (name, values[0]))
+
+
+def parse_tile(text):
+    values = [int(value) for value in text.split(',')]
+    if len(values) != 4:
+        raise ValueError(text)
+    return tuple(values)
+
+
+class Server(object):
+    """The HTTP server for a set of Profiles (by name)"""
+
+    def __init__(self, profiles, static=STATIC_DIRECTORY):
+        self.profiles = profiles
+        self.static = static
+
+    def route(self, path, query):
+        """Return the JSON-able result for the API path (blocking, run in a
+        thread)"""
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts == ['api', 'profiles']:
+            return {'profiles': [
+                profile.summary() for profile in self.profiles.values()]}
+        if len(parts) < 3 or parts[0] != 'api':
+            raise HTTPError(404, 'Not found')
+        profile = self.profiles.get(parts[1])
+        if profile is None:
+            raise HTTPError(404, 'No profile %s' % (parts[1],))
+        if parts[2:] == ['rows']:
+            return profile.rows(
+                sort=query_value(query, 'sort', 'cumulative'),
+                descending=query_value(query, 'order', 'desc') != 'asc',
+                offset=query_value(query, 'offset', 0, int),
+                limit=query_value(query, 'limit', 100, int),
+                query=query_value(query, 'q', ''),
+            )
+        if parts[2:] == ['layout']:
+            return profile.layout(
+                node_id=query_value(query, 'node'),
+                view=query_value(query, 'view', 'functions'),
+                width=query_value(query, 'width', 800, int),
+                height=query_value(query, 'height', 600, int),
+                tile=query_value(query, 'tile', None, parse_tile),
+            )
+        if parts[2] == 'node' and len(parts) == 4:
+            return profile.record(profile.node(parts[3]))
+        if parts[2] == 'node' and len(parts) == 5 and parts[4] == 'children':
+            return profile.children(parts[3])
+        if parts[2] == 'node' and len(parts) == 5 and parts[4] == 'parents':
+            return profile.parents(parts[3])
+        raise HTTPError(404, 'Not found')
+
+    def static_file(self, path):
+        name = path.strip('/') or 'index.html'
+        static = os.path.abspath(self.static)
+        filename = os.path.abspath(os.path.join(static, name))
+        if os.path.commonpath([static, filename]) != static:
+            raise HTTPError(404, 'Not found')
+        if not os.path.isfile(filename):
+            raise HTTPError(404, 'Not found')
+        with open(filename, 'rb') as handle:
+            content = handle.read()
+        content_type = mimetypes.guess_type(filename)[0]
+        return content_type or 'application/octet-stream', content
+
+    async def handle(self, reader, writer):
+        """Answer a single HTTP request"""
+        try:
+            request = await reader.readline()
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+            try:
+                method, target, version = request.decode('latin-1').split()
+            except ValueError:
+                return
+            status, content_type, body = 200, 'application/json', b''
+            try:
+                if method != 'GET':
+                    raise HTTPError(405, 'Only GET is supported')
+                url = urlsplit(target)
+                if url.path.startswith('/api/'):
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(
+                        None, self.route, url.path, parse_qs(url.query),
+                    )
+                    body = json.dumps(result).encode('utf-8')
+                else:
+                    content_type, body = self.static_file(url.path)
+            except HTTPError as err:
+                status = err.status
+                body = json.dumps({'error': str(err)}).encode('utf-8')
+            except Exception as err:
+                log.exception('Failure handling %s', target)
+                status = 500
+                body = json.dumps({'error': str(err)}).encode('utf-8')
+            head = (
+                'HTTP/1.1 %s %s\r\n'
+                'Content-Type: %s\r\n'
+                'Content-Length: %s\r\n'
+                'Cache-Control: no-cache\r\n'
+                'Connection: close\r\n\r\n'
+            ) % (status, STATUS_TEXT.get(status, ''), content_type, len(body))
+            writer.write(head.encode('latin-1'))
+            writer.write(body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as err:
+            log.debug('Connection lost: %s', err)
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info(
+            'Serving %s on http://%s:%s/', ', '.join(self.profiles),
+            host, port)
+        async with server:
+            await server.serve_forever()
+
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+
+def load_profiles(filenames):
+    """Load each of filenames as a Profile, named after the file"""
+    profiles = OrderedDict()
+    for filename in filenames:
+        name = os.path.basename(filename)
+        while name in profiles:
+            name += '_'
+        log.info('Loading %s', filename)
+        loader = pstatsloader.PStatsLoader(filename)
+        # built up front, the request handlers' threads only read them
+        for view in VIEWS:
+            loader.get_root(view)
+        loader.get_index()
+        profiles[name] = Profile(name, loader)
+    return profiles
+
+
+def serve(filenames, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Load filenames and serve them until interrupted"""
+    server = Server(load_profiles(filenames))
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    return 0
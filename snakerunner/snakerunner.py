@@ -4,17 +4,22 @@
 import sys
 import os
 import logging
+import re
 import traceback
 import configparser
 from gettext import gettext as _
 from pathlib import Path
 
 import wx
-import wx.py
 
 from snakerunner import squaremap
 from snakerunner import pstatsloader, pstatsadapter
 from snakerunner import listviews
+from snakerunner import searchindex
+from snakerunner import snapshots
+from snakerunner import columnar
+from snakerunner import instrument
+from snakerunner import scheduler
 
 if sys.platform == 'win32':
     windows = True
@@ -28,7 +33,16 @@ else:
 log = logging.getLogger(__name__)
 
 ID_OPEN = wx.NewIdRef(count=1)
+ID_ATTACH = wx.NewIdRef(count=1)
+ID_OPEN_SERIES = wx.NewIdRef(count=1)
+ID_OPEN_SOURCES = wx.NewIdRef(count=1)
+ID_EXPORT = wx.NewIdRef(count=1)
 ID_EXIT = wx.NewIdRef(count=1)
+ID_TIMINGS = wx.NewIdRef(count=1)
+ID_TIMINGS_OPEN = wx.NewIdRef(count=1)
+ID_TIMINGS_JSON = wx.NewIdRef(count=1)
+ID_TIMINGS_PROFILE = wx.NewIdRef(count=1)
+ID_TIMINGS_RESET = wx.NewIdRef(count=1)
 
 ID_TREE_TYPE = wx.NewIdRef(count=1)
 
@@ -39,6 +53,14 @@ ID_UP_VIEW = wx.NewIdRef(count=1)
 ID_DEEPER_VIEW = wx.NewIdRef(count=1)
 ID_SHALLOWER_VIEW = wx.NewIdRef(count=1)
 ID_MORE_SQUARE = wx.NewIdRef(count=1)
+ID_MEMORY = wx.NewIdRef(count=1)
+ID_OTHER_WINDOW = wx.NewIdRef(count=1)
+ID_FOCUS = wx.NewIdRef(count=1)
+ID_IGNORE = wx.NewIdRef(count=1)
+ID_PRUNE_FROM = wx.NewIdRef(count=1)
+ID_HIDE = wx.NewIdRef(count=1)
+ID_CLEAR_TRANSFORMS = wx.NewIdRef(count=1)
+ID_COLLAPSE_RECURSION = wx.NewIdRef(count=1)
 
 PROFILE_VIEW_COLUMNS = [
     listviews.ColumnDefinition(
@@ -114,6 +136,54 @@ PROFILE_VIEW_COLUMNS = [
 ]
 
 
+def source_columns(matrix):
+    """Columns showing the spread of cumulative time across the sources of
+    matrix"""
+    def statistic(index):
+        def getter(row):
+            summary = matrix.summary(row.key)
+            if summary is None:
+                return None
+            return summary[index]
+        return getter
+    columns = [
+        listviews.ColumnDefinition(
+            name=name,
+            attribute=attribute,
+            getter=statistic(index),
+            format=format,
+            defaultOrder=False,
+            targetWidth=50,
+        )
+        for index, (name, attribute, format) in enumerate([
+            (_('Min'), 'sourceMin', '%0.5f'),
+            (_('Median'), 'sourceMedian', '%0.5f'),
+            (_('Max'), 'sourceMax', '%0.5f'),
+            (_('StdDev'), 'sourceStdDev', '%0.5f'),
+            (_('Skew'), 'sourceSkew', '%0.2f'),
+        ])
+    ]
+    columns.append(listviews.ColumnDefinition(
+        name=_('Slowest'),
+        attribute='sourceSlowest',
+        getter=lambda row: matrix.slowest(row.key),
+        defaultOrder=True,
+        targetWidth=70,
+    ))
+    return columns
+
+
+# (label, fraction, top) limits offered for pruning the function view
+PRUNING_CHOICES = [
+    (_('All functions'), 0.0, None),
+    (_('Top 100'), 0.0, 100),
+    (_('Top 1000'), 0.0, 1000),
+    (_('Top 10000'), 0.0, 10000),
+    (_('Over 0.1%'), 0.001, None),
+    (_('Over 1%'), 0.01, None),
+]
+
+
 class MainFrame(wx.Frame):
     """The root frame for the display of a single data-set"""
     loader = None
@@ -145,6 +215,7 @@ class MainFrame(wx.Frame):
         wx.Frame.__init__(self, parent, id, title, pos, size, style, name)
         # TODO: toolbar for back, up, root, directory-view, percentage view
         self.adapter = pstatsadapter.PStatsAdapter()
+        self.scheduler = scheduler.Scheduler(deliver=wx.CallAfter)
         self.CreateControls(config_parser)
         self.history = []  # set of (activated_node, selected_node) pairs...
         icon = self.LoadRSRIcon()
@@ -178,40 +249,25 @@ class MainFrame(wx.Frame):
             self.rightSplitter,
         )
 
-        self.CreateSourceWindow(self.tabs)
-
         self.calleeListControl = listviews.DataView(
             self.tabs,
             columns=PROFILE_VIEW_COLUMNS,
             name='callee',
         )
-        self.allCalleeListControl = listviews.DataView(
-            self.tabs,
-            columns=PROFILE_VIEW_COLUMNS,
-            name='allcallee',
-        )
-        self.allCallerListControl = listviews.DataView(
-            self.tabs,
-            columns=PROFILE_VIEW_COLUMNS,
-            name='allcaller',
-        )
-        self.callerListControl = listviews.DataView(
-            self.tabs,
-            columns=PROFILE_VIEW_COLUMNS,
-            name='caller',
-        )
         self.ProfileListControls = [
             self.listControl,
             self.calleeListControl,
-            self.allCalleeListControl,
-            self.callerListControl,
-            self.allCallerListControl,
         ]
         self.tabs.AddPage(self.calleeListControl, _('Callees'), True)
-        self.tabs.AddPage(self.allCalleeListControl, _('All Callees'), False)
-        self.tabs.AddPage(self.callerListControl, _('Callers'), False)
-        self.tabs.AddPage(self.allCallerListControl, _('All Callers'), False)
-        self.tabs.AddPage(self.sourceCodeControl, _('Source Code'), False)
+        # the other tabs are only filled in when they are first shown
+        self.lazyPages = {}
+        self.AddLazyPage(_('All Callees'), self.CreateAllCalleeList)
+        self.AddLazyPage(_('Callers'), self.CreateCallerList)
+        self.AddLazyPage(_('All Callers'), self.CreateAllCallerList)
+        self.AddLazyPage(_('Source Code'), self.CreateSourceWindow)
+        self.hotPathPage = self.AddLazyPage(
+            _('Hot Paths'), self.CreateHotPathView)
+        self.tabs.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.OnTabChanged)
         # calculate size as proportional value for initial display...
         self.LoadState(config_parser)
         width, height = self.GetSize()
@@ -221,6 +277,11 @@ class MainFrame(wx.Frame):
                                              rightsplit)
         self.leftSplitter.SplitVertically(self.listControl, self.rightSplitter,
                                           leftsplit)
+        self.CreateSeriesPanel()
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.leftSplitter, 1, wx.EXPAND)
+        sizer.Add(self.seriesPanel, 0, wx.EXPAND)
+        self.SetSizer(sizer)
         self.squareMap.Bind(squaremap.EVT_SQUARE_HIGHLIGHTED,
                             self.OnSquareHighlightedMap)
         self.listControl.Bind(squaremap.EVT_SQUARE_SELECTED,
@@ -229,10 +290,10 @@ class MainFrame(wx.Frame):
                             self.OnSquareSelectedMap)
         self.squareMap.Bind(squaremap.EVT_SQUARE_ACTIVATED,
                             self.OnNodeActivated)
+        self.squareMap.scheduler = self.scheduler
         for control in self.ProfileListControls:
-            control.Bind(squaremap.EVT_SQUARE_ACTIVATED, self.OnNodeActivated)
-            control.Bind(squaremap.EVT_SQUARE_HIGHLIGHTED,
-                         self.OnSquareHighlightedList)
+            control.scheduler = self.scheduler
+            self.BindProfileList(control)
         self.moreSquareViewItem.Check(self.squareMap.square_style)
 
     def CreateMenuBar(self):
@@ -240,6 +301,17 @@ class MainFrame(wx.Frame):
         menubar = wx.MenuBar()
         menu = wx.Menu()
         menu.Append(ID_OPEN, _('&Open Profile'), _('Open a cProfile file'))
+        menu.Append(ID_OPEN_SERIES, _('Open Snapshot &Series...'),
+                    _('Open a time-ordered series of profile dumps'))
+        menu.Append(ID_OPEN_SOURCES, _('Open &Worker Profiles...'),
+                    _('Open the dumps of a set of workers, naming each '
+                      'worker (host, pid) from its filename'))
+        menu.Append(ID_ATTACH, _('&Attach to Live Process...'),
+                    _('Watch the profile of a process running '
+                      'snakerunner.liveprofile'))
+        menu.Append(ID_EXPORT, _('&Export Columnar...'),
+                    _('Export the profile as columns in a NumPy (.npz) '
+                      'archive'))
         menu.AppendSeparator()
         menu.Append(ID_EXIT, _('&Close'), _('Close this Snakerunner window'))
         menubar.Append(menu, _('&File'))
@@ -267,6 +339,14 @@ class MainFrame(wx.Frame):
             ID_MORE_SQUARE, _('&Hierarchic Squares'),
             _('Toggle hierarchic squares in the square-map view')
         )
+        menu.Append(
+            ID_OTHER_WINDOW, _('Show in &Other Window'),
+            _('Show the selected function in another open profile')
+        )
+        menu.Append(
+            ID_MEMORY, _('&Memory Usage'),
+            _('Show the memory held by the profiles of each open window')
+        )
 
         # This stuff isn't really all that useful for profiling,
         # it's more about how to generate graphics to describe profiling...
@@ -280,13 +360,58 @@ class MainFrame(wx.Frame):
 #        wx.ToolTip.Enable(True)
         menubar.Append(menu, _('&View'))
 
+        menu = wx.Menu()
+        menu.Append(ID_FOCUS, _('&Focus On...'),
+                    _('Show only the time of calls passing through matching '
+                      'functions'))
+        menu.Append(ID_IGNORE, _('&Ignore...'),
+                    _('Drop the time of calls passing through matching '
+                      'functions'))
+        menu.Append(ID_PRUNE_FROM, _('&Prune From...'),
+                    _('Drop the callees of matching functions'))
+        menu.Append(ID_HIDE, _('&Hide...'),
+                    _('Remove matching functions, giving their time to their '
+                      'callers'))
+        self.collapseRecursionItem = menu.AppendCheckItem(
+            ID_COLLAPSE_RECURSION, _('Collapse &Recursion'),
+            _('Fold recursive cycles into single functions')
+        )
+        menu.AppendSeparator()
+        menu.Append(ID_CLEAR_TRANSFORMS, _('&Clear Filters'),
+                    _('Show the whole profile again'))
+        menubar.Append(menu, _('F&ilter'))
+
         self.viewTypeMenu = wx.Menu()
         menubar.Append(self.viewTypeMenu, _('View &Type'))
 
+        if instrument.enabled:
+            menu = wx.Menu()
+            menu.Append(ID_TIMINGS, _('&Instrumentation'),
+                        _('Show the timings of snakerunner itself'))
+            menu.Append(ID_TIMINGS_OPEN, _('&Open Timings'),
+                        _('View the timings of snakerunner as a profile'))
+            menu.Append(ID_TIMINGS_JSON, _('Save Timings as &JSON...'),
+                        _('Save the timing counters and histograms'))
+            menu.Append(ID_TIMINGS_PROFILE, _('Save Timings as &Profile...'),
+                        _('Save the timings as a cProfile-format file'))
+            menu.Append(ID_TIMINGS_RESET, _('&Reset Timings'),
+                        _('Forget the timings recorded so far'))
+            menubar.Append(menu, _('&Debug'))
+
         self.SetMenuBar(menubar)
 
         self.Bind(wx.EVT_MENU, lambda evt: self.Close(True), id=ID_EXIT)
         self.Bind(wx.EVT_MENU, self.OnOpenFile, id=ID_OPEN)
+        self.Bind(wx.EVT_MENU, self.OnAttach, id=ID_ATTACH)
+        self.Bind(wx.EVT_MENU, self.OnOpenSeries, id=ID_OPEN_SERIES)
+        self.Bind(wx.EVT_MENU, self.OnOpenSources, id=ID_OPEN_SOURCES)
+        self.Bind(wx.EVT_MENU, self.OnExport, id=ID_EXPORT)
+        self.Bind(wx.EVT_MENU, self.OnTimings, id=ID_TIMINGS)
+        self.Bind(wx.EVT_MENU, self.OnTimingsOpen, id=ID_TIMINGS_OPEN)
+        self.Bind(wx.EVT_MENU, self.OnTimingsSave, id=ID_TIMINGS_JSON)
+        self.Bind(wx.EVT_MENU, self.OnTimingsSave, id=ID_TIMINGS_PROFILE)
+        self.Bind(
+            wx.EVT_MENU, lambda evt: instrument.reset(), id=ID_TIMINGS_RESET)
 
         self.Bind(wx.EVT_MENU, self.OnPercentageView, id=ID_PERCENTAGE_VIEW)
         self.Bind(wx.EVT_MENU, self.OnUpView, id=ID_UP_VIEW)
@@ -295,6 +420,15 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.OnRootView, id=ID_ROOT_VIEW)
         self.Bind(wx.EVT_MENU, self.OnBackView, id=ID_BACK_VIEW)
         self.Bind(wx.EVT_MENU, self.OnMoreSquareToggle, id=ID_MORE_SQUARE)
+        self.Bind(wx.EVT_MENU, self.OnMemoryUsage, id=ID_MEMORY)
+        self.Bind(wx.EVT_MENU, self.OnShowInOther, id=ID_OTHER_WINDOW)
+        for id in (ID_FOCUS, ID_IGNORE, ID_PRUNE_FROM, ID_HIDE):
+            self.Bind(wx.EVT_MENU, self.OnAddTransform, id=id)
+        self.Bind(
+            wx.EVT_MENU, lambda evt: self.SetTransforms(()),
+            id=ID_CLEAR_TRANSFORMS)
+        self.Bind(
+            wx.EVT_MENU, self.OnCollapseRecursion, id=ID_COLLAPSE_RECURSION)
 
     def LoadRSRIcon(self):
         try:
@@ -303,17 +437,247 @@ class MainFrame(wx.Frame):
         except Exception as err:
             return None
 
+    def CreateSeriesPanel(self):
+        """Create the (initially hidden) timeline scrubber for snapshot
+        series"""
+        self.seriesPanel = wx.Panel(self)
+        self.seriesLabel = wx.StaticText(self.seriesPanel, -1, '')
+        self.seriesStart = wx.Slider(self.seriesPanel, -1, 0, 0, 1)
+        self.seriesEnd = wx.Slider(self.seriesPanel, -1, 1, 0, 1)
+        self.seriesStart.SetToolTip(
+            wx.ToolTip(_("First snapshot of the window")))
+        self.seriesEnd.SetToolTip(wx.ToolTip(_("Last snapshot of the window")))
+        sizer = wx.BoxSizer(wx.HORIZONTAL)
+        sizer.Add(self.seriesLabel, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 4)
+        sizer.Add(self.seriesStart, 1, wx.EXPAND)
+        sizer.Add(self.seriesEnd, 1, wx.EXPAND)
+        self.seriesPanel.SetSizer(sizer)
+        self.seriesStart.Bind(wx.EVT_SLIDER, self.OnSeriesSlider)
+        self.seriesEnd.Bind(wx.EVT_SLIDER, self.OnSeriesSlider)
+        self.seriesPanel.Hide()
+
+    def BindProfileList(self, control):
+        control.Bind(squaremap.EVT_SQUARE_ACTIVATED, self.OnNodeActivated)
+        control.Bind(squaremap.EVT_SQUARE_HIGHLIGHTED,
+                     self.OnSquareHighlightedList)
+
+    def AddLazyPage(self, title, factory):
+        """Add a notebook page whose contents factory(parent) creates when
+        first shown, return the page's index"""
+        panel = wx.Panel(self.tabs)
+        panel.SetSizer(wx.BoxSizer(wx.VERTICAL))
+        index = self.tabs.GetPageCount()
+        self.lazyPages[index] = factory
+        self.tabs.AddPage(panel, title, False)
+        return index
+
+    def OnTabChanged(self, event):
+        event.Skip()
+        index = event.GetSelection()
+        self.RealizePage(index)
+        if index == self.hotPathPage and self.hotPathsStale:
+            self.ComputeHotPaths()
+
+    def RealizePage(self, index):
+        """Create the contents of notebook page index if not yet done"""
+        factory = self.lazyPages.pop(index, None)
+        if factory is None:
+            return
+        panel = self.tabs.GetPage(index)
+        panel.GetSizer().Add(factory(panel), 1, wx.EXPAND)
+        panel.Layout()
+
+    allCalleeListControl = None
+    callerListControl = None
+    allCallerListControl = None
+    listFont = None
+
+    def CreateProfileList(self, parent, name):
+        """Create a (late) profile list, set up like those created at
+        startup"""
+        control = listviews.DataView(
+            parent,
+            columns=self.listControl.columns,
+            name=name,
+        )
+        if self.listFont is not None:
+            control.SetFont(self.listFont)
+        if self.config:
+            control.LoadState(self.config)
+        control.SetPercentage(self.percentageView, self.adapter.total)
+        control.scheduler = self.scheduler
+        self.BindProfileList(control)
+        self.ProfileListControls.append(control)
+        return control
+
+    def CreateAllCalleeList(self, parent):
+        self.allCalleeListControl = self.CreateProfileList(parent, 'allcallee')
+        return self.allCalleeListControl
+
+    def CreateCallerList(self, parent):
+        self.callerListControl = self.CreateProfileList(parent, 'caller')
+        if self.selected_node is not None:
+            self.callerListControl.integrateRecords(
+                self.adapter.caller_edges(self.selected_node))
+        return self.callerListControl
+
+    def CreateAllCallerList(self, parent):
+        self.allCallerListControl = self.CreateProfileList(parent, 'allcaller')
+        return self.allCallerListControl
+
     sourceCodeControl = None
+    sourceNode = None
 
-    def CreateSourceWindow(self, tabs):
-        """Create our source-view window for tabs"""
+    def CreateSourceWindow(self, parent):
+        """Create our source-view window in parent"""
         if self.sourceCodeControl is None:
+            # wx.py pulls in a lot of modules, only import it when needed
+            import wx.py.editwindow
             self.sourceCodeControl = wx.py.editwindow.EditWindow(
-                self.tabs, -1
+                parent, -1
             )
             self.sourceCodeControl.SetText("")
             self.sourceFileShown = None
             self.sourceCodeControl.setDisplayLineNumbers(True)
+            self.ConfigureSourceHeat()
+            if self.sourceNode is not None:
+                self.ShowSource(self.sourceNode)
+        return self.sourceCodeControl
+
+    # markers 0-7 tint lines by cumulative time, 8-15 mark the heat margin by
+    # local time
+    HEAT_LEVELS = 8
+    CUMULATIVE_MARKER = 0
+    LOCAL_MARKER = 8
+    HEAT_MARGIN = 3
+    TIME_MARGIN = 4
+    sourceHeat = None
+    sourceHeatShown = None
+    sourceHeatLines = {}
+
+    def ConfigureSourceHeat(self):
+        """Set up the source view's heat markers and (clickable) heat
+        margins"""
+        from wx import stc
+        control = self.sourceCodeControl
+        for level in range(self.HEAT_LEVELS):
+            strength = (level + 1) / float(self.HEAT_LEVELS)
+            control.MarkerDefine(
+                self.CUMULATIVE_MARKER + level, stc.STC_MARK_BACKGROUND,
+                background=wx.Colour(
+                    255, int(255 - 120 * strength), int(255 - 160 * strength)),
+            )
+            control.MarkerDefine(
+                self.LOCAL_MARKER + level, stc.STC_MARK_FULLRECT,
+                background=wx.Colour(255, int(220 - 220 * strength), 0),
+            )
+        # keep the heat markers out of the line-number margin
+        control.SetMarginMask(1, 0)
+        control.SetMarginType(self.HEAT_MARGIN, stc.STC_MARGIN_SYMBOL)
+        control.SetMarginMask(
+            self.HEAT_MARGIN,
+            ((1 << self.HEAT_LEVELS) - 1) << self.LOCAL_MARKER)
+        control.SetMarginWidth(self.HEAT_MARGIN, 8)
+        control.SetMarginSensitive(self.HEAT_MARGIN, True)
+        control.SetMarginType(self.TIME_MARGIN, stc.STC_MARGIN_TEXT)
+        control.SetMarginMask(self.TIME_MARGIN, 0)
+        control.SetMarginWidth(
+            self.TIME_MARGIN,
+            control.TextWidth(stc.STC_STYLE_LINENUMBER, '99.999s '))
+        control.SetMarginSensitive(self.TIME_MARGIN, True)
+        control.Bind(stc.EVT_STC_MARGINCLICK, self.OnSourceMarginClick)
+
+    def ShowSourceHeat(self, filename):
+        """Colour the functions of filename in the source view by their times
+
+        Lines are tinted by the cumulative time of the innermost function
+        containing them, the heat margin shows its local time and the time
+        margin its cumulative time, on its first line.
+        """
+        from wx import stc
+        from snakerunner import sourceheat
+        control = self.sourceCodeControl
+        # live merges update the loader in place, bumping its generation
+        shown = (filename, self.loader, getattr(self.loader, 'generation', 0))
+        if shown == self.sourceHeatShown:
+            return
+        self.sourceHeatShown = shown
+        control.MarkerDeleteAll(-1)
+        control.MarginTextClearAll()
+        self.sourceHeatLines = {}
+        if filename is None or self.loader is None:
+            return
+        if self.sourceHeat is None or self.sourceHeat[0] != shown[1:]:
+            self.sourceHeat = (
+                shown[1:], sourceheat.SourceHeat(self.loader.rows.values()))
+        heats = self.sourceHeat[1].heat(filename)
+        self.sourceHeatLines = sourceheat.line_owners(heats)
+        count = control.GetLineCount()
+        for line, heat in self.sourceHeatLines.items():
+            if line > count:
+                continue
+            level = sourceheat.level(heat.cumulative, self.HEAT_LEVELS)
+            if level is not None:
+                control.MarkerAdd(line - 1, self.CUMULATIVE_MARKER + level)
+            level = sourceheat.level(heat.local, self.HEAT_LEVELS)
+            if level is not None:
+                control.MarkerAdd(line - 1, self.LOCAL_MARKER + level)
+        for heat in heats:
+            if heat.extent.first <= count:
+                control.MarginSetText(
+                    heat.extent.first - 1, '%0.3fs' % heat.row.cumulative)
+                control.MarginSetStyle(
+                    heat.extent.first - 1, stc.STC_STYLE_LINENUMBER)
+
+    def OnSourceMarginClick(self, event):
+        """Activate the function whose lines were clicked in a heat margin"""
+        line = self.sourceCodeControl.LineFromPosition(event.GetPosition()) + 1
+        heat = self.sourceHeatLines.get(line)
+        if heat is None:
+            event.Skip()
+            return
+        self.ActivateNode(heat.row)
+
+    hotPathView = None
+    hotPathPage = None
+    # the model changed while the hot paths were hidden
+    hotPathsStale = False
+
+    def CreateHotPathView(self, parent):
+        """Create the ranked list of the heaviest call paths in parent"""
+        from snakerunner import hotpathview
+        self.hotPathView = hotpathview.HotPathView(parent)
+        self.hotPathView.Bind(
+            squaremap.EVT_SQUARE_ACTIVATED, self.OnNodeActivated)
+        # only created once its tab is shown
+        self.ComputeHotPaths()
+        return self.hotPathView
+
+    def UpdateHotPaths(self):
+        """Recalculate the hot paths if they are shown, otherwise once
+        their tab is next shown (hot_paths walks the whole graph)"""
+        if self.hotPathView is None:
+            return
+        if self.tabs.GetSelection() != self.hotPathPage:
+            self.scheduler.cancel('hotpaths')
+            self.hotPathsStale = True
+            return
+        self.ComputeHotPaths()
+
+    def ComputeHotPaths(self):
+        """Recalculate the hot paths (off the UI thread)"""
+        self.hotPathsStale = False
+        if self.hotPathView is None or self.loader is None:
+            return
+        from snakerunner import hotpaths
+        loader = self.loader
+        root = loader.get_root('functions')
+
+        def compute(token):
+            # live merges update the rows in place
+            with loader.lock:
+                return hotpaths.hot_paths(root, check=token.check)
+        self.scheduler.submit('hotpaths', compute, self.hotPathView.SetPaths)
 
     def SetupToolBar(self):
         """Create the toolbar for common actions"""
@@ -363,6 +727,29 @@ class MainFrame(wx.Frame):
         self.viewTypeTool.Bind(wx.EVT_CHOICE, self.OnViewTypeTool,
                                id=self.viewTypeTool.GetId())
         tb.AddControl(self.viewTypeTool)
+
+        self.pruneTool = wx.Choice(
+            tb, -1,
+            choices=[label for label, fraction, top in PRUNING_CHOICES])
+        self.pruneTool.SetSelection(0)
+        self.pruneTool.SetToolTip(wx.ToolTip(
+            _("Restrict the function view to the heaviest functions")))
+        self.pruneTool.Bind(wx.EVT_CHOICE, self.OnPruneTool,
+                            id=self.pruneTool.GetId())
+        tb.AddControl(self.pruneTool)
+        if not osx:
+            tb.AddSeparator()
+        self.searchTool = wx.SearchCtrl(tb, -1, size=(220, -1))
+        self.searchTool.SetDescriptiveText(_("name, /regex/, cumulative>0.1"))
+        self.searchTool.ShowCancelButton(True)
+        self.searchTool.SetToolTip(wx.ToolTip(
+            _("Filter the function list by name/file/directory, regex or "
+              "value")))
+        self.searchTool.Bind(wx.EVT_TEXT, self.OnSearch,
+                             id=self.searchTool.GetId())
+        self.searchTool.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.OnSearchCancel,
+                             id=self.searchTool.GetId())
+        tb.AddControl(self.searchTool)
         tb.Realize()
 
     def OnViewTypeTool(self, event):
@@ -372,6 +759,52 @@ class MainFrame(wx.Frame):
             self.viewType = new
             self.OnRootView(event)
 
+    def OnPruneTool(self, event):
+        """Apply the pruning limits chosen by the user"""
+        label, fraction, top = PRUNING_CHOICES[self.pruneTool.GetSelection()]
+        if self.loader:
+            self.loader.set_pruning(fraction=fraction, top=top)
+            self.SetModel(self.loader)
+
+    searchQuery = ''
+    searchState = None
+
+    def OnSearch(self, event):
+        """Filter the function list as the user types into the search
+        control"""
+        self.searchQuery = self.searchTool.GetValue()
+        if self.loader:
+            self.ApplySearch()
+
+    def OnSearchCancel(self, event):
+        """Clear the current search filter"""
+        self.searchTool.SetValue('')
+
+    def ApplySearch(self):
+        """Populate the main list (and square-map marks) from the search
+        query"""
+        rows = self.loader.get_rows(self.viewType)
+        if not self.searchQuery.strip():
+            self.listControl.integrateRecords(list(rows.values()))
+            self.squareMap.SetMarked(None)
+            return
+        try:
+            if self.searchState is None:
+                self.searchState = searchindex.SearchState()
+            index = self.loader.get_index(self.viewType)
+            matches = index.search(self.searchQuery, self.searchState)
+        except searchindex.QueryError as err:
+            self.SetStatusText(str(err))
+            return
+        # the index covers the view's rows before pruning
+        matches = [row for row in matches if rows.get(row.key) is row]
+        self.listControl.integrateRecords(matches)
+        self.squareMap.SetMarked(matches)
+        self.SetStatusText(_('%(count)s of %(total)s rows match') % {
+            'count': len(matches),
+            'total': len(rows),
+        })
+
     def ConfigureViewTypeChoices(self, event=None):
         """Configure the set of View types in the toolbar (and menus)"""
         self.viewTypeTool.SetItems(getattr(self.loader, 'ROOTS', []))
@@ -415,13 +848,491 @@ class MainFrame(wx.Frame):
             else:
                 self.load(*paths)
 
+    sourcePattern = ''
+
+    def OnOpenSources(self, event):
+        """Request to open worker profiles and a pattern naming the workers"""
+        dialog = wx.FileDialog(self, style=wx.FD_OPEN | wx.FD_MULTIPLE)
+        if dialog.ShowModal() != wx.ID_OK:
+            return
+        paths = dialog.GetPaths()
+        dialog = wx.TextEntryDialog(
+            self,
+            _('Regular expression naming the worker of each file, e.g. '
+              'pid(\\d+) or (?P<source>[^/]+)/profile\n'
+              '(leave empty to strip the common part of the filenames)'),
+            _('Worker Names'),
+            self.sourcePattern,
+        )
+        if dialog.ShowModal() != wx.ID_OK:
+            return
+        pattern = dialog.GetValue().strip()
+        if pattern:
+            try:
+                re.compile(pattern)
+            except re.error as err:
+                self.SetStatusText(_('Invalid pattern %(pattern)s: %(err)s')
+                                   % {'pattern': pattern, 'err': err})
+                return
+        self.sourcePattern = pattern
+        if self.loader:
+            frame = MainFrame()
+            frame.Show(True)
+        else:
+            frame = self
+        frame.load(*paths, sources=pattern or True)
+
+    def OnExport(self, event):
+        """Request to export the loaded profile in columnar form"""
+        if not self.loader:
+            self.SetStatusText(_('No profile loaded'))
+            return
+        dialog = wx.FileDialog(
+            self, _('Export Columnar'),
+            wildcard=_('NumPy archive (*.npz)|*.npz'),
+            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+        )
+        if dialog.ShowModal() == wx.ID_OK:
+            path = dialog.GetPath()
+            try:
+                columnar.write(self.loader.raw_stats(), path)
+            except (IOError, OSError) as err:
+                self.SetStatusText(
+                    _('Failure during export to %(path)s: %(err)s')
+                    % {'path': path, 'err': err})
+            else:
+                self.SetStatusText(_('Exported to %(path)s') % {'path': path})
+
+    def OnShowInOther(self, event):
+        """Show the selected function in another window which loaded it"""
+        key = getattr(self.selected_node, 'key', None)
+        if not self.loader or key is None:
+            self.SetStatusText(_('No function selected'))
+            return
+        frames = dict([
+            (window.loader, window) for window in wx.GetTopLevelWindows()
+            if isinstance(window, MainFrame) and window.loader
+        ])
+        found = [
+            (frames[loader], row)
+            for loader, row in self.loader.workspace.find(
+                key, exclude=self.loader)
+            if loader in frames
+        ]
+        if not found:
+            self.SetStatusText(_(
+                '%(name)s is not in any other open profile'
+            ) % {
+                'name': self.selected_node.name,
+            })
+            return
+        if len(found) > 1:
+            dialog = wx.SingleChoiceDialog(
+                self, _('Show %(name)s in') % {
+                    'name': self.selected_node.name},
+                _('Show in Other Window'),
+                [frame.GetTitle() for frame, row in found],
+            )
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            found = found[dialog.GetSelection():]
+        frame, row = found[0]
+        frame.ShowNode(row)
+
+    def ShowNode(self, row):
+        """Activate row (a function row) and bring our window to the front"""
+        if self.viewType != 'functions':
+            self.viewType = 'functions'
+            self.OnRootView(None)
+            self.ConfigureViewTypeChoices()
+        self.ActivateNode(row)
+        self.listControl.SetSelected(row)
+        self.SelectNode(row)
+        self.Raise()
+
+    def OnAddTransform(self, event):
+        """Ask for a pattern and add a focus/ignore/prune/hide filter to the
+        view"""
+        from snakerunner import transforms
+        kind = {
+            ID_FOCUS: transforms.Focus,
+            ID_IGNORE: transforms.Ignore,
+            ID_PRUNE_FROM: transforms.PruneFrom,
+            ID_HIDE: transforms.Hide,
+        }[event.GetId()]
+        if not self.loader:
+            return
+        name = getattr(self.selected_node, 'name', '')
+        dialog = wx.TextEntryDialog(
+            self,
+            _('Regular expression matching the file or name of functions'),
+            _('Filter: %(kind)s') % {'kind': kind.kind},
+            '^%s$' % (re.escape(name),) if name else '',
+        )
+        if dialog.ShowModal() != wx.ID_OK or not dialog.GetValue():
+            return
+        try:
+            transform = kind(dialog.GetValue())
+        except re.error as err:
+            self.SetStatusText(_('Invalid pattern: %(err)s') % {'err': err})
+            return
+        self.SetTransforms(self.transforms + (transform,))
+
+    def OnCollapseRecursion(self, event):
+        """Toggle folding recursive cycles into single functions"""
+        from snakerunner import transforms
+        collapse = transforms.CollapseRecursion()
+        others = tuple([
+            transform for transform in self.transforms
+            if transform != collapse
+        ])
+        if event.IsChecked():
+            # first, so the other filters see a graph without cycles
+            others = (collapse,) + others
+        self.SetTransforms(others)
+
+    baseLoader = None
+    transforms = ()
+
+    def SetTransforms(self, transforms):
+        """Show our profile with transforms (see snakerunner.transforms)
+        applied"""
+        base = self.baseLoader or self.loader
+        if not base:
+            return
+        try:
+            loader = base.transformed(transforms)
+        except ValueError as err:
+            self.SetStatusText(str(err))
+            return
+        label, fraction, top = PRUNING_CHOICES[self.pruneTool.GetSelection()]
+        # cached loaders may have been pruned under an earlier choice
+        loader.set_pruning(fraction=fraction, top=top)
+        old_root = self.loader.get_root('functions')
+        self.baseLoader = base
+        self.transforms = tuple(transforms)
+        self.loader = loader
+        self.RefreshModel(old_root)
+        self.collapseRecursionItem.Check(any([
+            transform.kind == 'collapse' for transform in self.transforms
+        ]))
+        if self.transforms:
+            self.SetStatusText(_('Filters: %(transforms)s') % {
+                'transforms': ', '.join([
+                    repr(transform) for transform in self.transforms]),
+            })
+        else:
+            self.SetStatusText(_('Filters cleared'))
+
+    def MergeStats(self, stats):
+        """Merge (delta) stats into our profile and redisplay it (filtered)"""
+        old_root = self.loader.get_root('functions')
+        base = self.baseLoader or self.loader
+        base.merge(stats)
+        if self.transforms:
+            try:
+                self.loader = base.transformed(self.transforms)
+            except ValueError as err:
+                self.SetStatusText(str(err))
+                return
+        self.RefreshModel(old_root)
+
+    def OnMemoryUsage(self, event):
+        """Report the (estimated) memory held by each open window's profile"""
+        import wx.lib.dialogs
+        lines = []
+        total = 0
+        for window in wx.GetTopLevelWindows():
+            if not isinstance(window, MainFrame) or not window.loader:
+                continue
+            usage = window.loader.memory_usage()
+            total += usage['bytes']
+            lines.append(_('%(title)s\n    %(rows)s functions, '
+                           '%(edges)s call edges, '
+                           '%(groups)s groups: %(size).1f MiB') % {
+                'title': window.GetTitle(),
+                'rows': usage['rows'],
+                'edges': usage['edges'],
+                'groups': usage['groups'],
+                'size': usage['bytes'] / 1048576.0,
+            })
+        lines.append(_('Total: %(size).1f MiB') % {'size': total / 1048576.0})
+        dialog = wx.lib.dialogs.ScrolledMessageDialog(
+            self, '\n'.join(lines), _('Memory Usage'), size=(600, 300),
+        )
+        dialog.ShowModal()
+        dialog.Destroy()
+
+    def OnTimings(self, event):
+        """Show the instrumentation timings of snakerunner itself"""
+        import wx.lib.dialogs
+        dialog = wx.lib.dialogs.ScrolledMessageDialog(
+            self, instrument.report(), _('Instrumentation'), size=(800, 400),
+        )
+        dialog.ShowModal()
+        dialog.Destroy()
+
+    def OnTimingsOpen(self, event):
+        """View the instrumentation timings as a profile in a new window"""
+        stats = instrument.raw_stats()
+        if not stats:
+            self.SetStatusText(_('No timings recorded'))
+            return
+        frame = MainFrame()
+        frame.Show(True)
+        frame.loader = pstatsloader.PStatsLoader(
+            stats=pstatsloader.stats_from_dict(stats))
+        frame.ConfigureViewTypeChoices()
+        frame.SetModel(frame.loader)
+        frame.SetTitle(_("Run Snake Run: snakerunner timings"))
+
+    def OnTimingsSave(self, event):
+        """Save the instrumentation timings as JSON or as a profile"""
+        if event.GetId() == ID_TIMINGS_JSON:
+            wildcard = _('JSON (*.json)|*.json')
+            dump = instrument.dump_json
+        else:
+            wildcard = _('Profile (*.prof)|*.prof')
+            dump = instrument.dump_stats
+        dialog = wx.FileDialog(
+            self, _('Save Timings'), wildcard=wildcard,
+            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+        )
+        if dialog.ShowModal() == wx.ID_OK:
+            path = dialog.GetPath()
+            try:
+                dump(path)
+            except (IOError, OSError) as err:
+                self.SetStatusText(_('Failure saving %(path)s: %(err)s')
+                                   % {'path': path, 'err': err})
+            else:
+                self.SetStatusText(
+                    _('Saved timings to %(path)s') % {'path': path})
+
+    # the cumulative argument of SnapshotSeries for each choice
+    SERIES_MODES = [
+        (_('Detect (call counts never decrease: cumulative)'), None),
+        (_('Cumulative (totals since profiling started)'), True),
+        (_('Delta (each dump a separate time slice)'), False),
+    ]
+    seriesMode = 0
+
+    def OnOpenSeries(self, event):
+        """Request to open a series of profile snapshots"""
+        dialog = wx.FileDialog(self, style=wx.FD_OPEN | wx.FD_MULTIPLE)
+        if dialog.ShowModal() != wx.ID_OK:
+            return
+        paths = sorted(dialog.GetPaths())
+        dialog = wx.SingleChoiceDialog(
+            self, _('What do the snapshots hold?'), _('Snapshot Series'),
+            [label for label, cumulative in self.SERIES_MODES],
+        )
+        dialog.SetSelection(self.seriesMode)
+        if dialog.ShowModal() != wx.ID_OK:
+            return
+        self.seriesMode = dialog.GetSelection()
+        cumulative = self.SERIES_MODES[self.seriesMode][1]
+        if self.loader or self.receiver:
+            frame = MainFrame()
+            frame.Show(True)
+            frame.loadSeries(*paths, cumulative=cumulative)
+        else:
+            self.loadSeries(*paths, cumulative=cumulative)
+
+    series = None
+    seriesWindow = None
+
+    def loadSeries(self, *filenames, cumulative=None):
+        """Load a time-ordered series of snapshots, with a timeline to pick a
+        window
+
+        cumulative -- whether the snapshots are cumulative (True) or deltas
+            (False), None to guess (see snapshots.SnapshotSeries)
+        """
+        try:
+            series = snapshots.SnapshotSeries(filenames, cumulative=cumulative)
+            loader = pstatsloader.PStatsLoader(
+                stats=pstatsloader.stats_from_dict(series.window_stats()))
+        except (
+            IOError, OSError, ValueError, MemoryError, RuntimeError,
+        ) as err:
+            self.SetStatusText(
+                _('Failure during load of %(filenames)s: %(err)s'
+                  ) % dict(
+                    filenames=" ".join([repr(x) for x in filenames]),
+                    err=err
+                ))
+            return
+        self.series = series
+        self.seriesWindow = (0, len(series))
+        self.listControl.SetColumns(PROFILE_VIEW_COLUMNS + [
+            listviews.ColumnDefinition(
+                name=_('Trend'),
+                attribute='trend',
+                getter=lambda row: series.sparkline(row.key),
+                targetWidth=100,
+            ),
+        ])
+        self.seriesStart.SetRange(0, len(series) - 1)
+        self.seriesStart.SetValue(0)
+        self.seriesEnd.SetRange(1, len(series))
+        self.seriesEnd.SetValue(len(series))
+        self.UpdateSeriesLabel()
+        self.seriesPanel.Show()
+        self.Layout()
+        self.loader = loader
+        self.ConfigureViewTypeChoices()
+        self.SetModel(loader)
+        self.viewType = loader.ROOTS[0]
+        self.SetTitle(_("Run Snake Run: %(filenames)s")
+                      % {'filenames': ', '.join(filenames)[:120]})
+
+    def OnSeriesSlider(self, event):
+        """Re-weight the model to the window of snapshots chosen on the
+        timeline"""
+        start, end = self.seriesStart.GetValue(), self.seriesEnd.GetValue()
+        if start >= end:
+            if event.GetEventObject() is self.seriesStart:
+                end = start + 1
+                self.seriesEnd.SetValue(end)
+            else:
+                start = end - 1
+                self.seriesStart.SetValue(start)
+        window = (start, end)
+        if self.loader and window != self.seriesWindow:
+            self.seriesWindow, previous = window, self.seriesWindow
+            self.UpdateSeriesLabel()
+            self.MergeStats(self.series.difference_stats(previous, window))
+
+    def UpdateSeriesLabel(self):
+        start, end = self.seriesWindow
+        if self.series.cumulative:
+            mode = _('cumulative')
+        else:
+            mode = _('delta')
+        if self.series.detected:
+            mode = _('%(mode)s, detected') % {'mode': mode}
+        self.seriesLabel.SetLabel(_(
+            'Snapshots %(start)s-%(end)s of %(count)s (%(mode)s)'
+        ) % {
+            'start': start + 1,
+            'end': end,
+            'count': len(self.series),
+            'mode': mode,
+        })
+        self.seriesPanel.Layout()
+
+    def OnAttach(self, event):
+        """Request to attach to a live profiling agent"""
+        from snakerunner import liveprofile
+        dialog = wx.TextEntryDialog(
+            self, _('Address of the profiling agent (host:port)'),
+            _('Attach to Live Process'),
+            '127.0.0.1:%s' % (liveprofile.DEFAULT_PORT,),
+        )
+        if dialog.ShowModal() == wx.ID_OK:
+            host, _sep, port = dialog.GetValue().strip().rpartition(':')
+            try:
+                address = (host or '127.0.0.1', int(port))
+            except ValueError:
+                self.SetStatusText(_('Invalid address: %(address)s') % {
+                    'address': dialog.GetValue(),
+                })
+                return
+            if self.loader or self.receiver:
+                frame = MainFrame()
+                frame.Show(True)
+                frame.attach(address)
+            else:
+                self.attach(address)
+
+    LIVE_REFRESH = 1000  # milliseconds between refreshes of a live view
+    receiver = None
+    liveTimer = None
+    pendingLiveStats = None
+
+    def attach(self, address):
+        """Display the stats streamed by the live profiling agent at address"""
+        from snakerunner import liveprofile
+        self.receiver = liveprofile.SnapshotReceiver(address)
+        self.receiver.start()
+        self.liveTimer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnLiveTimer, self.liveTimer)
+        self.liveTimer.Start(self.LIVE_REFRESH)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.OnLiveDestroy)
+        self.SetTitle(_("Run Snake Run: live %(host)s:%(port)s")
+                      % {'host': address[0], 'port': address[1]})
+
+    def OnLiveDestroy(self, event):
+        event.Skip()
+        if event.GetEventObject() is self:
+            self.detach()
+
+    def detach(self):
+        """Stop following a live profiling agent"""
+        if self.liveTimer is not None:
+            self.liveTimer.Stop()
+            self.liveTimer = None
+        if self.receiver is not None:
+            self.receiver.close()
+            self.receiver = None
+
+    def OnLiveTimer(self, event):
+        """Merge the stats received since the last refresh into our model"""
+        stats = self.receiver.drain()
+        if not stats:
+            if not self.receiver.is_alive():
+                self.SetStatusText(_('Live profile connection closed: %(err)s')
+                                   % {'err': self.receiver.error or ''})
+                self.detach()
+            return
+        if self.loader is None:
+            from snakerunner import liveprofile
+            if self.pendingLiveStats is not None:
+                # deltas are incremental, earlier ones must not be lost
+                stats = liveprofile.add_stats(self.pendingLiveStats, stats)
+            try:
+                loader = pstatsloader.PStatsLoader(
+                    stats=pstatsloader.stats_from_dict(stats))
+            except RuntimeError:
+                # no root yet, try again with the next delta
+                self.pendingLiveStats = stats
+                return
+            self.pendingLiveStats = None
+            self.loader = loader
+            self.ConfigureViewTypeChoices()
+            self.SetModel(loader)
+            self.viewType = loader.ROOTS[0]
+        else:
+            self.MergeStats(stats)
+
+    def RefreshModel(self, old_root=None):
+        """Redisplay our (updated) model keeping the activated node where
+        possible"""
+        activated = self.activated_node
+        self.adapter, tree, rows = self.RootNode()
+        self.ApplySearch()
+        if activated is None or activated is old_root:
+            activated = self.activated_node = tree
+        elif not (activated is tree or rows.get(activated.key) is activated):
+            # the same function in a rebuilt (e.g. filtered) model
+            activated = self.activated_node = rows.get(activated.key, tree)
+        self.squareMap.lock = self.loader.lock
+        self.squareMap.SetModel(activated, self.adapter)
+        self.UpdateHotPaths()
+        selected = self.selected_node
+        if selected is not None and rows.get(selected.key) is not None:
+            selected = self.selected_node = rows[selected.key]
+        if selected is not None:
+            self.SelectNode(selected)
+
     def OnShallowerView(self, event):
         if not self.squareMap.max_depth:
             new_depth = self.squareMap.max_depth_seen or 0 - 1
         else:
             new_depth = self.squareMap.max_depth - 1
         self.squareMap.max_depth = max((1, new_depth))
-        self.squareMap.Refresh()
+        self.squareMap.RequestLayout()
 
     def OnDeeperView(self, event):
         if not self.squareMap.max_depth:
@@ -430,7 +1341,7 @@ class MainFrame(wx.Frame):
             new_depth = self.squareMap.max_depth + 1
         self.squareMap.max_depth = max((self.squareMap.max_depth_seen or 0,
                                         new_depth))
-        self.squareMap.Refresh()
+        self.squareMap.RequestLayout()
 
     def OnPackageView(self, event):
         self.SetPackageView(not self.directoryView)
@@ -457,6 +1368,7 @@ class MainFrame(wx.Frame):
         for control in self.ProfileListControls:
             control.SetPercentage(self.percentageView, total)
         self.adapter.SetPercentage(self.percentageView, total)
+        self.squareMap.Redraw()
 
     def OnUpView(self, event):
         """Request to move up the hierarchy to highest-weight parent"""
@@ -473,10 +1385,7 @@ class MainFrame(wx.Frame):
                 if not selected_parent:
                     parents.sort(key=lambda a: self.adapter.value(node, a))
                     selected_parent = parents[-1]
-
-                class event:
-                    node = selected_parent
-                self.OnNodeActivated(event)
+                self.ActivateNode(selected_parent)
             else:
                 self.SetStatusText(_('No parents for the currently selected node: %(node_name)s')
                                    % dict(node_name=self.adapter.label(node)))
@@ -493,6 +1402,30 @@ class MainFrame(wx.Frame):
 
     def OnRootView(self, event):
         """Reset view to the root of the tree"""
+        if self.viewType not in self.loader.roots:
+            # build the tree (e.g. the location tree) off the UI thread
+            loader, viewType = self.loader, self.viewType
+            generation = loader.generation
+            self.SetStatusText(
+                _('Loading %(view)s view...') % {'view': viewType})
+
+            def built(root):
+                if (loader is not self.loader
+                        or loader.generation != generation):
+                    # a live merge or a new model superseded the tree
+                    return
+                self.SetStatusText('')
+                self.OnRootView(event)
+
+            def failed(err):
+                self.SetStatusText(
+                    _('Unable to load %(view)s view: %(err)s')
+                    % {'view': viewType, 'err': err})
+            self.scheduler.submit(
+                'root', lambda token: loader.get_root(viewType), built, failed,
+            )
+            return
+        self.scheduler.cancel('root')
         self.adapter, tree, rows = self.RootNode()
         self.squareMap.SetModel(tree, self.adapter)
         self.RecordHistory()
@@ -500,14 +1433,26 @@ class MainFrame(wx.Frame):
 
     def OnNodeActivated(self, event):
         """Double-click or enter on a node in some control..."""
-        self.activated_node = self.selected_node = event.node
-        self.squareMap.SetModel(event.node, self.adapter)
-        self.squareMap.SetSelected(event.node)
-        if self.SourceShowFile(event.node):
-            if hasattr(event.node, 'lineno'):
-                self.sourceCodeControl.GotoLine(event.node.lineno)
+        self.ActivateNode(event.node)
+
+    def ActivateNode(self, node):
+        """Make node the root of the square-map (and show its source)"""
+        self.activated_node = self.selected_node = node
+        self.squareMap.SetModel(node, self.adapter)
+        self.squareMap.SetSelected(node)
+        self.sourceNode = node
+        if self.sourceCodeControl is not None:
+            self.ShowSource(node)
         self.RecordHistory()
 
+    def ShowSource(self, node):
+        """Show the source of node in the source-code view"""
+        filename = self.SourceShowFile(node)
+        self.ShowSourceHeat(self.sourceFileShown)
+        if filename:
+            if hasattr(node, 'lineno'):
+                self.sourceCodeControl.GotoLine(node.lineno)
+
     def SourceShowFile(self, node):
         """Show the given file in the source-code view (attempt it anyway)"""
         filename = self.adapter.filename(node)
@@ -521,12 +1466,30 @@ class MainFrame(wx.Frame):
                 # self.sourceCodeControl.setText(data)
                 self.sourceCodeControl.ClearAll()
                 self.sourceCodeControl.AppendText(data)
+                self.sourceFileShown = filename
         return filename
 
+    # milliseconds, about one update per display refresh
+    HIGHLIGHT_INTERVAL = 16
+    pendingHighlight = None
+    highlightTimer = None
+
     def OnSquareHighlightedMap(self, event):
-        self.SetStatusText(self.adapter.label(event.node))
-        self.listControl.SetIndicated(event.node)
-        text = self.squareMap.adapter.label(event.node)
+        """Coalesce highlights from the map, only the latest node is
+        propagated"""
+        self.pendingHighlight = event.node
+        if self.highlightTimer is None or not self.highlightTimer.IsRunning():
+            self.highlightTimer = wx.CallLater(self.HIGHLIGHT_INTERVAL,
+                                               self.ApplyHighlight)
+
+    def ApplyHighlight(self):
+        """Propagate the most recently highlighted map node to the other
+        views"""
+        node, self.pendingHighlight = self.pendingHighlight, None
+        if node is None:
+            return
+        self.listControl.SetIndicated(node)
+        text = self.squareMap.adapter.label(node)
         self.squareMap.SetToolTip(text)
         self.SetStatusText(text)
 
@@ -547,18 +1510,23 @@ class MainFrame(wx.Frame):
 
     def OnSquareSelected(self, event):
         """Update all views to show selection children/parents"""
-        self.selected_node = event.node
+        self.SelectNode(event.node)
+
+    def SelectNode(self, node):
+        """Show the callees (and callers) of node"""
+        self.selected_node = node
         self.calleeListControl.integrateRecords(
-            self.adapter.children(event.node))
-        self.callerListControl.integrateRecords(
-            self.adapter.parents(event.node))
+            self.adapter.callee_edges(node))
+        if self.callerListControl is not None:
+            self.callerListControl.integrateRecords(
+                self.adapter.caller_edges(node))
         # self.allCalleeListControl.integrateRecords(event.node.descendants())
         # self.allCallerListControl.integrateRecords(event.node.ancestors())
 
     def OnMoreSquareToggle(self, event):
         """Toggle the more-square view (better looking, but more likely to filter records)"""
         self.squareMap.square_style = not self.squareMap.square_style
-        self.squareMap.Refresh()
+        self.squareMap.RequestLayout()
         self.moreSquareViewItem.Check(self.squareMap.square_style)
 
     restoringHistory = False
@@ -581,21 +1549,26 @@ class MainFrame(wx.Frame):
         self.restoringHistory = True
         try:
             activated = record
-
-            class activated_event:
-                node = activated
-
             if activated:
-                self.OnNodeActivated(activated_event)
-                self.squareMap.SetSelected(activated_event.node)
-                self.listControl.SetSelected(activated_event.node)
+                self.ActivateNode(activated)
+                self.squareMap.SetSelected(activated)
+                self.listControl.SetSelected(activated)
         finally:
             self.restoringHistory = False
 
-    def load(self, *filenames):
-        """Load our dataset (iteratively)"""
+    def load(self, *filenames, sources=False):
+        """Load our dataset (iteratively)
+
+        sources -- keep a per-source breakdown of several files (File ->
+            Open Worker Profiles, --sources), True or a pattern naming the
+            sources, see pstatsloader.PStatsLoader
+        """
         try:
-            self.loader = pstatsloader.PStatsLoader(*filenames)
+            self.loader = pstatsloader.PStatsLoader(
+                *filenames, sources=sources)
+            if self.loader.sources is not None:
+                self.listControl.SetColumns(
+                    PROFILE_VIEW_COLUMNS + source_columns(self.loader.sources))
             self.ConfigureViewTypeChoices()
             self.SetModel(self.loader)
             self.viewType = self.loader.ROOTS[0]
@@ -612,10 +1585,16 @@ class MainFrame(wx.Frame):
     def SetModel(self, loader):
         """Set our overall model (a loader object) and populate sub-controls"""
         self.loader = loader
+        if loader.base is None or loader.base is not self.baseLoader:
+            self.baseLoader = None
+            self.transforms = ()
+            self.collapseRecursionItem.Check(False)
         self.adapter, tree, rows = self.RootNode()
-        self.listControl.integrateRecords(list(rows.values()))
+        self.ApplySearch()
         self.activated_node = tree
+        self.squareMap.lock = loader.lock
         self.squareMap.SetModel(tree, self.adapter)
+        self.UpdateHotPaths()
         self.RecordHistory()
 
     def RootNode(self):
@@ -648,6 +1627,8 @@ class MainFrame(wx.Frame):
 
         return config_parser
 
+    config = None
+
     def LoadState(self, config_parser):
         """Set our window state from the given config_parser instance"""
         if not config_parser:
@@ -682,6 +1663,7 @@ class MainFrame(wx.Frame):
         else:
             font = wx.SystemSettings_GetFont(wx.SYS_DEFAULT_GUI_FONT)
             font.SetPointSize(font_size)
+            self.listFont = font
             for ctrl in self.ProfileListControls:
                 ctrl.SetFont(font)
 
@@ -701,6 +1683,10 @@ class MainFrame(wx.Frame):
         except Exception as err:
             log.error("Unable to write window preferences, ignoring: %s",
                       traceback.format_exc())
+        self.scheduler.close()
+        base = self.baseLoader or self.loader
+        if base is not None:
+            base.close()
         self.Destroy()
 
 
@@ -708,17 +1694,46 @@ class RunSnakeRunApp(wx.App):
     """Basic application for holding the viewing Frame"""
     #handler = wx.PNGHandler()
 
+    startup = None
+
     def OnInit(self):
         """Initialise the application"""
         # wx.Image.AddHandler(self.handler)
         frame = MainFrame(config_parser=load_config())
         frame.Show(True)
         self.SetTopWindow(frame)
-        if sys.argv[1:]:
-            wx.CallAfter(frame.load, *sys.argv[1:])
+        if self.startup is not None:
+            self.startup.mark('frame created')
+            # runs once the event loop is up, i.e. once the window is shown
+            wx.CallAfter(self.startup.window_shown)
+        filenames, sources = source_option(sys.argv[1:])
+        if filenames:
+            wx.CallAfter(frame.load, *filenames, sources=sources)
         return True
 
 
+SOURCES_FLAG = '--sources'
+
+
+def source_option(args):
+    """Split the --sources[=PATTERN] flag off the command line arguments
+
+    Returns the remaining arguments and the sources argument of
+    MainFrame.load (False without the flag, True or the PATTERN naming the
+    sources with it).
+    """
+    sources = False
+    remaining = []
+    for arg in args:
+        if arg == SOURCES_FLAG:
+            sources = True
+        elif arg.startswith(SOURCES_FLAG + '='):
+            sources = arg[len(SOURCES_FLAG) + 1:] or True
+        else:
+            remaining.append(arg)
+    return remaining, sources
+
+
 def getIcon(data):
     """Return the data from the resource as a wxIcon"""
     import io
@@ -749,9 +1764,13 @@ def load_config():
     return config
 
 
-def main():
-    """Mainloop for the application"""
+def main(startup=None):
+    """Mainloop for the application
+
+    startup -- optional cli.StartupTiming to report the time-to-window
+    """
     logging.basicConfig(level=logging.INFO)
+    RunSnakeRunApp.startup = startup
     app = RunSnakeRunApp(0)
     app.MainLoop()
 
@@ -0,0 +1,221 @@
+"""Load a sequence of profile dumps as time slices of one profile
+
+Each dump is a snapshot (time slice) of a sparse function x snapshot
+matrix. The matrix is held column-wise in flat arrays of running (prefix)
+sums, with one run of entries per function for the snapshots it occurs
+in, so the totals for any window of snapshots are two lookups and a
+subtraction per function and edge.
+"""
+import pstats
+import logging
+from array import array
+from bisect import bisect_left
+
+log = logging.getLogger(__name__)
+
+SPARKS = u'▁▂▃▄▅▆▇█'
+# pstats rows are (cc, nc, tt, ct, callers), caller edges (nc, cc, tt, ct)
+METRICS = 4
+
+
+class SnapshotSeries(object):
+    """A time-ordered sequence of profile dumps
+
+    filenames -- the dumps, in time order
+    cumulative -- True if each dump holds the totals since profiling started
+        (e.g. periodic dump_stats of a single profiler), False if each dump
+        is a separate time slice, None (default) to guess which it is (see
+        detect_cumulative, a delta series whose call counts happen to grow
+        looks cumulative, so pass the mode when it is known)
+    """
+
+    # cumulative was guessed by detect_cumulative
+    detected = False
+
+    def __init__(self, filenames, cumulative=None):
+        self.filenames = list(filenames)
+        self.functions = []
+        self.function_index = {}
+        self.edges = []
+        self.edge_index = {}
+        slices = [self.read(filename) for filename in self.filenames]
+        if cumulative is None:
+            cumulative = self.detect_cumulative(slices)
+            self.detected = True
+        self.cumulative = cumulative
+        self.size = len(slices)
+        self.function_sums = self.prefix_sums(
+            len(self.functions), [rows for rows, edges in slices], cumulative)
+        self.edge_sums = self.prefix_sums(
+            len(self.edges), [edges for rows, edges in slices], cumulative)
+
+    def __len__(self):
+        return self.size
+
+    def read(self, filename):
+        """Read a dump as {function: values}, {edge: values} index
+        dictionaries"""
+        rows, edges = {}, {}
+        raw = pstats.Stats(filename).stats
+        for func, (cc, nc, tt, ct, callers) in raw.items():
+            index = self.function_index.get(func)
+            if index is None:
+                index = self.function_index[func] = len(self.functions)
+                self.functions.append(func)
+            rows[index] = (cc, nc, tt, ct)
+            for caller, data in callers.items():
+                edge = (caller, func)
+                index = self.edge_index.get(edge)
+                if index is None:
+                    index = self.edge_index[edge] = len(self.edges)
+                    self.edges.append(edge)
+                if not isinstance(data, tuple):
+                    data = (data, data, 0, 0)
+                edges[index] = data
+        return rows, edges
+
+    def detect_cumulative(self, slices):
+        """Are the dumps cumulative (call counts never decrease)?"""
+        for (previous, _), (current, _) in zip(slices, slices[1:]):
+            for index, values in previous.items():
+                later = current.get(index)
+                if later is None or later[1] < values[1]:
+                    return False
+        return len(slices) > 1
+
+    def prefix_sums(self, count, slices, cumulative):
+        """Pack slices into a PrefixSums matrix of running totals"""
+        runs = [[] for index in range(count)]
+        for position, values in enumerate(slices):
+            for index, data in values.items():
+                runs[index].append((position, data))
+        matrix = PrefixSums()
+        for run in runs:
+            totals = [0] * METRICS
+            for position, data in run:
+                for metric in range(METRICS):
+                    if cumulative:
+                        # a function's total can't shrink, even if absent
+                        # from a dump
+                        totals[metric] = max(totals[metric], data[metric])
+                    else:
+                        totals[metric] += data[metric]
+                matrix.append(position, totals)
+            matrix.close_run()
+        return matrix
+
+    def window_values(self, sums, index, start, end):
+        return [
+            b - a for a, b in
+            zip(sums.total(index, start), sums.total(index, end))
+        ]
+
+    def window_stats(self, start=0, end=None):
+        """Build raw pstats-format stats for snapshots start (inclusive) to
+        end (exclusive)"""
+        if end is None:
+            end = self.size
+        return self.difference_stats((0, 0), (start, end))
+
+    def difference_stats(self, old, new):
+        """Build raw stats for window new less window old (for updating a
+        model)"""
+        stats = {}
+        (old_start, old_end), (new_start, new_end) = old, new
+
+        def difference(sums, index):
+            values = [
+                (new_b - new_a) - (old_b - old_a)
+                for new_a, new_b, old_a, old_b in zip(
+                    sums.total(index, new_start), sums.total(index, new_end),
+                    sums.total(index, old_start), sums.total(index, old_end),
+                )
+            ]
+            if any(values):
+                return values
+            return None
+
+        for index, func in enumerate(self.functions):
+            values = difference(self.function_sums, index)
+            if values is not None:
+                cc, nc, tt, ct = values
+                stats[func] = (int(cc), int(nc), tt, ct, {})
+        for index, (caller, func) in enumerate(self.edges):
+            values = difference(self.edge_sums, index)
+            if values is not None:
+                nc, cc, tt, ct = values
+                if func not in stats:
+                    stats[func] = (0, 0, 0.0, 0.0, {})
+                stats[func][4][caller] = (int(nc), int(cc), tt, ct)
+        return stats
+
+    def sparkline(self, func, buckets=24):
+        """Render the cumulative time of func across the snapshots as a
+        sparkline"""
+        index = self.function_index.get(func)
+        if index is None or not self.size:
+            return ''
+        buckets = min(buckets, self.size)
+        bounds = [self.size * i // buckets for i in range(buckets + 1)]
+        values = [
+            self.window_values(self.function_sums, index, start, end)[3]
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        top = max(values)
+        if top <= 0:
+            return SPARKS[0] * len(values)
+        return u''.join([
+            SPARKS[min(len(SPARKS) - 1, int(value / top * len(SPARKS)))]
+            if value > 0 else SPARKS[0]
+            for value in values
+        ])
+
+
+class SparseRows(object):
+    """Sparse rows of values stored column-wise in flat arrays
+
+    Row index has entries offsets[index] to offsets[index+1], each entry is
+    a position (e.g. a slice or a source) and a value in each of width
+    columns. Rows are built in turn: append their entries, then close_run.
+    """
+
+    def __init__(self, width):
+        self.offsets = array('l', [0])
+        self.positions = array('l')
+        self.columns = [array('d') for column in range(width)]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, position, values):
+        self.positions.append(position)
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def close_run(self):
+        """End the current row, returns its index"""
+        self.offsets.append(len(self.positions))
+        return len(self.offsets) - 2
+
+    def entries(self, index):
+        """The entries (indices into positions and columns) of row index"""
+        return range(self.offsets[index], self.offsets[index + 1])
+
+
+class PrefixSums(SparseRows):
+    """Sparse rows of running totals (see SparseRows)
+
+    Each entry is the (slice) position and the totals of all slices up to
+    and including it.
+    """
+
+    def __init__(self):
+        super(PrefixSums, self).__init__(METRICS)
+
+    def total(self, index, position):
+        """Totals of row index over the slices before position"""
+        lo, hi = self.offsets[index], self.offsets[index + 1]
+        entry = bisect_left(self.positions, position, lo, hi)
+        if entry == lo:
+            return [0.0] * METRICS
+        return [column[entry - 1] for column in self.columns]
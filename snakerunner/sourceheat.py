@@ -0,0 +1,152 @@
+"""Heat map of a source file from the profile rows of its functions
+
+Function extents (first and last line of each function, class body, lambda
+and comprehension) come from parsing the file with ast, cached per file and
+modification time. Profile rows are matched to extents by line number, the
+line profilers record for a code object (the first decorator's line for
+decorated functions, the def line on older Pythons).
+"""
+import os
+import ast
+import logging
+from collections import OrderedDict, namedtuple
+
+log = logging.getLogger(__name__)
+
+# (filename) -> (mtime, extents), least recently used first
+CACHE_SIZE = 64
+extent_cache = OrderedDict()
+
+# first -- line profilers record, start -- the def (or class, lambda) line,
+# last -- the last line of the body
+Extent = namedtuple('Extent', ('name', 'first', 'start', 'last'))
+# local and cumulative are fractions of the largest in the file
+Heat = namedtuple('Heat', ('row', 'extent', 'local', 'cumulative'))
+
+COMPREHENSIONS = {
+    ast.ListComp: '<listcomp>',
+    ast.SetComp: '<setcomp>',
+    ast.DictComp: '<dictcomp>',
+    ast.GeneratorExp: '<genexpr>',
+}
+
+
+def function_extents(filename):
+    """{line: [Extent]} of the code objects of filename (cached per file and
+    mtime)
+
+    Each extent is indexed under its first and its start line. Returns an
+    empty mapping for missing or unparseable files.
+    """
+    try:
+        mtime = os.stat(filename).st_mtime
+    except OSError:
+        return {}
+    cached = extent_cache.get(filename)
+    if cached is not None and cached[0] == mtime:
+        extent_cache.move_to_end(filename)
+        return cached[1]
+    extents = parse_extents(filename)
+    extent_cache[filename] = (mtime, extents)
+    while len(extent_cache) > CACHE_SIZE:
+        extent_cache.popitem(last=False)
+    return extents
+
+
+def parse_extents(filename):
+    try:
+        with open(filename, 'rb') as fh:
+            tree = ast.parse(fh.read(), filename)
+    except (OSError, SyntaxError, ValueError) as err:
+        log.info('Unable to parse %s: %s', filename, err)
+        return {}
+    extents = {}
+    for node in ast.walk(tree):
+        if isinstance(
+                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            name = node.name
+            first = min([node.lineno] + [
+                decorator.lineno for decorator in node.decorator_list])
+        elif isinstance(node, ast.Lambda):
+            name = '<lambda>'
+            first = node.lineno
+        elif type(node) in COMPREHENSIONS:
+            name = COMPREHENSIONS[type(node)]
+            first = node.lineno
+        else:
+            continue
+        last = getattr(node, 'end_lineno', None) or node.lineno
+        extent = Extent(name, first, node.lineno, last)
+        extents.setdefault(first, []).append(extent)
+        if node.lineno != first:
+            extents.setdefault(node.lineno, []).append(extent)
+    return extents
+
+
+def find_extent(extents, row):
+    """The extent of the code object of row, if any"""
+    candidates = extents.get(row.lineno)
+    if not candidates:
+        return None
+    for extent in candidates:
+        if extent.name == row.name:
+            return extent
+    return candidates[0]
+
+
+class SourceHeat(object):
+    """The function rows of a profile grouped by source file
+
+    rows -- the profile's function rows (e.g. PStatsLoader.rows.values())
+    """
+
+    def __init__(self, rows):
+        files = {}
+        for row in rows:
+            if not getattr(row, 'lineno', None) or not row.directory:
+                continue
+            filename = os.path.join(row.directory, row.filename)
+            files.setdefault(filename, []).append(row)
+        self.files = files
+
+    def heat(self, filename):
+        """Heat of the functions of filename, outermost (longest) functions
+        first
+
+        Module bodies are left out, they would cover the whole file.
+        """
+        extents = function_extents(filename)
+        found = []
+        for row in self.files.get(filename, ()):
+            if row.name == '<module>':
+                continue
+            extent = find_extent(extents, row)
+            if extent is not None:
+                found.append((row, extent))
+        if not found:
+            return []
+        local = max([row.local for row, extent in found]) or 1.0
+        cumulative = max([row.cumulative for row, extent in found]) or 1.0
+        heats = [
+            Heat(row, extent, row.local / local, row.cumulative / cumulative)
+            for row, extent in found
+        ]
+        heats.sort(key=lambda heat: (
+            heat.extent.first - heat.extent.last, heat.extent.first))
+        return heats
+
+
+def line_owners(heats):
+    """{line: Heat} of the innermost function covering each line of heats"""
+    owners = {}
+    for heat in heats:
+        for line in range(heat.extent.first, heat.extent.last + 1):
+            owners[line] = heat
+    return owners
+
+
+def level(fraction, levels):
+    """Quantise fraction (0 to 1) into one of levels, None if zero"""
+    if fraction <= 0:
+        return None
+    return min(levels - 1, int(fraction * levels))
@@ -0,0 +1,142 @@
+"""Per-source (worker, host, process) breakdown of a merged set of profiles
+
+When the dumps of many workers are loaded together, the functions x
+sources values are kept as a sparse matrix in flat arrays (one run of
+entries per function for the sources it occurs in, see
+snapshots.SparseRows), so the spread of a function's time across the
+workers can be shown next to the totals.
+"""
+import os
+import re
+import math
+import logging
+
+from snakerunner import snapshots
+
+log = logging.getLogger(__name__)
+
+# the per-source values held for each function (as the PStatRow attributes)
+METRICS = ('calls', 'local', 'cumulative')
+
+
+def source_names(filenames, pattern=None):
+    """Derive a source name for each of filenames
+
+    pattern -- a regular expression searched in each filename, the group
+        named 'source' (or else the first group, or the whole match) names
+        the source, e.g. r'pid(\\d+)' or r'(?P<source>[^/]+)/profile'
+
+    Without a pattern, the prefix and suffix common to all base names are
+    stripped, so worker-1.prof, worker-2.prof become 1 and 2. Files that map
+    to the same name are treated as one source.
+    """
+    if pattern is not None:
+        regex = re.compile(pattern)
+        names = []
+        for filename in filenames:
+            match = regex.search(filename)
+            if match is None:
+                names.append(os.path.basename(filename))
+            elif 'source' in regex.groupindex:
+                names.append(match.group('source'))
+            elif regex.groups:
+                names.append(match.group(1))
+            else:
+                names.append(match.group(0))
+        return names
+    names = [os.path.basename(filename) for filename in filenames]
+    if len(set(names)) < len(names):
+        names = list(filenames)
+    if len(names) < 2:
+        return names
+    prefix = os.path.commonprefix(names)
+    suffix = os.path.commonprefix([name[::-1] for name in names])[::-1]
+    shortest = min([len(name) for name in names])
+    if len(prefix) + len(suffix) > shortest:
+        suffix = suffix[len(prefix) + len(suffix) - shortest:]
+    return [
+        name[len(prefix):len(name) - len(suffix)] or name for name in names]
+
+
+class SourceMatrix(object):
+    """Sparse functions x sources matrix of calls, local and cumulative time"""
+
+    def __init__(self):
+        self.sources = []
+        self.source_index = {}
+        self.pending = {}
+        self.function_index = {}
+        self.matrix = snapshots.SparseRows(len(METRICS))
+        self.summaries = {}
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, source, stats):
+        """Add raw pstats-format stats for source (call pack when done)"""
+        position = self.source_index.get(source)
+        if position is None:
+            position = self.source_index[source] = len(self.sources)
+            self.sources.append(source)
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            entries = self.pending.get(func)
+            if entries is None:
+                entries = self.pending[func] = {}
+            current = entries.get(position, (0, 0.0, 0.0))
+            entries[position] = (
+                current[0] + cc, current[1] + tt, current[2] + ct)
+
+    def pack(self):
+        """Pack the added stats into the flat arrays"""
+        matrix = self.matrix
+        for func, entries in self.pending.items():
+            for position in sorted(entries):
+                matrix.append(position, entries[position])
+            self.function_index[func] = matrix.close_run()
+        self.pending = {}
+        self.summaries = {}
+        return self
+
+    def values(self, key, metric='cumulative'):
+        """Values of metric for function key in each source (0 where absent)"""
+        values = [0.0] * len(self.sources)
+        index = self.function_index.get(key)
+        if index is None:
+            return values
+        column = self.matrix.columns[METRICS.index(metric)]
+        positions = self.matrix.positions
+        for entry in self.matrix.entries(index):
+            values[positions[entry]] = column[entry]
+        return values
+
+    def summary(self, key):
+        """(min, median, max, stddev, skew) of the cumulative time of key
+
+        skew is max/mean, 1.0 when the time is spread evenly, approaching
+        the number of sources when a single source has all of it.
+        """
+        summary = self.summaries.get(key)
+        if summary is None:
+            if key not in self.function_index:
+                return None
+            values = sorted(self.values(key))
+            count = len(values)
+            middle = count // 2
+            if count % 2:
+                median = values[middle]
+            else:
+                median = (values[middle - 1] + values[middle]) / 2.0
+            mean = sum(values) / count
+            stddev = math.sqrt(
+                sum([(value - mean) ** 2 for value in values]) / count)
+            skew = values[-1] / mean if mean else 1.0
+            summary = self.summaries[key] = (
+                values[0], median, values[-1], stddev, skew)
+        return summary
+
+    def slowest(self, key):
+        """Name of the source with the largest cumulative time for key"""
+        if key not in self.function_index:
+            return None
+        values = self.values(key)
+        return self.sources[values.index(max(values))]
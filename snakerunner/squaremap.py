@@ -2,12 +2,18 @@
 
 import sys
 import os
+import math
 import logging
-import operator
+import contextlib
+from collections import OrderedDict
 
 import wx
 import wx.lib.newevent
 
+from snakerunner import instrument
+from snakerunner import layout
+from snakerunner.layout import DefaultAdapter
+
 log = logging.getLogger('squaremap')
 #log.setLevel( logging.DEBUG )
 
@@ -30,24 +36,16 @@ class HotMapNavigator(object):
                 return result
         return None
 
-    if hasattr(wx.Rect, 'Contains'):
-        # wx 2.8+
-        @classmethod
-        def findNodeAtPosition(class_, hot_map, position, parent=None):
-            ''' Retrieve the node at the given position. '''
-            for rect, node, children in hot_map:
-                if rect.Contains(position):
-                    return class_.findNodeAtPosition(children, position, node)
-            return parent
-    else:
-        # wx 2.6
-        @classmethod
-        def findNodeAtPosition(class_, hot_map, position, parent=None):
-            ''' Retrieve the node at the given position. '''
-            for rect, node, children in hot_map:
-                if rect.Inside(position):
-                    return class_.findNodeAtPosition(children, position, node)
-            return parent
+    @classmethod
+    def findNodeAtPosition(class_, hot_map, position, parent=None, min_size=0):
+        ''' Retrieve the node at the given position (ignoring boxes smaller
+        than min_size). '''
+        for rect, node, children in hot_map:
+            if (rect[2] >= min_size and rect[3] >= min_size and
+                    layout.rect_contains(rect, position)):
+                return class_.findNodeAtPosition(
+                    children, position, node, min_size)
+        return parent
 
     @staticmethod
     def firstChild(hot_map, index):
@@ -85,13 +83,58 @@ class HotMapNavigator(object):
             return hot_map[-1][1]  # Return the last node
 
 
+class TileCache(object):
+    """Least-recently-used cache of rendered tiles, keyed by (zoom level,
+    column, row)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.size:
+            self.tiles.popitem(last=False)
+
+    def clear(self):
+        self.tiles.clear()
+
+
 class SquareMap(wx.Panel):
-    """Construct a nested-box trees structure view"""
+    """Construct a nested-box trees structure view
+
+    The model is laid out once at LAYOUT_SCALE times the window size and
+    viewed at a zoom level (mouse wheel or +/-/0 keys) and origin (dragging),
+    the map is drawn from tiles of TILE_SIZE pixels, rendered once per zoom
+    level and kept in a TileCache. The selected, highlighted and marked
+    boxes are drawn over the tiles, so changing them renders no tiles.
+    """
 
     BackgroundColour = wx.Colour(128, 128, 128)
+    MarkedColour = wx.Colour(255, 200, 0)
+    HighlightColour = wx.Colour(0, 255, 0)
     max_depth = None
     max_depth_seen = None
 
+    LAYOUT_SCALE = 4
+    # zoom levels multiply the scale by ZOOM_STEP, up to MAX_SCALE pixels per
+    # layout unit
+    ZOOM_STEP = 2 ** 0.25
+    MAX_SCALE = 2.0
+    TILE_SIZE = 256
+    TILE_CACHE_SIZE = 96
+    # boxes smaller than this (in pixels) are neither drawn nor hit
+    MIN_BOX = 2
+    OVERLAY_ALPHA = 128
+    DRAG_THRESHOLD = 3
+
     def __init__(
         self,  parent=None, id=-1, pos=wx.DefaultPosition,
         size=wx.DefaultSize,
@@ -115,6 +158,11 @@ class SquareMap(wx.Panel):
             works better on objects with large numbers of children, such as Meliae memory
             dumps, works fine on profile views as well, but the layout is less obvious wrt
             what node is "next" "previous" etc.
+
+        Set scheduler to a scheduler.Scheduler to compute layouts off the UI
+        thread, the previous layout is shown until the new one is ready. Set
+        lock to a lock held by whatever changes the model in place (e.g. live
+        profile merges), layouts computed off the UI thread hold it.
         """
         super(SquareMap, self).__init__(
             parent, id, pos, size, style, name
@@ -127,42 +175,111 @@ class SquareMap(wx.Panel):
         self.highlight = highlight
         self.selectedNode = None
         self.highlightedNode = None
+        self.markedNodes = set()
         self._buffer = wx.Bitmap(20, 20)  # Have a default buffer ready
+        self.zoomLevel = 0
+        self.origin = (0, 0)
+        self.tiles = TileCache(self.TILE_CACHE_SIZE)
+        self.dragStart = None
+        self.dragging = False
+        self.wheelRotation = 0
         self.Bind(wx.EVT_PAINT, self.OnPaint)
         self.Bind(wx.EVT_SIZE, self.OnSize)
-        if highlight:
-            self.Bind(wx.EVT_MOTION, self.OnMouse)
+        self.Bind(wx.EVT_MOTION, self.OnMouse)
+        self.Bind(wx.EVT_MOUSEWHEEL, self.OnWheel)
+        self.Bind(wx.EVT_LEFT_DOWN, self.OnClick)
         self.Bind(wx.EVT_LEFT_UP, self.OnClickRelease)
         self.Bind(wx.EVT_LEFT_DCLICK, self.OnDoubleClick)
         self.Bind(wx.EVT_KEY_UP, self.OnKeyUp)
         self.hot_map = []
+        self.layout = None
         self.adapter = adapter or DefaultAdapter()
         self.DEFAULT_PEN = wx.Pen(wx.BLACK, 1, wx.SOLID)
         self.SELECTED_PEN = wx.Pen(wx.WHITE, 2, wx.SOLID)
         self.OnSize(None)
 
+    @property
+    def scale(self):
+        """Pixels per layout unit at the current zoom level"""
+        return self.ZOOM_STEP ** self.zoomLevel / self.LAYOUT_SCALE
+
+    @property
+    def pixel_padding(self):
+        """Our padding (unzoomed map pixels) at the current zoom level"""
+        return self.padding * self.LAYOUT_SCALE * self.scale
+
+    def NodeAt(self, position):
+        """Retrieve the (visible) node at the window position"""
+        scale = self.scale
+        x, y = self.origin
+        return HotMapNavigator.findNodeAtPosition(
+            self.hot_map,
+            ((position[0] + x) / scale, (position[1] + y) / scale),
+            min_size=self.MIN_BOX / scale,
+        )
+
     def OnMouse(self, event):
-        """Handle mouse-move event by selecting a given element"""
-        node = HotMapNavigator.findNodeAtPosition(
-            self.hot_map, event.GetPosition())
-        self.SetHighlight(node, event.GetPosition())
+        """Handle mouse-move event by dragging the map or highlighting a
+        given element"""
+        position = event.GetPosition()
+        if self.dragStart is not None and event.LeftIsDown():
+            x, y, origin_x, origin_y = self.dragStart
+            moved = abs(position[0] - x) + abs(position[1] - y)
+            if self.dragging or moved > self.DRAG_THRESHOLD:
+                self.dragging = True
+                self.SetOrigin(
+                    origin_x - (position[0] - x), origin_y - (position[1] - y))
+            return
+        if self.highlight:
+            self.SetHighlight(self.NodeAt(position), position)
+
+    def OnClick(self, event):
+        """Start dragging the map (a click without moving selects on
+        release)"""
+        event.Skip()
+        position = event.GetPosition()
+        self.dragStart = (position[0], position[1]) + self.origin
+        self.dragging = False
 
     def OnClickRelease(self, event):
         """Release over a given square in the map"""
-        node = HotMapNavigator.findNodeAtPosition(
-            self.hot_map, event.GetPosition())
+        dragged, self.dragStart, self.dragging = self.dragging, None, False
+        if dragged:
+            return
+        node = self.NodeAt(event.GetPosition())
         self.SetSelected(node, event.GetPosition())
 
+    def OnWheel(self, event):
+        """Zoom in or out around the mouse position"""
+        self.wheelRotation += event.GetWheelRotation()
+        delta = event.GetWheelDelta() or 120
+        steps = int(self.wheelRotation / delta)
+        if steps:
+            self.wheelRotation -= steps * delta
+            self.Zoom(self.zoomLevel + steps, event.GetPosition())
+
     def OnDoubleClick(self, event):
         """Double click on a given square in the map"""
-        node = HotMapNavigator.findNodeAtPosition(
-            self.hot_map, event.GetPosition())
+        node = self.NodeAt(event.GetPosition())
         if node:
             wx.PostEvent(self, SquareActivationEvent(
                 node=node, point=event.GetPosition(), map=self))
 
+    ZOOM_IN_KEYS = (ord('+'), ord('='), wx.WXK_ADD, wx.WXK_NUMPAD_ADD)
+    ZOOM_OUT_KEYS = (ord('-'), wx.WXK_SUBTRACT, wx.WXK_NUMPAD_SUBTRACT)
+    ZOOM_RESET_KEYS = (ord('0'), wx.WXK_NUMPAD0)
+
     def OnKeyUp(self, event):
         event.Skip()
+        if event.KeyCode in self.ZOOM_IN_KEYS:
+            self.Zoom(self.zoomLevel + 1)
+            return
+        elif event.KeyCode in self.ZOOM_OUT_KEYS:
+            self.Zoom(self.zoomLevel - 1)
+            return
+        elif event.KeyCode in self.ZOOM_RESET_KEYS:
+            self.Zoom(0)
+            return
         if not self.selectedNode or not self.hot_map:
             return
 
@@ -201,7 +318,7 @@ class SquareMap(wx.Panel):
         if node == self.selectedNode:
             return
         self.selectedNode = node
-        self.UpdateDrawing()
+        self.RequestUpdate()
         if node:
             wx.PostEvent(self, SquareSelectionEvent(
                 node=node, point=point, map=self))
@@ -212,17 +329,24 @@ class SquareMap(wx.Panel):
             return
         self.highlightedNode = node
         # TODO: restrict refresh to the squares for previous node and new node...
-        self.UpdateDrawing()
+        self.RequestUpdate()
         if node and propagate:
             wx.PostEvent(self, SquareHighlightEvent(
                 node=node, point=point, map=self))
 
+    def SetMarked(self, nodes=None):
+        """Set the nodes to mark (e.g. search results) in the square-map"""
+        self.markedNodes = set(nodes or ())
+        self.RequestUpdate()
+
     def SetModel(self, model, adapter=None):
         """Set our model object (root of the tree)"""
         self.model = model
         if adapter is not None:
             self.adapter = adapter
-        self.UpdateDrawing()
+        self.zoomLevel = 0
+        self.origin = (0, 0)
+        self.RequestLayout()
 
     def OnPaint(self, event):
         dc = wx.BufferedPaintDC(self, self._buffer)
@@ -241,25 +365,206 @@ class SquareMap(wx.Panel):
         if width and height:
             # Macs can generate events with 0-size values
             self._buffer = wx.Bitmap(width, height)
+            self.zoomLevel = 0
+            self.origin = (0, 0)
+            # show the current layout until the resizing stops
             self.UpdateDrawing()
+            if self.resizeTimer is not None and self.resizeTimer.IsRunning():
+                self.resizeTimer.Restart(self.RESIZE_DELAY)
+            else:
+                self.resizeTimer = wx.CallLater(
+                    self.RESIZE_DELAY, self.RequestLayout)
+
+    RESIZE_DELAY = 200  # milliseconds without resizing before laying out again
+    resizeTimer = None
+
+    UPDATE_INTERVAL = 16  # milliseconds between redraws for rapid changes
+    updateTimer = None
+
+    def RequestUpdate(self):
+        """Redraw soon, coalescing rapid changes (e.g. mouse sweeps) into one
+        redraw"""
+        if self.updateTimer is None or not self.updateTimer.IsRunning():
+            self.updateTimer = wx.CallLater(
+                self.UPDATE_INTERVAL, self.UpdateDrawing)
+
+    scheduler = None
+    lock = None
+
+    def RequestLayout(self):
+        """Lay out the model again (after a change of model, size or style)"""
+        model, adapter = self.model, self.adapter
+        width, height = self._buffer.GetSize()
+        width, height = width * self.LAYOUT_SCALE, height * self.LAYOUT_SCALE
+        # padding and margin are given in pixels of the unzoomed map
+        options = dict(
+            padding=self.padding * self.LAYOUT_SCALE,
+            margin=self.margin * self.LAYOUT_SCALE,
+            square_style=self.square_style, max_depth=self.max_depth,
+        )
+        if self.scheduler is None:
+            self.SetLayout(
+                layout.Layout(model, adapter, width, height, **options))
+        else:
+            lock = self.lock
+            if lock is None:
+                lock = contextlib.nullcontext()
+
+            def compute(token):
+                with lock:
+                    return layout.Layout(
+                        model, adapter, width, height,
+                        check=token.check, **options)
+            self.scheduler.submit('layout', compute, self.SetLayout)
+
+    def SetLayout(self, new_layout):
+        """Swap in a (completed) layout and draw it"""
+        self.layout = new_layout
+        self.hot_map = new_layout.hot_map
+        self.max_depth_seen = new_layout.max_depth_seen
+        self.tiles.clear()
+        self.SetOrigin(*self.origin)
+        self.UpdateDrawing()
+
+    def Redraw(self):
+        """Render the map again (e.g. after the adapter's labels or colours
+        changed)"""
+        self.tiles.clear()
+        self.UpdateDrawing()
+
+    def Zoom(self, level, around=None):
+        """Zoom to level (0 shows the whole map), keeping the point around in
+        place
+
+        around -- window position to zoom around, default the centre
+        """
+        if self.layout is None:
+            return
+        maximum = int(math.ceil(
+            math.log(self.MAX_SCALE * self.LAYOUT_SCALE, self.ZOOM_STEP)))
+        level = max(0, min(maximum, level))
+        if level == self.zoomLevel:
+            return
+        if around is None:
+            width, height = self._buffer.GetSize()
+            around = (width // 2, height // 2)
+        old = self.scale
+        self.zoomLevel = level
+        factor = self.scale / old
+        x, y = self.origin
+        self.SetOrigin(
+            (around[0] + x) * factor - around[0],
+            (around[1] + y) * factor - around[1],
+        )
+        self.RequestUpdate()
+
+    def SetOrigin(self, x, y):
+        """Pan the (zoomed) map so the window's top left shows pixel x, y of
+        it"""
+        width, height = self._buffer.GetSize()
+        if self.layout is not None:
+            scale = self.scale
+            x = max(0, min(x, self.layout.size[0] * scale - width))
+            y = max(0, min(y, self.layout.size[1] * scale - height))
+        origin = (int(x), int(y))
+        if origin != self.origin:
+            self.origin = origin
+            self.RequestUpdate()
 
     def UpdateDrawing(self):
         dc = wx.BufferedDC(wx.ClientDC(self), self._buffer)
         self.Draw(dc)
 
+    @instrument.timed
     def Draw(self, dc):
-        ''' Draw the tree map on the device context. '''
-        self.hot_map = []
+        ''' Draw the visible tiles of the tree map and the overlays on the
+        device context. '''
         brush = wx.Brush(self.BackgroundColour)
         dc.SetBackground(brush)
         dc.Clear()
-        if self.model:
-            self.max_depth_seen = 0
+        if self.layout is not None and self.layout.model:
+            width, height = self._buffer.GetSize()
+            size = self.TILE_SIZE
+            x, y = self.origin
+            for row in range(y // size, (y + height - 1) // size + 1):
+                for column in range(x // size, (x + width - 1) // size + 1):
+                    dc.DrawBitmap(
+                        self.Tile(column, row),
+                        column * size - x, row * size - y)
+            self.DrawOverlays(dc)
+
+    def Tile(self, column, row):
+        """Retrieve the tile at column, row of the current zoom level
+        (rendered if not cached)"""
+        key = (self.zoomLevel, column, row)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.RenderTile(column, row)
+            self.tiles.put(key, tile)
+        return tile
+
+    @instrument.timed
+    def RenderTile(self, column, row):
+        """Render the boxes visible in the tile at column, row"""
+        size = self.TILE_SIZE
+        tile = wx.Bitmap(size, size)
+        dc = wx.MemoryDC(tile)
+        try:
+            dc.SetBackground(wx.Brush(self.BackgroundColour))
+            dc.Clear()
             font = self.FontForLabels(dc)
             dc.SetFont(font)
             self._em_size_ = dc.GetFullTextExtent('m', font)[0]
-            w, h = dc.GetSize()
-            self.DrawBox(dc, self.model, 0, 0, w, h, hot_map=self.hot_map)
+            scale = self.scale
+            left, top = column * size, row * size
+
+            def placed(rect):
+                x, y, w, h = rect
+                return (
+                    x * scale - left, y * scale - top, w * scale, h * scale)
+
+            area = (left / scale, top / scale, size / scale, size / scale)
+            visible = self.layout.visible(area, self.MIN_BOX / scale)
+            for node, depth, rect, label in visible:
+                self.DrawBox(
+                    dc, node, placed(rect), label and placed(label), depth)
+        finally:
+            dc.SelectObject(wx.NullBitmap)
+        return tile
+
+    def DrawOverlays(self, dc):
+        """Draw the marked, highlighted and selected boxes (translucent) over
+        the tiles"""
+        overlays = [(node, self.MarkedColour) for node in self.markedNodes]
+        if self.highlightedNode is not None:
+            overlays.append((self.highlightedNode, self.HighlightColour))
+        if self.selectedNode is not None:
+            overlays.append((
+                self.selectedNode,
+                wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHT),
+            ))
+        if not overlays:
+            return
+        gc = wx.GCDC(dc)
+        scale = self.scale
+        radius = float(self.pixel_padding * 3)
+        x, y = self.origin
+        width, height = self._buffer.GetSize()
+        view = (x, y, width, height)
+        for node, colour in overlays:
+            gc.SetBrush(wx.Brush(wx.Colour(
+                colour.Red(), colour.Green(), colour.Blue(),
+                self.OVERLAY_ALPHA,
+            )))
+            gc.SetPen(self.PenForNode(node))
+            for entry in self.layout.node_boxes(node):
+                bx, by, bw, bh = [value * scale for value in entry[2]]
+                if (bw < self.MIN_BOX or bh < self.MIN_BOX or
+                        not layout.rect_intersects((bx, by, bw, bh), view)):
+                    continue
+                gc.DrawRoundedRectangle(
+                    int(bx - x), int(by - y), int(bw), int(bh), radius,
+                )
 
     def FontForLabels(self, dc):
         ''' Return the default GUI font, scaled for printing if necessary. '''
@@ -269,18 +574,13 @@ class SquareMap(wx.Panel):
         return font
 
     def BrushForNode(self, node, depth=0):
-        """Create brush to use to display the given node"""
-        if node == self.selectedNode:
-            colour = wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHT)
-        elif node == self.highlightedNode:
-            colour = wx.Colour(red=0, green=255, blue=0)
-        else:
-            colour = self.adapter.background_color(node, depth)
-            if not colour:
-                red = (depth * 10) % 255
-                green = 255-((depth * 5) % 255)
-                blue = (depth * 25) % 255
-                colour = wx.Colour(red, green, blue)
+        """Create brush to use to display the given node (in a tile)"""
+        colour = self.adapter.background_color(node, depth)
+        if not colour:
+            red = (depth * 10) % 255
+            green = 255-((depth * 5) % 255)
+            blue = (depth * 25) % 255
+            colour = wx.Colour(red, green, blue)
         return wx.Brush(colour)
 
     def PenForNode(self, node, depth=0):
@@ -292,72 +592,31 @@ class SquareMap(wx.Panel):
     def TextForegroundForNode(self, node, depth=0):
         """Determine the text foreground colour to use to display the label of
            the given node"""
-        if node == self.selectedNode:
+        fg_colour = self.adapter.foreground_color(node, depth)
+        if not fg_colour:
             fg_colour = wx.SystemSettings.GetColour(
-                wx.SYS_COLOUR_HIGHLIGHTTEXT)
-        else:
-            fg_colour = self.adapter.foreground_color(node, depth)
-            if not fg_colour:
-                fg_colour = wx.SystemSettings.GetColour(
-                    wx.SYS_COLOUR_WINDOWTEXT)
+                wx.SYS_COLOUR_WINDOWTEXT)
         return fg_colour
 
-    def DrawBox(self, dc, node, x, y, w, h, hot_map, depth=0):
-        """Draw a model-node's box and all children nodes"""
-        log.debug('Draw: %s to (%s,%s,%s,%s) depth %s',
-                  node, x, y, w, h, depth,
-                  )
-        if self.max_depth and depth > self.max_depth:
-            return
-        self.max_depth_seen = max((self.max_depth_seen, depth))
+    def DrawBox(self, dc, node, rect, label=None, depth=0):
+        """Draw a model-node's box (and label area) as placed in a tile"""
         dc.SetBrush(self.BrushForNode(node, depth))
-        dc.SetPen(self.PenForNode(node, depth))
-        # drawing offset by margin within the square...
-        dx, dy, dw, dh = x+self.margin, y+self.margin, w - \
-            (self.margin*2), h-(self.margin*2)
+        dc.SetPen(self.DEFAULT_PEN)
+        dx, dy, dw, dh = rect
+        padding = self.pixel_padding
         if sys.platform == 'darwin':
             # Macs don't like drawing small rounded rects...
-            if w < self.padding*2 or h < self.padding*2:
+            if dw < padding*2 or dh < padding*2:
                 dc.DrawRectangle(int(dx), int(dy), int(dw), int(dh))
             else:
-                dc.DrawRoundedRectangle(int(dx), int(dy), int(dw), int(dh), float(self.padding))
+                dc.DrawRoundedRectangle(
+                    int(dx), int(dy), int(dw), int(dh), float(padding))
         else:
-            dc.DrawRoundedRectangle(int(dx), int(dy), int(dw), int(dh), float(self.padding*3))
-#        self.DrawIconAndLabel(dc, node, x, y, w, h, depth)
-        children_hot_map = []
-        hot_map.append(
-            (wx.Rect(int(x), int(y), int(w), int(h)), node, children_hot_map))
-        x += self.padding
-        y += self.padding
-        w -= self.padding*2
-        h -= self.padding*2
-
-        empty = self.adapter.empty(node)
-        icon_drawn = False
-        if self.max_depth and depth == self.max_depth:
+            dc.DrawRoundedRectangle(
+                int(dx), int(dy), int(dw), int(dh), float(padding*3))
+        if label is not None:
+            x, y, w, h = label
             self.DrawIconAndLabel(dc, node, x, y, w, h, depth)
-            icon_drawn = True
-        elif empty:
-            # is a fraction of the space which is empty...
-            log.debug('  empty space fraction: %s', empty)
-            new_h = h * (1.0-empty)
-            self.DrawIconAndLabel(dc, node, x, y, w, h-new_h, depth)
-            icon_drawn = True
-            y += (h-new_h)
-            h = new_h
-
-        if w > self.padding*2 and h > self.padding*2:
-            children = self.adapter.children(node)
-            if children:
-                log.debug('  children: %s', children)
-                self.LayoutChildren(dc, children, node, x,
-                                    y, w, h, children_hot_map, depth+1)
-            else:
-                log.debug('  no children')
-                if not icon_drawn:
-                    self.DrawIconAndLabel(dc, node, x, y, w, h, depth)
-        else:
-            log.debug('  not enough space: children skipped')
 
     def DrawIconAndLabel(self, dc, node, x, y, w, h, depth):
         ''' Draw the icon, if any, and the label, if any, of the node. '''
@@ -365,7 +624,7 @@ class SquareMap(wx.Panel):
             return
         dc.SetClippingRegion(int(x+1), int(y+1), int(w-2), int(h-2))  # Don't draw outside the box
         try:
-            icon = self.adapter.icon(node, node == self.selectedNode)
+            icon = self.adapter.icon(node, False)
             if icon and h >= icon.GetHeight() and w >= icon.GetWidth():
                 iconWidth = icon.GetWidth() + 2
                 dc.DrawIcon(icon, x+2, y+2)
@@ -377,147 +636,6 @@ class SquareMap(wx.Panel):
         finally:
             dc.DestroyClippingRegion()
 
-    def LayoutChildren(self, dc, children, parent, x, y, w, h, hot_map, depth=0, node_sum=None):
-        """Layout the set of children in the given rectangle
-
-        node_sum -- if provided, we are a recursive call that already has sizes and sorting,
-            so skip those operations
-        """
-        if node_sum is None:
-            nodes = [(self.adapter.value(node, parent), node)
-                     for node in children]
-            nodes.sort(key=operator.itemgetter(0))
-            total = self.adapter.children_sum(children, parent)
-        else:
-            nodes = children
-            total = node_sum
-        if total:
-            if self.square_style and len(nodes) > 5:
-                # new handling to make parents with large numbers of parents a little less
-                # "sliced" looking (i.e. more square)
-                (head_sum, head), (tail_sum, tail) = split_by_value(total, nodes)
-                if head and tail:
-                    # split into two sub-boxes and render each...
-                    head_coord, tail_coord = split_box(
-                        head_sum/float(total), x, y, w, h)
-                    if head_coord:
-                        self.LayoutChildren(
-                            dc, head, parent, head_coord[0], head_coord[1], head_coord[2], head_coord[3],
-                            hot_map, depth,
-                            node_sum=head_sum,
-                        )
-                    if tail_coord and coord_bigger_than_padding(tail_coord, self.padding+self.margin):
-                        self.LayoutChildren(
-                            dc, tail, parent, tail_coord[0], tail_coord[1], tail_coord[2], tail_coord[3],
-                            hot_map, depth,
-                            node_sum=tail_sum,
-                        )
-                    return
-
-            (firstSize, firstNode) = nodes[-1]
-            fraction = firstSize/float(total)
-            head_coord, tail_coord = split_box(
-                firstSize/float(total), x, y, w, h)
-            if head_coord:
-                self.DrawBox(
-                    dc, firstNode, head_coord[0], head_coord[1], head_coord[2], head_coord[3],
-                    hot_map, depth
-                )
-            else:
-                return  # no other node will show up as non-0 either
-
-            if len(nodes) > 1 and tail_coord and coord_bigger_than_padding(tail_coord, self.padding+self.margin):
-                self.LayoutChildren(
-                    dc, nodes[:-1], parent,
-                    tail_coord[0], tail_coord[1], tail_coord[2], tail_coord[3],
-                    hot_map, depth,
-                    node_sum=total - firstSize,
-                )
-
-
-def coord_bigger_than_padding(tail_coord, padding):
-    return (
-        tail_coord and
-        tail_coord[2] > padding * 2 and
-        tail_coord[3] > padding * 2
-    )
-
-
-def split_box(fraction, x, y, w, h):
-    """Return set of two boxes where first is the fraction given"""
-    if w >= h:
-        new_w = int(w*fraction)
-        if new_w:
-            return (x, y, new_w, h), (x+new_w, y, w-new_w, h)
-        else:
-            return None, None
-    else:
-        new_h = int(h*fraction)
-        if new_h:
-            return (x, y, w, new_h), (x, y+new_h, w, h-new_h)
-        else:
-            return None, None
-
-
-def split_by_value(total, nodes, headdivisor=2.0):
-    """Produce, (sum,head),(sum,tail) for nodes to attempt binary partition"""
-    head_sum, tail_sum = 0, 0
-    divider = 0
-    for node in nodes[::-1]:
-        if head_sum < total/headdivisor:
-            head_sum += node[0]
-            divider -= 1
-        else:
-            break
-    return (head_sum, nodes[divider:]), (total-head_sum, nodes[:divider])
-
-
-class DefaultAdapter(object):
-    """Default adapter class for adapting node-trees to SquareMap API"""
-
-    def children(self, node):
-        """Retrieve the set of nodes which are children of this node"""
-        return node.children
-
-    def value(self, node, parent=None):
-        """Return value used to compare size of this node"""
-        return node.size
-
-    def label(self, node):
-        """Return textual description of this node"""
-        return node.path
-
-    def overall(self, node):
-        """Calculate overall size of the node including children and empty space"""
-        return sum([self.value(value, node) for value in self.children(node)])
-
-    def children_sum(self, children, node):
-        """Calculate children's total sum"""
-        return sum([self.value(value, node) for value in children])
-
-    def empty(self, node):
-        """Calculate empty space as a fraction of total space"""
-        overall = self.overall(node)
-        if overall:
-            return (overall - self.children_sum(self.children(node), node))/float(overall)
-        return 0
-
-    def background_color(self, node, depth):
-        ''' The color to use as background color of the node. '''
-        return None
-
-    def foreground_color(self, node, depth):
-        ''' The color to use for the label. '''
-        return None
-
-    def icon(self, node, isSelected):
-        ''' The icon to display in the node. '''
-        return None
-
-    def parents(self, node):
-        """Retrieve/calculate the set of parents for the given node"""
-        return []
-
 
 class TestApp(wx.App):
     """Basic application for holding the viewing Frame"""
@@ -0,0 +1,577 @@
+"""Focus, ignore, prune-from and hide transformations of a profile (as in
+pprof)
+
+Each transform takes a regular expression searched in the file path and
+the name of every function and maps raw pstats-format stats to new stats:
+
+    Focus -- keep only the time of calls passing through a matching function
+    Ignore -- drop the time of calls passing through a matching function
+    PruneFrom -- drop the callees of matching functions, their time becomes
+        the matching functions' own time
+    Hide -- remove matching functions, their time is given to their callers
+        and their callers call their callees directly
+    CollapseRecursion -- fold each (directly or mutually) recursive cycle
+        into a single function (only cycles with a matching member, all of
+        them by default), leaving out the interpreter's exec/import frames
+
+Profiles only hold totals per function and per call edge, not the stacks,
+so the time of a function is divided among its callers in proportion to
+the cumulative time of each call edge (as gprof does); the remaining time
+of every function and edge is then recomputed from that. Entries which a
+transform leaves alone are shared with the stats it was given.
+
+Transforms compose (apply them in turn), derive() builds (and caches) the
+PStatsLoader for a loader's profile with a sequence of transforms applied.
+The raw stats entries are shared between the stages, but each derived
+loader has its own rows and edges (only the interned keys and paths of its
+workspace are shared with the base loader), so the cache holds at most
+CACHE_SIZE of them per loader.
+"""
+import re
+import logging
+from collections import OrderedDict
+from gettext import gettext as _
+
+from snakerunner import graph
+from snakerunner import instrument
+
+log = logging.getLogger(__name__)
+
+# derived loaders kept per loader, so toggling recent filters is instant
+CACHE_SIZE = 8
+
+# the interpreter's exec/import machinery (searched in the file path and
+# the name): a module imported inside a function runs through it, which
+# makes a cycle of the importing code and every module body below it
+INTERPRETER_FRAMES = re.compile(
+    r'^<frozen importlib\.|(^|[/\\])importlib[/\\]'
+    r'|^<built-in method (builtins\.(exec|eval|__import__)|_imp\.)'
+)
+
+
+def edge_data(data):
+    """pstats caller data as (nc, cc, tt, ct), old profile-module data is just
+    ct"""
+    if isinstance(data, tuple):
+        return data
+    return (0, 0, 0, data)
+
+
+def scale_count(count, factor):
+    if not factor:
+        return 0
+    return int(round(count * factor)) or (1 if count else 0)
+
+
+def scale_edge(data, factor):
+    nc, cc, tt, ct = edge_data(data)
+    return (
+        scale_count(nc, factor), scale_count(cc, factor),
+        tt * factor, ct * factor,
+    )
+
+
+def add_edge(first, second):
+    if first is None:
+        return second
+    return tuple([a + b for a, b in zip(edge_data(first), edge_data(second))])
+
+
+class CallGraph(object):
+    """Raw pstats-format stats indexed for the transforms
+
+    callees -- {caller: {callee: (nc, cc, tt, ct)}}
+    order -- strongly connected components (recursive cycles), callers first
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        callees = self.callees = {}
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            for caller, data in callers.items():
+                if caller in stats:
+                    callees.setdefault(caller, {})[func] = edge_data(data)
+        self.order = graph.strongly_connected(
+            list(stats), lambda func: callees.get(func, ()),
+        )[::-1]
+
+    def propagate_down(self, value):
+        """Propagate a fraction of each function's time from its callers down
+
+        value(func, inherited) -> (fraction, passed) is called for each
+        function, callers first; inherited is the fraction passed on by its
+        callers, weighted by the time of each call edge, None for roots.
+        fraction is the function's own, passed what its callees inherit.
+        Members of a recursive cycle inherit from outside the cycle only.
+        """
+        fractions = {}
+        passed = {}
+        stats = self.stats
+        for component in self.order:
+            members = set(component)
+            inflow = carried = calls = called = 0.0
+            for member in component:
+                for caller, data in stats[member][4].items():
+                    if caller in members or caller not in passed:
+                        continue
+                    nc, cc, tt, ct = edge_data(data)
+                    inflow += ct
+                    carried += ct * passed[caller]
+                    calls += nc
+                    called += nc * passed[caller]
+            if inflow:
+                inherited = carried / inflow
+            elif calls:
+                inherited = called / calls
+            else:
+                inherited = None
+            for member in component:
+                fractions[member], passed[member] = value(member, inherited)
+        return fractions
+
+    def propagate_up(self, value):
+        """Propagate a fraction of each function's time from its callees up
+
+        value(func, local, carried, total) -> fraction is called for each
+        function, callees first; local is its own time, carried the time of
+        its calls weighted by the fractions of the callees, total its own
+        time plus that of all its calls (for a recursive cycle: of the whole
+        cycle, counting only calls leaving it).
+        """
+        fractions = {}
+        stats = self.stats
+        callees = self.callees
+        for component in reversed(self.order):
+            members = set(component)
+            local = carried = total = 0.0
+            for member in component:
+                local += stats[member][2]
+                member_callees = callees.get(member, {})
+                for callee, (nc, cc, tt, ct) in member_callees.items():
+                    if callee in members:
+                        continue
+                    total += ct
+                    carried += ct * fractions[callee]
+            total += local
+            for member in component:
+                fractions[member] = value(member, local, carried, total)
+        return fractions
+
+    def rescale(self, factors, local_factors, edge_factor):
+        """New stats with each function's time scaled by its factors
+
+        factors -- {func: factor} for the cumulative time and calls
+        local_factors -- {func: factor} for the local time
+        edge_factor -- edge_factor(caller, callee) for each call edge
+
+        Functions left without time or calls are dropped, unchanged
+        entries are shared with our stats.
+        """
+        result = {}
+        for func, raw in self.stats.items():
+            factor = factors[func]
+            local_factor = local_factors[func]
+            if not factor and not local_factor:
+                continue
+            cc, nc, tt, ct, callers = raw
+            new_callers = {}
+            changed = False
+            for caller, data in callers.items():
+                scale = edge_factor(caller, func) if caller in factors else 0.0
+                if scale == 1.0:
+                    new_callers[caller] = data
+                    continue
+                changed = True
+                if scale:
+                    new_callers[caller] = scale_edge(data, scale)
+            if factor == local_factor == 1.0 and not changed:
+                result[func] = raw
+                continue
+            result[func] = (
+                scale_count(cc, factor), scale_count(nc, factor),
+                tt * local_factor, ct * factor,
+                new_callers if changed else callers,
+            )
+        return result
+
+
+class Transform(object):
+    """Base class of the transforms, pattern is a regular expression"""
+
+    kind = None
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+
+    def __repr__(self):
+        return '%s=%s' % (self.kind, self.pattern)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.pattern == other.pattern
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.kind, self.pattern))
+
+    def matches(self, func):
+        """Does the (file, line, name) key func match our pattern?"""
+        file, line, name = func
+        return bool(self.regex.search(file) or self.regex.search(name))
+
+    def apply(self, stats):
+        """Return stats transformed (raw pstats format)"""
+        raise NotImplementedError
+
+
+class Focus(Transform):
+    """Keep only the time of calls passing through matching functions"""
+
+    kind = 'focus'
+
+    @instrument.timed
+    def apply(self, stats):
+        calls = CallGraph(stats)
+        matches = self.matches
+
+        def down(func, inherited):
+            # fraction of the time with a matching function at or above func
+            if matches(func):
+                return 1.0, 1.0
+            fraction = inherited or 0.0
+            return fraction, fraction
+
+        def up(func, local, carried, total):
+            # fraction of the time with a matching function at or below func
+            if matches(func):
+                return 1.0
+            return carried / total if total else 0.0
+        through = calls.propagate_down(down)
+        below = calls.propagate_up(up)
+        factors = dict([
+            (func, through[func] + (1.0 - through[func]) * below[func])
+            for func in stats
+        ])
+        return calls.rescale(
+            factors, through,
+            lambda caller, callee: (
+                through[caller] + (1.0 - through[caller]) * below[callee]),
+        )
+
+
+class Ignore(Transform):
+    """Drop the time of calls passing through matching functions"""
+
+    kind = 'ignore'
+
+    @instrument.timed
+    def apply(self, stats):
+        calls = CallGraph(stats)
+        matches = self.matches
+
+        def down(func, inherited):
+            # fraction of the time without a matching function at or above func
+            if matches(func):
+                return 0.0, 0.0
+            fraction = 1.0 if inherited is None else inherited
+            return fraction, fraction
+
+        def up(func, local, carried, total):
+            # fraction of the time without a matching function at or below func
+            if matches(func):
+                return 0.0
+            return (local + carried) / total if total else 1.0
+        above = calls.propagate_down(down)
+        free = calls.propagate_up(up)
+        factors = dict([(func, above[func] * free[func]) for func in stats])
+        return calls.rescale(
+            factors, above,
+            lambda caller, callee: above[caller] * free[callee],
+        )
+
+
+class PruneFrom(Transform):
+    """Drop the callees of matching functions, counting their time as local"""
+
+    kind = 'prune_from'
+
+    @instrument.timed
+    def apply(self, stats):
+        calls = CallGraph(stats)
+        matches = self.matches
+        pruned = set([func for func in stats if matches(func)])
+
+        def down(func, inherited):
+            # fraction of the time not spent below a matching function
+            fraction = 1.0 if inherited is None else inherited
+            return fraction, 0.0 if func in pruned else fraction
+        reach = calls.propagate_down(down)
+        local_factors = {}
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            if func in pruned and tt:
+                local_factors[func] = reach[func] * ct / tt
+            else:
+                local_factors[func] = reach[func]
+        result = calls.rescale(
+            reach, local_factors,
+            lambda caller, callee: 0.0 if caller in pruned else reach[caller],
+        )
+        for func in pruned:
+            # a matching function without local time gets all its time as local
+            raw = result.get(func)
+            if raw is not None and not stats[func][2]:
+                cc, nc, tt, ct, callers = raw
+                result[func] = (cc, nc, ct, ct, callers)
+        return result
+
+
+class Hide(Transform):
+    """Remove matching functions, their callers call their callees directly"""
+
+    kind = 'hide'
+
+    @instrument.timed
+    def apply(self, stats):
+        hidden = [func for func in stats if self.matches(func)]
+        if not hidden:
+            return stats
+        calls = CallGraph(stats)
+        callees = calls.callees  # built for this call, so ours to change
+        # mutable copies of the entries we change, the rest stays shared
+        values = {}
+        callers_of = {}
+
+        def entry(func):
+            if func not in values:
+                cc, nc, tt, ct, callers = stats[func]
+                values[func] = [cc, nc, tt, ct]
+                callers_of[func] = dict(callers)
+            return values[func]
+
+        removed = set()
+        for func in hidden:
+            entry(func)
+            ins = dict([
+                (caller, edge_data(data))
+                for caller, data in callers_of[func].items()
+                if caller != func and caller not in removed and caller in stats
+            ])
+            outs = dict([
+                (callee, data)
+                for callee, data in callees.get(func, {}).items()
+                if callee != func and callee not in removed
+            ])
+            inflow = sum([data[3] for data in ins.values()])
+            incalls = sum([data[0] for data in ins.values()])
+            for caller, data in ins.items():
+                if inflow:
+                    share = data[3] / inflow
+                elif incalls:
+                    share = data[0] / float(incalls)
+                else:
+                    share = 1.0 / len(ins)
+                entry(caller)[2] += share * values[func][2]
+                callees[caller].pop(func, None)
+                for callee, out in outs.items():
+                    entry(callee)
+                    data = scale_edge(out, share)
+                    callers_of[callee][caller] = add_edge(
+                        callers_of[callee].get(caller), data)
+                    callees[caller][callee] = add_edge(
+                        callees[caller].get(callee), data)
+            for callee in outs:
+                entry(callee)
+                callers_of[callee].pop(func, None)
+            removed.add(func)
+        result = {}
+        for func, raw in stats.items():
+            if func in removed:
+                continue
+            if func in values:
+                cc, nc, tt, ct = values[func]
+                callers = dict([
+                    (caller, data) for caller, data in callers_of[func].items()
+                    if caller not in removed
+                ])
+                result[func] = (cc, nc, tt, ct, callers)
+            else:
+                result[func] = raw
+        return result
+
+
+class CollapseRecursion(Transform):
+    """Fold recursive cycles into single functions without recursive calls
+
+    A directly recursive function just loses its calls to itself. The
+    functions of a mutually recursive cycle become one function (keyed
+    after the member with the largest cumulative time) with the local time
+    of all of them, the calls made into the cycle from outside of it as
+    its primitive calls and all calls of the members as its total calls.
+
+    The interpreter's exec/import frames (INTERPRETER_FRAMES) are never
+    folded and do not make cycles: otherwise any program importing inside
+    a function folds its module bodies, the import machinery and the code
+    in between into builtins.exec. Cycles of the program's own functions
+    are still found (through its own calls only).
+    """
+
+    kind = 'collapse'
+
+    def __init__(self, pattern=''):
+        super(CollapseRecursion, self).__init__(pattern)
+
+    def __repr__(self):
+        if self.pattern:
+            return '%s=%s' % (self.kind, self.pattern)
+        return self.kind
+
+    @staticmethod
+    def interpreter(func):
+        """Is the (file, line, name) key func part of the exec/import
+        machinery?"""
+        file, line, name = func
+        return bool(
+            INTERPRETER_FRAMES.search(file) or INTERPRETER_FRAMES.search(name))
+
+    @instrument.timed
+    def apply(self, stats):
+        calls = CallGraph(stats)
+        interpreter = set([func for func in stats if self.interpreter(func)])
+
+        def callees(func):
+            if func in interpreter:
+                return ()
+            return [
+                callee for callee in calls.callees.get(func, ())
+                if callee not in interpreter
+            ]
+        # member -> the key of the function its cycle is folded into
+        folded = {}
+        result = {}
+        for component in graph.strongly_connected(list(stats), callees):
+            if len(component) == 1:
+                func = component[0]
+                raw = stats[func]
+                if (func in raw[4] and func not in interpreter
+                        and self.matches(func)):
+                    cc, nc, tt, ct, callers = raw
+                    callers = dict(callers)
+                    del callers[func]
+                    raw = (cc, nc, tt, ct, callers)
+                result[func] = raw
+                continue
+            if not any([self.matches(member) for member in component]):
+                for member in component:
+                    result[member] = stats[member]
+                continue
+            members = set(component)
+            representative = max(
+                component, key=lambda member: stats[member][3])
+            file, line, name = representative
+            key = (file, line, _('%(name)s (+%(count)s recursive)') % {
+                'name': name, 'count': len(component) - 1,
+            })
+            primitive = total = 0
+            local = inflow = 0.0
+            callers = {}
+            for member in component:
+                cc, nc, tt, ct, member_callers = stats[member]
+                total += nc
+                local += tt
+                for caller, data in member_callers.items():
+                    if caller in members:
+                        continue
+                    data = edge_data(data)
+                    primitive += data[1]
+                    inflow += data[3]
+                    callers[caller] = add_edge(callers.get(caller), data)
+                folded[member] = key
+            if not callers:
+                # a root: nothing calls into the cycle
+                primitive = max([stats[member][0] for member in component])
+            cumulative = max(
+                [inflow, local] + [stats[member][3] for member in component])
+            result[key] = (
+                primitive, max((total, primitive)), local, cumulative,
+                callers)
+        if not folded:
+            return result
+        # calls made by cycle members now come from the folded function
+        for func, (cc, nc, tt, ct, callers) in list(result.items()):
+            if not any([caller in folded for caller in callers]):
+                continue
+            merged = {}
+            for caller, data in callers.items():
+                caller = folded.get(caller, caller)
+                merged[caller] = add_edge(merged.get(caller), data)
+            result[func] = (cc, nc, tt, ct, merged)
+        return result
+
+
+TRANSFORMS = dict([
+    (cls.kind, cls)
+    for cls in (Focus, Ignore, PruneFrom, Hide, CollapseRecursion)
+])
+
+
+def parse(text):
+    """Parse 'kind=pattern' (e.g. focus=handle_request) into a Transform
+
+    collapse needs no pattern (it then applies to all recursive cycles).
+    """
+    kind, equals, pattern = text.partition('=')
+    kind = kind.strip().replace('-', '_')
+    if kind == CollapseRecursion.kind and not equals:
+        return CollapseRecursion()
+    if not equals or kind not in TRANSFORMS:
+        raise ValueError(_(
+            'Unknown transform %(text)r, expected one of %(kinds)s=pattern'
+        ) % {
+            'text': text, 'kinds': ', '.join(sorted(TRANSFORMS)),
+        })
+    return TRANSFORMS[kind](pattern)
+
+
+def apply(stats, transforms):
+    """Apply transforms in turn to raw pstats-format stats"""
+    for transform in transforms:
+        stats = transform.apply(stats)
+    return stats
+
+
+def derive(loader, transforms):
+    """The PStatsLoader of loader's profile with transforms applied (cached)
+
+    The derived loader builds its own rows (see the module documentation).
+    Raises ValueError when the transforms leave nothing of the profile.
+    """
+    from snakerunner import pstatsloader
+    transforms = tuple(transforms)
+    if not transforms:
+        return loader
+    cache = loader.derived
+    if cache is None:
+        cache = loader.derived = OrderedDict()
+    derived = cache.get(transforms)
+    if derived is not None:
+        cache.move_to_end(transforms)
+        return derived
+    stats = apply(loader.raw_stats(), transforms)
+    if not stats:
+        raise ValueError(_(
+            'Nothing left of the profile after %(transforms)s'
+        ) % {
+            'transforms': ', '.join([
+                repr(transform) for transform in transforms]),
+        })
+    derived = pstatsloader.PStatsLoader(
+        stats=pstatsloader.stats_from_dict(stats), workspace=loader.workspace,
+    )
+    derived.base = loader
+    derived.transforms = transforms
+    cache[transforms] = derived
+    while len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)[1].close()
+    return derived
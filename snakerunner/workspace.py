@@ -0,0 +1,83 @@
+"""Registry shared by all the profiles loaded into one viewer process
+
+Profiles of the same program record (nearly) the same function keys and
+file paths, the workspace interns them so every loaded profile shares
+the same key tuples and strings, each profile only adds its own rows of
+metrics and edges. Keeping track of the loaders also allows looking up a
+function in all other open profiles.
+"""
+import os
+import sys
+import weakref
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Workspace(object):
+    """Interned function keys and file paths shared by a set of loaders"""
+
+    def __init__(self):
+        self.keys = {}
+        self.paths = {}
+        self.loaders = weakref.WeakSet()
+
+    def register(self, loader):
+        """Add loader to the workspace (forgets interned values once all
+        loaders are gone)"""
+        if not self.loaders:
+            self.keys.clear()
+            self.paths.clear()
+        self.loaders.add(loader)
+
+    def unregister(self, loader):
+        """Remove loader, forgetting interned values no other loader uses"""
+        self.loaders.discard(loader)
+        keys, paths = {}, {}
+        for other in list(self.loaders):
+            for key in other.rows:
+                if self.keys.get(key) is key:
+                    keys[key] = key
+            for path in other.paths.files:
+                split = self.paths.get(path)
+                if split is not None:
+                    paths[path] = split
+        self.keys, self.paths = keys, paths
+
+    def intern_key(self, key):
+        """Return the shared (file, line, name) tuple equal to key"""
+        current = self.keys.get(key)
+        if current is None:
+            file, line, name = key
+            current = self.keys[key] = (
+                sys.intern(file), line, sys.intern(name))
+        return current
+
+    def split(self, path):
+        """Return the shared, interned (directory, filename) for path"""
+        result = self.paths.get(path)
+        if result is None:
+            try:
+                dirname = os.path.dirname(path)
+                basename = os.path.basename(path)
+            except ValueError:
+                dirname = ''
+                basename = path
+            result = self.paths[path] = (
+                sys.intern(dirname), sys.intern(basename))
+        return result
+
+    def find(self, key, exclude=None):
+        """Find the rows for key in all loaders (but exclude) as (loader,
+        row) pairs"""
+        found = []
+        for loader in list(self.loaders):
+            if loader is exclude:
+                continue
+            row = loader.rows.get(key)
+            if row is not None:
+                found.append((loader, row))
+        return found
+
+
+default = Workspace()
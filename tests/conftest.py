@@ -0,0 +1,67 @@
+import sys
+import cProfile
+
+import pytest
+
+# a small program which imports modules (importing further modules) from
+# inside functions, so the profile has the interpreter's exec/import cycle
+MODULES = {
+    'snr_leaf': (
+        'def parse(text):\n'
+        '    return sum(len(word) for word in text.split())\n'
+        '\n'
+        '\n'
+        'parse("a b c " * 2000)\n'
+    ),
+    'snr_middle': (
+        'import snr_leaf\n'
+        '\n'
+        '\n'
+        'def run(count):\n'
+        '    import snr_util\n'
+        '    return snr_leaf.parse(snr_util.text(count))\n'
+    ),
+    'snr_util': (
+        'def text(count):\n'
+        '    return " ".join(str(i) for i in range(count))\n'
+    ),
+}
+
+
+# run through exec, as python -m cProfile does, so the profile's root is
+# builtins.exec, which the imports call as well
+SCRIPT = (
+    'def fact(n):\n'
+    '    return 1 if n <= 1 else n * fact(n - 1)\n'
+    '\n'
+    '\n'
+    'def main():\n'
+    '    import snr_middle\n'
+    '    for count in (1000, 2000, 4000):\n'
+    '        snr_middle.run(count)\n'
+    '    for n in range(50):\n'
+    '        fact(n)\n'
+    '\n'
+    '\n'
+    'main()\n'
+)
+
+
+@pytest.fixture
+def import_profile(tmp_path, monkeypatch):
+    """Filename of a profile of SCRIPT, which imports modules as it runs"""
+    for name, source in MODULES.items():
+        tmp_path.joinpath(name + '.py').write_text(source)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in MODULES:
+        sys.modules.pop(name, None)
+    profiler = cProfile.Profile()
+    code = compile(SCRIPT, 'snr_script.py', 'exec')
+    profiler.enable()
+    exec(code, {'__name__': '__main__'})
+    profiler.disable()
+    for name in MODULES:
+        sys.modules.pop(name, None)
+    filename = str(tmp_path / 'imports.prof')
+    profiler.dump_stats(filename)
+    return filename
@@ -0,0 +1,36 @@
+import threading
+
+from snakerunner import instrument
+
+
+def test_calls_on_other_threads_are_not_recursive(monkeypatch):
+    monkeypatch.setattr(instrument, 'enabled', True)
+    monkeypatch.setattr(instrument, 'timers', {})
+    started, release = threading.Event(), threading.Event()
+
+    @instrument.timed
+    def wait(event=None):
+        if event is not None:
+            started.set()
+            event.wait(5)
+
+    @instrument.timed
+    def recurse(depth):
+        if depth:
+            recurse(depth - 1)
+
+    worker = threading.Thread(target=wait, args=(release,))
+    worker.start()
+    started.wait(5)
+    # overlaps the worker's call, but on another thread
+    wait()
+    recurse(3)
+    release.set()
+    worker.join()
+    timers = dict(
+        (name.split('.')[-1], timer) for name, timer in
+        instrument.timers.items()
+    )
+    assert timers['wait'].calls == timers['wait'].primitive == 2
+    assert timers['recurse'].calls == 4
+    assert timers['recurse'].primitive == 1
@@ -0,0 +1,19 @@
+from snakerunner.profile import Profile
+
+
+def test_path_to_root_stops_at_the_root(import_profile):
+    # builtins.exec is both the root and part of the import cycle
+    profile = Profile.open(import_profile)
+    path = profile.path_to_root('snr_leaf.py:parse')
+    names = [row.name for row in path]
+    assert names[0] == '<built-in method builtins.exec>'
+    assert names[1:2] == ['<module>'] and path[1].filename == 'snr_script.py'
+    assert 'main' in names and 'run' in names
+    assert names[-1] == 'parse'
+    assert len(set(row.key for row in path)) == len(path)
+
+
+def test_path_to_root_of_a_root(import_profile):
+    profile = Profile.open(import_profile)
+    root = profile.path_to_root('snr_script.py:<module>')[0]
+    assert profile.path_to_root(root) == [root]
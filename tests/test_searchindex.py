@@ -0,0 +1,59 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from snakerunner import searchindex
+
+Row = namedtuple('Row', ('name', 'filename', 'directory', 'cumulative'))
+
+ROWS = [
+    Row('function_%d' % i, 'module_%d.py' % (i % 7), '/src/pkg_%d' % (i % 3),
+        float(i))
+    for i in range(500)
+]
+
+
+def expected(query):
+    terms = query.split()
+    return [
+        row for row in ROWS
+        if all(term in '%s %s %s' % (row.name, row.filename, row.directory)
+               for term in terms)
+    ]
+
+
+def test_search_without_state():
+    index = searchindex.SearchIndex(ROWS)
+    assert index.search('function_12') == expected('function_12')
+    assert index.search('') == ROWS
+    assert index.search('cumulative>=498') == ROWS[498:]
+
+
+def test_state_narrows_per_caller():
+    index = searchindex.SearchIndex(ROWS)
+    state = searchindex.SearchState()
+    for query in ('func', 'function_1', 'function_12', 'function_12 pkg_1'):
+        assert index.search(query, state) == expected(query)
+    assert state.query == 'function_12 pkg_1'
+    # another caller's state does not narrow ours
+    other = searchindex.SearchState()
+    assert index.search('module_3', other) == expected('module_3')
+    assert index.search('function_123', state) == expected('function_123')
+    # a state of another index is not used for narrowing
+    small = searchindex.SearchIndex(ROWS[:10])
+    assert small.search('function', state) == ROWS[:10]
+    assert index.search('function_1', state) == expected('function_1')
+
+
+def test_concurrent_searches():
+    index = searchindex.SearchIndex(ROWS)
+    queries = ['function_%d' % i for i in range(1, 60)] + [
+        'module_%d' % i for i in range(7)] + [
+        'pkg_%d function_1' % i for i in range(3)]
+    answers = dict((query, expected(query)) for query in queries)
+    work = queries * 40
+
+    def check(query):
+        return index.search(query) == answers[query]
+
+    with ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(check, work))
@@ -0,0 +1,50 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from snakerunner import pstatsloader, server
+
+
+@pytest.fixture
+def profile(import_profile):
+    return list(server.load_profiles([import_profile]).values())[0]
+
+
+def test_rows_leave_out_the_group_root(profile):
+    assert isinstance(profile.root(), pstatsloader.PStatGroup)
+    rows = profile.rows(limit=server.PAGE_LIMIT)['rows']
+    assert rows and all(row['name'] for row in rows)
+    assert profile.summary()['rows'] == len(rows)
+
+
+def test_node_ids_are_checked(profile):
+    node_id = profile.rows()['rows'][0]['id']
+    assert profile.record(profile.node(node_id))['id'] == node_id
+    for bad in (-1, '-1', len(profile.nodes), 'x'):
+        with pytest.raises(server.HTTPError) as info:
+            profile.node(bad)
+        assert info.value.status == 404
+
+
+def test_concurrent_searches(profile):
+    # each query extends others, a shared narrowing cache mixes them up
+    queries = ['s', 'sn', 'snr', 'snr_', 'snr_l', 'snr_leaf', 'snr_m',
+               'snr_u', 'p', 'pa', 'par', 'parse', 'r', 'ru', 'run', 'f',
+               'fa', 'fact', 't', 'te', 'text', 'm', 'ma', 'main']
+    answers = dict(
+        (query, profile.rows(query=query, limit=server.PAGE_LIMIT))
+        for query in queries
+    )
+
+    def check(query):
+        return profile.rows(
+            query=query, limit=server.PAGE_LIMIT) == answers[query]
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            assert all(executor.map(check, queries * 1000))
+    finally:
+        sys.setswitchinterval(interval)
@@ -0,0 +1,27 @@
+import marshal
+
+from snakerunner import snapshots
+
+FUNC = ('module.py', 1, 'work')
+
+
+def dump(tmp_path, name, calls, time):
+    filename = str(tmp_path / name)
+    with open(filename, 'wb') as handle:
+        marshal.dump({FUNC: (calls, calls, time, time, {})}, handle)
+    return filename
+
+
+def test_explicit_mode_overrides_the_guess(tmp_path):
+    # deltas whose call counts happen to grow look cumulative
+    filenames = [
+        dump(tmp_path, 'slice%d.prof' % i, calls, calls * 0.5)
+        for i, calls in enumerate((1, 2, 4))
+    ]
+    guessed = snapshots.SnapshotSeries(filenames)
+    assert guessed.cumulative and guessed.detected
+    assert guessed.window_stats()[FUNC][1] == 4
+    deltas = snapshots.SnapshotSeries(filenames, cumulative=False)
+    assert not deltas.cumulative and not deltas.detected
+    assert deltas.window_stats()[FUNC][:4] == (7, 7, 3.5, 3.5)
+    assert deltas.window_stats(1, 2)[FUNC][1] == 2
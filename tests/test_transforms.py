@@ -0,0 +1,16 @@
+import pstats
+
+from snakerunner import transforms
+
+
+def test_collapse_recursion_leaves_out_imports(import_profile):
+    stats = pstats.Stats(import_profile).stats
+    result = transforms.CollapseRecursion().apply(stats)
+    names = dict((func[2], func) for func in result)
+    assert not [name for name in names if 'recursive' in name]
+    for name in ('<built-in method builtins.exec>', '<module>', 'main',
+                 'run', 'parse'):
+        assert name in names
+    fact = names['fact']
+    assert fact in stats[fact][4] and fact not in result[fact][4]
+    assert result[names['main']][4] == stats[names['main']][4]